@@ -6,6 +6,7 @@ import base64
 import hashlib
 import hmac
 import sys
+import time
 import uuid
 from datetime import datetime, timezone
 from typing import TYPE_CHECKING, Any
@@ -20,6 +21,21 @@ else:
 if TYPE_CHECKING:
     import requests
 
+DATE_FORMAT = "%a, %d %b %Y %H:%M:%S %z"
+
+
+def _encode_digest(digest: bytes) -> str:
+    # Base64 with "/" and "+" replaced by "_" and "-"
+    return base64.urlsafe_b64encode(digest).decode("ascii")
+
+
+def _encode_md5(payload: bytes) -> str:
+    return _encode_digest(hashlib.md5(payload).hexdigest().encode("ascii"))  # noqa: S324
+
+
+# For GET requests this isn't needed, but an empty string md5'd works
+_EMPTY_BODY_MD5 = _encode_md5(b"")
+
 
 class SunwaveAuthenticator(APIAuthenticatorBase, metaclass=SingletonMeta):
     """Authenticator class for Sunwave."""
@@ -47,37 +63,43 @@ class SunwaveAuthenticator(APIAuthenticatorBase, metaclass=SingletonMeta):
         self.clinic_id = clinic_id
         self.client_id = client_id
         self.client_secret = client_secret
+        self._hmac = hmac.new(client_secret.encode("utf-8"), digestmod=hashlib.sha512)
+        self._encoded_date: tuple[int, str] = (-1, "")
+
+    def _get_encoded_date(self) -> str:
+        """Return the base64-encoded current date, reusing it within the same second."""
+        second = int(time.time())
+        cached_second, encoded = self._encoded_date
+        if second != cached_second:
+            date_calc = datetime.fromtimestamp(second, timezone.utc).strftime(DATE_FORMAT)
+            encoded = base64.b64encode(date_calc.encode("utf-8")).decode("utf-8")
+            self._encoded_date = (second, encoded)
+        return encoded
 
     @override
     def authenticate_request(
         self,
         request: requests.PreparedRequest,
     ) -> requests.PreparedRequest:
-        date_calc = datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S %z")
-        datetime_base_64 = base64.b64encode(date_calc.encode("utf-8")).decode("utf-8")
+        datetime_base_64 = self._get_encoded_date()
         unique_transaction_id = str(uuid.uuid4())
 
-        # For GET requests this isn't needed, but an empty string md5'd works
         match request.body:
-            case str(val):
-                md5_payload = hashlib.md5(val.encode("utf-8")).hexdigest()  # noqa: S324
-            case bytes(val):
-                md5_payload = hashlib.md5(val).hexdigest()  # noqa: S324
+            case str(val) if val:
+                base64_md5_payload = _encode_md5(val.encode("utf-8"))
+            case bytes(val) if val:
+                base64_md5_payload = _encode_md5(val)
             case _:
-                md5_payload = hashlib.md5(b"").hexdigest()  # noqa: S324
-
-        base64_md5_payload_bytes = base64.b64encode(md5_payload.encode("utf-8"))
-        base64_md5_payload = base64_md5_payload_bytes.decode("utf-8").replace("/", "_").replace("+", "-")
+                base64_md5_payload = _EMPTY_BODY_MD5
 
         seed_string = (
             f"{self.user_id}:{self.client_id}:{datetime_base_64}:"
             f"{self.clinic_id}:{unique_transaction_id}:{base64_md5_payload}"
         )
-        seed_bytes = seed_string.encode("utf-8")
 
-        hmac_digest = hmac.new(self.client_secret.encode("utf-8"), seed_bytes, hashlib.sha512).digest()
-        hmac_base64_bytes = base64.b64encode(hmac_digest)
-        hmac_base64 = hmac_base64_bytes.decode("utf-8").replace("/", "_").replace("+", "-")
+        signer = self._hmac.copy()
+        signer.update(seed_string.encode("utf-8"))
+        hmac_base64 = _encode_digest(signer.digest())
 
         request.headers.update({"Authorization": f"Digest {seed_string}:{hmac_base64}"})
 
@@ -0,0 +1,219 @@
+"""On-disk cache of Sunwave responses."""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+#: Response headers kept with cached bodies.
+CACHED_HEADERS = ("Content-Type", "Date", "ETag", "Last-Modified")
+
+
+class CachedResponse:
+    """A response body read from the cache, with the headers kept alongside it."""
+
+    def __init__(self, body: bytes, *, url: str, headers: dict[str, str], stored_at: float) -> None:
+        """Create a cached response.
+
+        Args:
+            body: The decoded response body.
+            url: The URL the response was received from.
+            headers: The response headers listed in ``CACHED_HEADERS``.
+            stored_at: When the response was received or last revalidated.
+        """
+        self.body = body
+        self.url = url
+        self.headers = headers
+        self.stored_at = stored_at
+
+    def age(self) -> float:
+        """Return the number of seconds since the response was received or revalidated."""
+        return time.time() - self.stored_at
+
+    @property
+    def validators(self) -> dict[str, str]:
+        """Return the headers to revalidate the response with, if the API sent any."""
+        validators = {}
+        if etag := self.headers.get("ETag"):
+            validators["If-None-Match"] = etag
+        if last_modified := self.headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = last_modified
+        return validators
+
+    def to_response(self, request: requests.PreparedRequest) -> requests.Response:
+        """Return the cached body as a response to ``request``."""
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.request = request
+        response.raw = io.BytesIO(self.body)
+        return response
+
+
+class CacheWriter:
+    """A response body written to the cache as it is read, and stored once complete."""
+
+    def __init__(self, cache: ResponseCache, key: str, response: requests.Response) -> None:
+        """Start writing a response.
+
+        Args:
+            cache: The cache to store the response in.
+            key: The cache key of the request.
+            response: The response, whose body is still to be read.
+        """
+        self.cache = cache
+        self.key = key
+        self.url = response.url
+        self.headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+        fd, tmp = tempfile.mkstemp(dir=cache.path, suffix=".tmp")
+        self._tmp = Path(tmp)
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        """Append a chunk of the decoded body."""
+        self._file.write(chunk)
+
+    def commit(self) -> None:
+        """Store the body written so far as the cached response."""
+        self._file.close()
+        self.cache.store(self.key, self._tmp, url=self.url, headers=self.headers)
+
+    def discard(self) -> None:
+        """Delete the body written so far, e.g. when the response was incomplete or an error."""
+        self._file.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+class ResponseCache:
+    """Cache of successful responses on disk, keyed by request.
+
+    Each entry is a body file and a JSON metadata file, both named after a hash of the
+    ``identity`` the requests are signed for, and the request method, URL and body. The
+    signed ``Authorization`` header itself isn't part of the key. Files are replaced
+    atomically, so the cache can be shared by threads, runs and configs. The least
+    recently used entries are evicted once the bodies exceed ``max_size``.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        ttl: float,
+        max_size: int | None = None,
+        identity: str = "",
+    ) -> None:
+        """Create a cache.
+
+        Args:
+            path: Directory to keep entries in, created if missing.
+            ttl: Seconds that entries are served without contacting the API.
+            max_size: Maximum total size of the cached bodies, in bytes.
+            identity: The clinic and user requests are made for, so that configs
+                sharing ``path`` don't serve each other's responses.
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.identity = identity
+
+    def key(self, request: requests.PreparedRequest) -> str:
+        """Return the cache key of a request."""
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode()
+        digest = hashlib.sha256(f"{self.identity}\n{request.method} {request.url}\n".encode())
+        digest.update(body)
+        return digest.hexdigest()
+
+    def _files(self, key: str) -> tuple[Path, Path]:
+        return self.path / f"{key}.body", self.path / f"{key}.json"
+
+    def get(self, key: str) -> CachedResponse | None:
+        """Return a cached response, marking it as recently used.
+
+        Returns:
+            The cached response, or None if there is no complete entry for the key.
+        """
+        body_file, meta_file = self._files(key)
+        try:
+            meta = json.loads(meta_file.read_text())
+            body = body_file.read_bytes()
+        except (OSError, ValueError):
+            return None
+        with contextlib.suppress(OSError):
+            os.utime(body_file)
+        return CachedResponse(body, url=meta["url"], headers=meta["headers"], stored_at=meta["stored_at"])
+
+    def writer(self, key: str, response: requests.Response) -> CacheWriter:
+        """Return a writer storing a response as its body is read."""
+        return CacheWriter(self, key, response)
+
+    def put(self, key: str, response: requests.Response) -> None:
+        """Store a response, reading its whole body, then evict entries over ``max_size``."""
+        writer = self.writer(key, response)
+        try:
+            writer.write(response.content)
+        except BaseException:
+            writer.discard()
+            raise
+        writer.commit()
+
+    def store(self, key: str, body_file: Path, *, url: str, headers: dict[str, str]) -> None:
+        """Move a body file written in the cache directory into place, then evict entries over ``max_size``."""
+        target, meta_file = self._files(key)
+        body_file.replace(target)
+        self._write_meta(meta_file, {"url": url, "headers": headers, "stored_at": time.time()})
+        self.evict()
+
+    def refresh(self, key: str, cached: CachedResponse) -> None:
+        """Restart the TTL of an entry the API confirmed is unchanged."""
+        _, meta_file = self._files(key)
+        self._write_meta(meta_file, {"url": cached.url, "headers": cached.headers, "stored_at": time.time()})
+
+    def _write_meta(self, meta_file: Path, meta: dict) -> None:
+        self._write(meta_file, json.dumps(meta).encode())
+
+    def _write(self, file: Path, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            Path(tmp).replace(file)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def _entries(self) -> Iterator[tuple[float, int, str]]:
+        for body_file in self.path.glob("*.body"):
+            with contextlib.suppress(FileNotFoundError):
+                stat = body_file.stat()
+                yield stat.st_mtime, stat.st_size, body_file.stem
+
+    def evict(self) -> None:
+        """Delete the least recently used entries until the bodies fit in ``max_size``."""
+        if self.max_size is None:
+            return
+        entries = sorted(self._entries())
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, key in entries:
+            if size <= self.max_size:
+                break
+            for file in self._files(key):
+                file.unlink(missing_ok=True)
+            size -= entry_size
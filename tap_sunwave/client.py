@@ -2,17 +2,43 @@
 
 from __future__ import annotations
 
+import copy
+import json
+import queue
 import sys
-from functools import cached_property
-from typing import TYPE_CHECKING
+import threading
+import time
+import weakref
+from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from functools import cached_property, partial
+from http import HTTPStatus
+from itertools import islice
+from typing import TYPE_CHECKING, Any, ClassVar, Generic, TypeVar, cast
+from urllib.parse import urlparse
 
 import requests
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
 from singer_sdk import SchemaDirectory, StreamSchema
-from singer_sdk.exceptions import FatalAPIError
+from singer_sdk.batch import Batcher
+from singer_sdk.exceptions import FatalAPIError, RetriableAPIError
+from singer_sdk.helpers._util import utc_now
+from singer_sdk.helpers.conform import TypeConformanceLevel
+from singer_sdk.helpers.jsonpath import extract_jsonpath
+from singer_sdk.pagination import SinglePagePaginator
+from singer_sdk.singerlib import RecordMessage
 from singer_sdk.streams import RESTStream
 
 from tap_sunwave import schemas
 from tap_sunwave.auth import SunwaveAuthenticator
+from tap_sunwave.cache import CacheWriter, ResponseCache
+from tap_sunwave.conformance import RecordConformer, RecordValidation
+from tap_sunwave.dedup import SeenKeys
+from tap_sunwave.digests import RowDigestIndex, row_digest
+from tap_sunwave.metrics import Phase, SyncMetrics
+from tap_sunwave.parsing import JSONStreamReader, TableHeader, TableRow, TransformPlan
 
 if sys.version_info >= (3, 12):
     from typing import override
@@ -20,30 +46,898 @@ else:
     from typing_extensions import override
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Hashable, Iterable, Iterator, Mapping, Sequence
+
+    from backoff.types import Details
     from singer_sdk.authenticators import APIAuthenticatorBase
-    from singer_sdk.helpers.types import Context
+    from singer_sdk.helpers._batch import BaseBatchFileEncoding, BatchConfig
+    from singer_sdk.helpers._state import StateWriter
+    from singer_sdk.helpers.types import Context, TapState
+    from singer_sdk.metrics import Counter
+    from singer_sdk.schema.source import Schema
+
+    from tap_sunwave.tap import TapSunwave
 
 
 SCHEMAS_DIR = SchemaDirectory(schemas)
 
+_T = TypeVar("_T")
+
+#: Requests per second allowed for endpoint families without a configured limit.
+DEFAULT_RATE_LIMIT = 10.0
+
+#: Partition state key holding the last day requested by date-bookmarked streams.
+DATE_BOOKMARK_KEY = "synced_until"
+
+#: Bytes read from the network at a time while parsing responses.
+RESPONSE_CHUNK_SIZE = 64 * 1024
+
+#: Seconds that cached responses are served without contacting the API.
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+
+#: Property set on the tombstones of deleted rows, see the ``row_digests`` setting.
+DELETED_AT_PROPERTY = "_sdc_deleted_at"
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """Parse a ``Retry-After`` header, given either in seconds or as an HTTP date.
+
+    Returns:
+        The number of seconds to wait, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose rate adapts to server throttling.
+
+    The rate is halved every time the server throttles a request (AIMD), and grows
+    back linearly towards the configured maximum as requests succeed.
+    """
+
+    def __init__(self, rate: float, *, min_rate: float = 0.1, recovery_steps: int = 20) -> None:
+        """Initialize the bucket.
+
+        Args:
+            rate: Maximum number of requests per second.
+            min_rate: Lower bound for the adapted rate.
+            recovery_steps: Number of successful requests needed to climb back from
+                zero to the maximum rate.
+        """
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self._step = rate / recovery_steps
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self) -> float:
+        """Block until a request may be sent.
+
+        Returns:
+            The number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def throttle(self, retry_after: float | None = None) -> None:
+        """Slow down after the server rejected or failed a request.
+
+        Args:
+            retry_after: Seconds to pause all requests for, if the server asked to.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+    def recover(self) -> None:
+        """Speed back up after a successful request."""
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self._step)
+
+
+class SunwaveRateLimiter:
+    """Token buckets per endpoint family, shared by the streams and threads of a tap."""
+
+    def __init__(self, limits: Mapping[str, float] | None = None) -> None:
+        """Initialize the rate limiter.
+
+        Args:
+            limits: Requests per second by endpoint family. The ``default`` entry
+                applies to families without their own limit.
+        """
+        self.limits = dict(limits or {})
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, family: str) -> TokenBucket:
+        """Get the token bucket for an endpoint family.
+
+        Returns:
+            The bucket shared by all requests to the endpoint family.
+        """
+        with self._lock:
+            if family not in self._buckets:
+                rate = self.limits.get(family) or self.limits.get("default") or DEFAULT_RATE_LIMIT
+                self._buckets[family] = TokenBucket(rate)
+            return self._buckets[family]
+
+
+class _BufferedProducer(Generic[_T]):
+    """Run a producer into a bounded queue, to be drained from another thread."""
+
+    _DONE = object()
+
+    def __init__(self, producer: Callable[[], Iterable[_T]], stop: threading.Event, buffer_size: int) -> None:
+        self.producer = producer
+        self.stop = stop
+        self.items: queue.Queue = queue.Queue(maxsize=buffer_size)
+        self.error: BaseException | None = None
+
+    def _put(self, item: object) -> None:
+        while not self.stop.is_set():
+            try:
+                self.items.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            return
+
+    def run(self) -> None:
+        # Queued producers still start once the consumer stopped, before being cancelled
+        if self.stop.is_set():
+            return
+        try:
+            for item in self.producer():
+                if self.stop.is_set():
+                    return
+                self._put(item)
+        except BaseException as err:  # noqa: BLE001
+            self.error = err
+        self._put(self._DONE)
+
+    def drain(self) -> Iterator[_T]:
+        while (item := self.items.get()) is not self._DONE:
+            yield item
+        if self.error is not None:
+            raise self.error
+
+
+def iter_concurrently(
+    producers: Sequence[Callable[[], Iterable[_T]]],
+    *,
+    max_workers: int,
+    buffer_size: int = 1000,
+) -> Generator[Iterator[_T], None, None]:
+    """Run producers on a thread pool and yield their output in submission order.
+
+    Each producer fills its own bounded queue, so at most ``buffer_size`` items per
+    producer are held in memory. Producers wait while their queue is full, so
+    iterators should be consumed in order. Exceptions raised by a producer are
+    re-raised when its iterator is consumed. Producers that haven't started when the
+    generator is closed are cancelled.
+
+    Args:
+        producers: Callables returning the items to yield.
+        max_workers: Maximum number of producers running at once.
+        buffer_size: Maximum number of buffered items per producer.
+
+    Yields:
+        An iterator over the items of each producer, in order.
+    """
+    if max_workers <= 1 or len(producers) <= 1:
+        for producer in producers:
+            yield iter(producer())
+        return
+
+    stop = threading.Event()
+    buffered = [_BufferedProducer(producer, stop, buffer_size) for producer in producers]
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sunwave")
+    try:
+        for running in buffered:
+            executor.submit(running.run)
+        for running in buffered:
+            yield running.drain()
+    finally:
+        # Producers that haven't started don't send their requests, and running ones stop
+        # at their next item. Don't wait for them: an abandoned generator can be closed
+        # by the garbage collector in any thread, including one the pool is starting.
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _context_key(context: Context | None) -> str:
+    return json.dumps(context, sort_keys=True, default=str)
+
+
+def _invalid_json_error(response: requests.Response, err: json.JSONDecodeError) -> FatalAPIError:
+    # The body was partly consumed by the parser, so it can't be included in the message
+    return FatalAPIError(f"Invalid JSON response for path: {urlparse(response.url).path}: {err}")
+
+
+class _StreamingSession(requests.Session):
+    """Session that leaves response bodies to be read incrementally by the parser."""
+
+    @override
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        kwargs.setdefault("stream", True)
+        return super().send(request, **kwargs)
+
+
+class _RecordReader:
+    """Records of one request, sending the request again when reading its response fails.
+
+    Sunwave endpoints aren't paginated, so a request returns all the records of its
+    context. After the request is sent again, records already read are skipped by
+    primary key, or by a digest of their values for streams without one, so that rows
+    returned in another order are neither dropped nor emitted twice. Rows that changed
+    in between are emitted again, with their new values.
+    """
+
+    END = object()
+
+    def __init__(self, stream: SunwaveStream, context: Context | None, request_counter: Counter) -> None:
+        self.stream = stream
+        self.context = context
+        self.request_counter = request_counter
+        # Number of records read, by identity
+        self.read: dict[Hashable, int] = {}
+        self._unmatched: dict[Hashable, int] = {}
+        self._response: requests.Response | None = None
+        self._records: Iterator[dict] | None = None
+
+    def _identity(self, record: dict) -> Hashable:
+        if primary_keys := self.stream.primary_keys:
+            return tuple(record.get(key) for key in primary_keys)
+        return row_digest(dict(record))
+
+    def _send(self) -> Iterator[dict]:
+        stream = self.stream
+        prepared_request = stream._prepare_request(context=self.context, page=SinglePagePaginator())  # noqa: SLF001
+        self._response = stream._request(prepared_request, self.context)  # noqa: SLF001
+        self.request_counter.increment()
+        stream.update_sync_costs(prepared_request, self._response, self.context)
+        self._unmatched = dict(self.read)
+        return iter(stream.parse_response(self._response))
+
+    def _next_unread(self) -> object:
+        assert self._records is not None  # noqa: S101
+        for record in self._records:
+            identity = self._identity(record)
+            if self._unmatched.get(identity):
+                self._unmatched[identity] -= 1
+                continue
+            self.read[identity] = self.read.get(identity, 0) + 1
+            return record
+        return self.END
+
+    def read_next(self) -> object:
+        """Return the next record, or ``END`` once all were read.
+
+        The response is closed if reading fails, so that the request can be retried.
+        """
+        try:
+            if self._records is None:
+                self._records = self._send()
+            record = self._next_unread()
+        except BaseException:
+            self.close()
+            raise
+        if record is self.END:
+            assert self._response is not None  # noqa: S101
+            self.stream.finish_caching(self._response, complete=True)
+        return record
+
+    def close(self) -> None:
+        """Stop parsing, and release the connection of the response."""
+        records, self._records = self._records, None
+        response, self._response = self._response, None
+        try:
+            if isinstance(records, Generator):
+                records.close()
+        finally:
+            if response is not None:
+                self.stream.finish_caching(response, complete=False)
+                response.close()
+
+
+class SunwaveSessionPool:
+    """HTTP session shared by the streams of a tap, so they reuse connections."""
+
+    def __init__(self, pool_size: int | None = None, max_in_flight: int = 1) -> None:
+        """Create the session.
+
+        Args:
+            pool_size: Maximum number of idle connections kept open per host.
+            max_in_flight: Maximum number of requests waiting for a response at once,
+                across the tap's streams and threads.
+        """
+        self.pool_size = pool_size or DEFAULT_POOLSIZE
+        self.max_in_flight = max_in_flight
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        # Don't block when the pool is exhausted: streamed responses hold on to their
+        # connection until they're read, and the reader may be waiting on another request
+        self.adapter = HTTPAdapter(pool_maxsize=self.pool_size, pool_block=False)
+        self.session = _StreamingSession()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.session.headers["Accept-Encoding"] = "gzip"
+
+    def connection_stats(self) -> tuple[int, int]:
+        """Return the number of requests sent and connections opened so far."""
+        pools = self.adapter.poolmanager.pools
+        with pools.lock:
+            host_pools = [pools[key] for key in pools.keys()]  # noqa: SIM118
+        return sum(pool.num_requests for pool in host_pools), sum(pool.num_connections for pool in host_pools)
+
+
+class ParallelStateWriter:
+    """Write STATE messages for streams synced in parallel threads.
+
+    Each stream only changes its own bookmarks, from the thread syncing it. Instead of
+    serializing the whole tap state while other threads update it, streams hand over a
+    copy of their bookmarks, which is merged into the last written state under a lock.
+    """
+
+    def __init__(self, state: TapState, state_writer: StateWriter) -> None:
+        """Create a writer.
+
+        Args:
+            state: The tap state at the start of the sync.
+            state_writer: The tap's state writer, which skips unchanged states.
+        """
+        self._state = copy.deepcopy(state)
+        self._state.setdefault("bookmarks", {})
+        self._state_writer = state_writer
+        self._lock = threading.Lock()
+
+    def write_stream_state(self, stream_name: str, stream_state: dict) -> None:
+        """Merge a stream's bookmarks into the state and write it."""
+        stream_state = copy.deepcopy(stream_state)
+        with self._lock:
+            self._state["bookmarks"][stream_name] = stream_state
+            self._state_writer.write_state(self._state)
+
+
+class _SunwaveStreamSchema(StreamSchema):
+    """Stream schemas from the package's schema files.
+
+    Streams that emit tombstones get a copy of their schema with ``_sdc_deleted_at``.
+    """
+
+    @override
+    def get_stream_schema(self, stream: SunwaveStream, stream_class: type[SunwaveStream]) -> Schema:  # type: ignore[override]
+        schema = super().get_stream_schema(stream, stream_class)
+        if not stream.emits_tombstones:
+            return schema
+        if (tombstone_schema := stream.__dict__.get("_tombstone_schema")) is None:
+            deleted_at = {"type": ["string", "null"], "format": "date-time"}
+            tombstone_schema = {**schema, "properties": {**schema["properties"], DELETED_AT_PROPERTY: deleted_at}}
+            stream.__dict__["_tombstone_schema"] = tombstone_schema
+        return tombstone_schema
+
 
 class SunwaveStream(RESTStream):
     """Sunwave stream class."""
 
     url_base = "https://emr.sunwavehealth.com/SunwaveEMR"
-    schema = StreamSchema(SCHEMAS_DIR)
+    schema = _SunwaveStreamSchema(SCHEMAS_DIR)
+
+    #: Endpoint family used to pick a rate limit, see the ``rate_limits`` setting.
+    rate_limit_family: ClassVar[str] = "default"
+
+    #: Properties in Sunwave's ``MM/DD/YYYY hh:mm:ss AM`` layout to convert to ISO 8601.
+    sunwave_datetime_properties: ClassVar[tuple[str, ...]] = ()
+
+    #: Whether requests can be split into ``date_window_days`` windows.
+    date_windows: ClassVar[bool] = True
+
+    #: Whether to bookmark the last requested day per partition, see ``report_lookback_days``.
+    date_bookmarks: ClassVar[bool] = False
+
+    #: Whether a row can be returned by more than one partition, see ``deduplicate_partitions``.
+    partitions_overlap: ClassVar[bool] = False
+
+    @override
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._partition_requests: dict[str, tuple[list[Context | None], list[Iterator[dict]]]] = {}
+        #: Set by the tap while streams are synced in parallel, see ``parallel_streams``.
+        self.parallel_state_writer: ParallelStateWriter | None = None
+        self._batch_state_due = False
+        #: Keys of the rows emitted during a top-level sync, see ``deduplicate_partitions``.
+        self.seen_keys: SeenKeys | None = None
+        #: Response bodies being written to the response cache as they are read.
+        self._cache_writers: weakref.WeakKeyDictionary[requests.Response, CacheWriter] = weakref.WeakKeyDictionary()
+        self._cache_lock = threading.Lock()
+        #: Partition whose records are followed by tombstones, during a top-level sync.
+        self._tombstones_due = False
+        self._last_partition: Context | None = None
 
     @override
     def _request(self, prepared_request: requests.PreparedRequest, context: Context | None) -> requests.Response:
-        """Auth wasn't getting ran for every retried request, so we need to do it here
+        """Serve the request from the response cache, or send it.
+
+        Cached responses are served as is within the cache TTL, and revalidated with
+        ``If-None-Match`` and ``If-Modified-Since`` once stale, if the API sent an
+        ``ETag`` or ``Last-Modified`` header. In replay mode, cached responses are
+        always served and requests missing from the cache fail.
 
         Returns:
             A response object.
+
+        Raises:
+            FatalAPIError: If the request isn't cached in replay mode.
+        """
+        cache = self.response_cache
+        if cache is None:
+            return self._send_request(prepared_request, context)
+
+        key = cache.key(prepared_request)
+        cached = cache.get(key)
+        if cached is not None and (self.is_replaying or cached.age() < cache.ttl):
+            self.logger.debug("Serving %s from the response cache", prepared_request.path_url)
+            return cached.to_response(prepared_request)
+        if self.is_replaying:
+            msg = f"No cached response for {prepared_request.path_url} in replay mode"
+            raise FatalAPIError(msg)
+
+        if cached is not None:
+            prepared_request.headers.update(cached.validators)
+        response = self._send_request(prepared_request, context)
+        if cached is not None and response.status_code == HTTPStatus.NOT_MODIFIED:
+            response.close()
+            cache.refresh(key, cached)
+            return cached.to_response(prepared_request)
+        if response.status_code == HTTPStatus.OK:
+            with self._cache_lock:
+                self._cache_writers[response] = cache.writer(key, response)
+        return response
+
+    def finish_caching(self, response: requests.Response, *, complete: bool) -> None:
+        """Store a response in the cache once it was parsed in full, or discard it.
+
+        Sunwave sends its error pages and ``error`` objects with a 200 status code, so
+        bodies are written to the cache as they are parsed, and only stored once parsing
+        succeeded. Otherwise, they would be served from the cache instead of being
+        requested again.
         """
-        # Manually run authenticator before sending the request
-        reauthed_request = self.authenticator.authenticate_request(prepared_request)
-        # Then call the parent's method with our newly authenticated request
-        return super()._request(reauthed_request, context)
+        with self._cache_lock:
+            writer = self._cache_writers.pop(response, None)
+        if writer is None:
+            return
+        if complete:
+            writer.commit()
+        else:
+            writer.discard()
+
+    def _send_request(self, prepared_request: requests.PreparedRequest, context: Context | None) -> requests.Response:
+        """Wait for the rate limiter and a free request slot, then send the request.
+
+        The SDK signs the request again on every attempt, after the wait, so retries
+        and throttled requests carry a fresh date.
+
+        Returns:
+            A response object.
+        """
+        metrics = self.sync_metrics
+        with metrics.phase(self.name, Phase.WAIT):
+            waited = self.rate_limiter.acquire()
+            self.session_pool.in_flight.acquire()
+        if waited:
+            metrics.count(self.name, self.path, "rate_limit_wait_seconds", waited)
+        metrics.count(self.name, self.path, "requests")
+        try:
+            response = self._send_signed(prepared_request, context)
+        except RetriableAPIError as err:
+            if err.response is not None:
+                self.rate_limiter.throttle(_parse_retry_after(err.response.headers.get("Retry-After")))
+            raise
+        finally:
+            self.session_pool.in_flight.release()
+        self.rate_limiter.recover()
+        return response
+
+    def _send_signed(self, prepared_request: requests.PreparedRequest, context: Context | None) -> requests.Response:
+        """Sign and send a request, like the SDK, timing each step.
+
+        Returns:
+            A response object, whose body is still to be read.
+        """
+        with self.sync_metrics.phase(self.name, Phase.SIGN):
+            authenticated_request = self.authenticator(prepared_request)
+        with self.sync_metrics.phase(self.name, Phase.TTFB):
+            response = self.requests_session.send(
+                authenticated_request,
+                timeout=self.timeout,
+                allow_redirects=self.allow_redirects,
+            )
+        self._write_request_duration_log(
+            endpoint=self.path,
+            response=response,
+            context=context,
+            extra_tags={"url": authenticated_request.path_url} if self._LOG_REQUEST_METRIC_URLS else None,
+        )
+        try:
+            self.validate_response(response)
+        except BaseException:
+            # Release the connection before the request is retried
+            response.close()
+            raise
+        return response
+
+    @override
+    def backoff_handler(self, details: Details) -> None:
+        self.sync_metrics.count(self.name, self.path, "retries")
+        super().backoff_handler(details)
+
+    @property
+    def sync_metrics(self) -> SyncMetrics:
+        """Return the timings and counters shared by the tap's streams."""
+        return self.sunwave_tap.sync_metrics
+
+    @cached_property
+    def response_cache(self) -> ResponseCache | None:
+        """Return the on-disk response cache, if enabled for this stream."""
+        settings = self.config.get("response_cache") or {}
+        if not settings.get("path"):
+            return None
+        if (streams := settings.get("streams")) and self.name not in streams:
+            return None
+        max_size_mb = settings.get("max_size_mb")
+        return ResponseCache(
+            settings["path"],
+            ttl=settings.get("ttl_seconds", DEFAULT_CACHE_TTL),
+            max_size=None if max_size_mb is None else max_size_mb * 1024 * 1024,
+            identity=json.dumps([self.config["clinic_id"], self.config["user_id"], self.config["client_id"]]),
+        )
+
+    @property
+    def uses_row_digests(self) -> bool:
+        """Return whether unchanged rows are dropped, see the ``row_digests`` setting.
+
+        Only full-table streams with primary keys that request their whole date range
+        on every run are eligible. Digests are disabled when ACTIVATE_VERSION messages
+        are emitted, since the target would delete the unchanged rows left out.
+        """
+        settings = self.config.get("row_digests") or {}
+        if not settings.get("path") or self.replication_key or not self.primary_keys or self.is_date_bookmarked:
+            return False
+        if self.emit_activate_version_messages:
+            return False
+        streams = settings.get("streams")
+        return not streams or self.name in streams
+
+    @property
+    def deduplicates_partitions(self) -> bool:
+        """Return whether rows already returned by an earlier partition are dropped.
+
+        Partitions are synced in order, so the row of the first partition returning a
+        primary key is kept, e.g. the ``active`` census row over the ``discharged`` one.
+        """
+        return self.partitions_overlap and bool(self.primary_keys) and bool(self.config.get("deduplicate_partitions"))
+
+    @property
+    def emits_tombstones(self) -> bool:
+        """Return whether deleted rows are emitted with ``_sdc_deleted_at`` set."""
+        return self.uses_row_digests and bool(self.config["row_digests"].get("tombstones"))
+
+    @cached_property
+    def row_digests(self) -> RowDigestIndex | None:
+        """Return the digests of the rows emitted on the last run, if enabled."""
+        if not self.uses_row_digests:
+            return None
+        settings = self.config["row_digests"]
+        row_digests = RowDigestIndex(settings["path"], self.name, self.primary_keys)
+        if settings.get("reset"):
+            self.logger.info("Resetting the row digests of '%s'", self.name)
+            row_digests.reset()
+        return row_digests
+
+    def _tombstones(self) -> Iterator[dict]:
+        """Return tombstones for the rows deleted since the last complete sync.
+
+        These are returned with the records of the last partition, so that the final
+        STATE message of the sync follows them.
+
+        Yields:
+            The tombstones, if enabled.
+        """
+        assert self.row_digests is not None  # noqa: S101
+        deleted = self.row_digests.deleted_keys()
+        self.logger.info(
+            "Skipped %d unchanged rows of '%s', %d deleted", self.row_digests.unchanged_count, self.name, len(deleted)
+        )
+        if not self.emits_tombstones:
+            return
+        deleted_at = datetime.now(tz=timezone.utc).isoformat()
+        for key in deleted:
+            yield {**key, DELETED_AT_PROPERTY: deleted_at}
+
+    def _commit_row_digests(self) -> None:
+        """Store the digests of a complete sync, once its records, tombstones and final state are written.
+
+        Rows stored here aren't emitted again, so if the target fails to load them,
+        the digests must be reset, see the ``row_digests.reset`` setting.
+        """
+        if self.row_digests is not None:
+            self.row_digests.commit()
+
+    @property
+    def is_replaying(self) -> bool:
+        """Return whether responses are served from the cache only."""
+        return bool((self.config.get("response_cache") or {}).get("replay"))
+
+    def get_date_range(self, context: Context | None) -> tuple[date, date] | None:  # noqa: ARG002
+        """Return the dates to request, for endpoints that take ``from``/``until`` dates.
+
+        Streams that return a range get their requests split into windows, see
+        :meth:`get_date_windows`. The window bounds are passed to :meth:`get_url` as
+        ``window_start`` and ``window_end`` context keys.
+
+        Returns:
+            A ``(start, end)`` tuple, or None if the endpoint doesn't take dates.
+        """
+        return None
+
+    def get_date_windows(self, start: date, end: date) -> list[tuple[date, date]]:
+        """Split a date range into windows of ``date_window_days``.
+
+        Consecutive windows share their boundary day, since Sunwave doesn't document
+        whether ``until`` is inclusive.
+
+        Returns:
+            A list of ``(start, end)`` tuples covering the whole range.
+        """
+        days = self.config.get("date_window_days")
+        if not days or not self.date_windows:
+            return [(start, end)]
+
+        windows = []
+        while (window_end := start + timedelta(days=days)) < end:
+            windows.append((start, window_end))
+            start = window_end
+        windows.append((start, end))
+        return windows
+
+    def get_start_date(self, context: Context | None) -> date:
+        """Return the first day to request for a partition.
+
+        Streams with ``date_bookmarks`` resume from the partition's bookmark, minus
+        ``report_lookback_days`` of overlap, once that setting is enabled.
+
+        Returns:
+            The later of ``start_date`` and the bookmark minus the lookback.
+        """
+        start_date = datetime.fromisoformat(self.config["start_date"]).date()
+        if not self.is_date_bookmarked:
+            return start_date
+
+        bookmark = self.get_context_state(context).get(DATE_BOOKMARK_KEY)
+        if bookmark is None:
+            return start_date
+        lookback = timedelta(days=self.config["report_lookback_days"])
+        return max(start_date, date.fromisoformat(bookmark) - lookback)
+
+    @property
+    def is_date_bookmarked(self) -> bool:
+        """Return whether the stream keeps a date bookmark per partition."""
+        return self.date_bookmarks and self.config.get("report_lookback_days") is not None
+
+    def get_request_contexts(self, context: Context | None) -> list[Context | None]:
+        """Return the contexts to request records for, for one partition.
+
+        Returns:
+            One context per date window, with ``window_start`` and ``window_end`` keys
+            added, or just the partition context if the endpoint doesn't take dates.
+        """
+        if (date_range := self.get_date_range(context)) is None:
+            return [context]
+        return [
+            {**(context or {}), "window_start": start.isoformat(), "window_end": end.isoformat()}
+            for start, end in self.get_date_windows(*date_range)
+        ]
+
+    def iter_requests(self, request_contexts: Sequence[Context | None]) -> Generator[Iterator[dict], None, None]:
+        """Request records for each context concurrently, see :func:`iter_concurrently`.
+
+        Returns:
+            An iterator over the records of each context, in order.
+        """
+        return iter_concurrently(
+            [partial(self.request_records, request_context) for request_context in request_contexts],
+            max_workers=self.max_concurrent_requests,
+        )
+
+    @property
+    def max_concurrent_requests(self) -> int:
+        """Return how many of this stream's requests can run at once.
+
+        Streams default to ``max_concurrent_requests`` and can be given a smaller
+        budget with ``stream_max_concurrent_requests``. Requests of all streams
+        together never exceed ``max_concurrent_requests``.
+        """
+        budgets = self.config.get("stream_max_concurrent_requests") or {}
+        return min(
+            budgets.get(self.name, self.config["max_concurrent_requests"]), self.config["max_concurrent_requests"]
+        )
+
+    @override
+    def get_records(self, context: Context | None) -> Iterable[dict]:
+        windows: Iterable[Iterator[dict]]
+        if (prefetched := self._partition_requests.pop(_context_key(context), None)) is not None:
+            request_contexts, windows = prefetched
+        else:
+            request_contexts = self.get_request_contexts(context)
+            windows = self.iter_requests(request_contexts)
+
+        for request_context, window in zip(request_contexts, windows, strict=True):
+            records = window if self.seen_keys is None else self.seen_keys.filter_new(window)
+            yield from records if self.row_digests is None else self.row_digests.filter_changed(records)
+            if request_context is context or request_context is None:
+                continue
+            # Every record up to the end of this window has been emitted
+            self.before_checkpoint()
+            if self.replication_key:
+                self._finalize_state(self.get_context_state(context))
+            if self.is_date_bookmarked:
+                self.get_context_state(context)[DATE_BOOKMARK_KEY] = request_context["window_end"]
+                self.state_manager.is_flushed = False
+            self._write_state_message()
+
+        if self._tombstones_due and context == self._last_partition:
+            self._tombstones_due = False
+            yield from self._tombstones()
+
+    def before_checkpoint(self) -> None:
+        """Finish syncing what the records emitted so far depend on, e.g. child streams.
+
+        Called after each date window, before its bookmark is written.
+        """
+
+    def _start_partition_requests(self, partitions: list[dict]) -> Generator[Iterator[dict], None, None]:
+        """Request the records of every partition concurrently, ahead of the SDK.
+
+        The SDK still syncs one partition at a time, and :meth:`get_records` picks up the
+        records of the partition it is called for.
+
+        Returns:
+            The shared iterator, to be closed once the partitions are synced.
+        """
+        per_partition = [self.get_request_contexts(partition) for partition in partitions]
+        windows = self.iter_requests([request_context for contexts in per_partition for request_context in contexts])
+        for partition, contexts in zip(partitions, per_partition, strict=True):
+            self._partition_requests[_context_key(partition)] = (contexts, list(islice(windows, len(contexts))))
+        return windows
+
+    @cached_property
+    def projected_properties(self) -> tuple[str, ...] | None:
+        """Return the properties selected in the catalog, or None if all of them are.
+
+        Rows are pruned to these right after they are parsed. Primary and replication
+        keys are always selected.
+        """
+        properties = self.schema["properties"]
+        selected = tuple(name for name in properties if self.mask.get(("properties", name), True))
+        return None if len(selected) == len(properties) else selected
+
+    @cached_property
+    def transform_plan(self) -> TransformPlan:
+        """Return the conversions applied to every record, compiled from the schema."""
+        return TransformPlan.from_schema(
+            self.schema,
+            datetime_properties=self.sunwave_datetime_properties,
+            projection=self.projected_properties,
+        )
+
+    @override
+    def request_records(self, context: Context | None) -> Iterable[dict]:
+        # Request, download and transform times are nested in these, and counted apart
+        records = self.sync_metrics.timed(self._read_records(context), self.name, Phase.PARSE)
+        yield from self.sync_metrics.timed(self.transform_plan.apply(records), self.name, Phase.TRANSFORM)
+
+    def _read_records(self, context: Context | None) -> Iterator[dict]:
+        """Request and parse the records of a context.
+
+        Responses are parsed as they are read, so connection errors while reading them
+        are raised as records are yielded. These are retried like failed requests, see
+        :meth:`request_decorator`, and the response is closed when parsing stops.
+
+        Yields:
+            The records, in order.
+        """
+        with self.get_http_request_counter() as request_counter:
+            request_counter.with_context(context)
+            reader = _RecordReader(self, context, request_counter)
+            read_next: Callable[[], object] = self.request_decorator(reader.read_next)  # type: ignore[arg-type,assignment]
+            try:
+                while (record := read_next()) is not _RecordReader.END:
+                    yield record  # type: ignore[misc]
+            finally:
+                reader.close()
+
+    @cached_property
+    def record_conformer(self) -> RecordConformer:
+        """Return the conformance of records to the schema, see ``record_validation``."""
+        validation = RecordValidation(self.config.get("record_validation") or RecordValidation.OFF)
+        validate_every = {
+            RecordValidation.FULL: 1,
+            RecordValidation.SAMPLED: self.config.get("record_validation_interval") or 1,
+            RecordValidation.OFF: 0,
+        }[validation]
+        return RecordConformer(self.name, self.effective_schema, self.mask, self.logger, validate_every=validate_every)
+
+    @override
+    def _generate_record_messages(self, record: dict) -> Generator[RecordMessage, None, None]:
+        """Conform a record with the stream's compiled conformer, and apply stream maps.
+
+        Yields:
+            Record message objects.
+        """
+        if self.TYPE_CONFORMANCE_LEVEL != TypeConformanceLevel.RECURSIVE:
+            yield from super()._generate_record_messages(record)
+            return
+
+        record = self.record_conformer.conform(record)
+        for stream_map in self.stream_maps:
+            mapped_record = stream_map.transform(record)
+            # Emit record if not filtered
+            if mapped_record is not None:
+                yield RecordMessage(
+                    stream=stream_map.stream_alias,
+                    record=mapped_record,
+                    version=self._stream_version,
+                    time_extracted=utc_now(),
+                )
+
+    @override
+    def _write_record_message(self, record: dict) -> None:
+        with self.sync_metrics.phase(self.name, Phase.EMIT):
+            super()._write_record_message(record)
+
+    @property
+    def sunwave_tap(self) -> TapSunwave:
+        """Return the tap, which holds what its streams share."""
+        return cast("TapSunwave", self._tap)
+
+    @cached_property
+    def rate_limiter(self) -> TokenBucket:
+        """Return the rate limiter shared by the tap's streams in this endpoint family."""
+        return self.sunwave_tap.rate_limiter.bucket(self.rate_limit_family)
 
     @cached_property
     @override
@@ -55,23 +949,223 @@ class SunwaveStream(RESTStream):
             clinic_id=self.config["clinic_id"],
         )
 
+    @property
+    def session_pool(self) -> SunwaveSessionPool:
+        """Return the HTTP session pool shared by the tap's streams."""
+        return self.sunwave_tap.session_pool
+
+    @property
     @override
-    def validate_response(self, response: requests.Response) -> None:
-        """Validate HTTP response.
+    def requests_session(self) -> requests.Session:
+        return self.session_pool.session
 
-        Raises:
-            FatalAPIError: If the request is not retriable.
+    @override
+    def _sync_records(
+        self,
+        context: Context | None = None,
+        *,
+        write_messages: bool = True,
+    ) -> Generator[dict, Any, Any]:
+        partitions = self.partitions if context is None else None
+        if partitions and self.deduplicates_partitions:
+            self.seen_keys = SeenKeys(self.primary_keys)
+        if context is None and self.row_digests is not None:
+            self._tombstones_due = True
+            self._last_partition = partitions[-1] if partitions else None
+        try:
+            # Bookmarks of incremental streams are only set once the SDK reaches the partition
+            if partitions and self.config.get("parallel_partitions") and not self.replication_key:
+                windows = self._start_partition_requests(partitions)
+                try:
+                    yield from super()._sync_records(context, write_messages=write_messages)
+                finally:
+                    self._partition_requests.clear()
+                    windows.close()
+            else:
+                yield from super()._sync_records(context, write_messages=write_messages)
+        finally:
+            seen_keys, self.seen_keys = self.seen_keys, None
+            if seen_keys is not None:
+                seen_keys.close()
+            self._tombstones_due = False
+        # Child streams are synced once per parent record, only log for top-level syncs
+        if context is None:
+            if seen_keys is not None:
+                self.sync_metrics.count(self.name, self.path, "duplicates_dropped", seen_keys.duplicate_count)
+                self.logger.info("Dropped %d duplicate rows of '%s'", seen_keys.duplicate_count, self.name)
+            # In batch mode, once the last batch and its state are written
+            if self.batch_config is None:
+                self._commit_row_digests()
+            for stream in (self, *self.child_streams):
+                self.sync_metrics.log(self.metrics_logger, stream.name)
+            requests_sent, connections = self.session_pool.connection_stats()
+            self.logger.info(
+                "HTTP connections after syncing '%s': %d requests sent over %d connections (pool size %d)",
+                self.name,
+                requests_sent,
+                connections,
+                self.session_pool.pool_size,
+            )
+
+    @cached_property
+    def batch_config(self) -> BatchConfig | None:
+        """Return the batch config, if records are written to batch files, see ``batch_config``."""
+        return self.get_batch_config(self.config)
+
+    @override
+    def get_batches(
+        self,
+        batch_config: BatchConfig,
+        context: Context | None = None,
+    ) -> Iterable[tuple[BaseBatchFileEncoding, list[str]]]:
+        """Write records to batch files, conformed to the schema like those of RECORD messages.
+
+        Yields:
+            The encoding and the manifest of each batch.
         """
-        super().validate_response(response)
+        batcher = Batcher(tap_name=self.tap_name, stream_name=self.name, batch_config=batch_config)
+        stream_alias = self.stream_maps[0].stream_alias
+        records = (
+            message.record
+            for record in self._sync_records(context, write_messages=False)
+            for message in self._generate_record_messages(record)
+            if message.stream == stream_alias
+        )
+        for manifest in batcher.get_batches(records=records):
+            yield batch_config.encoding, manifest
+
+    @override
+    def _sync_batches(self, batch_config: BatchConfig, context: Context | None = None) -> None:
+        """Sync batches, and only write state once a BATCH message covers the records it bookmarks.
+
+        State written while records are collected into a batch, e.g. after each date
+        window, is held back. Child streams are synced while their parent collects
+        records, so their state is written along with their parent's.
+        """
+        with self.get_batch_counter() as counter:
+            for encoding, manifest in self.get_batches(batch_config, context):
+                counter.increment()
+                self._write_batch_message(encoding=encoding, manifest=manifest)
+                self._write_batch_states()
+        self._write_batch_states()
+        if context is None:
+            self._commit_row_digests()
+
+    def _write_batch_states(self) -> None:
+        if self.parent_stream_type is None:
+            for stream in (*self.child_streams, self):
+                if isinstance(stream, SunwaveStream):
+                    stream.write_batch_state()
 
+    def write_batch_state(self) -> None:
+        """Write this stream's state in batch mode, once its records are all in written batches."""
+        self._batch_state_due = True
         try:
-            json_response = response.json()
-            # Check if response is a dict and has error
-            if isinstance(json_response, dict) and json_response.get("error"):
-                error_msg = self.response_error_message(response)
-                raise FatalAPIError(error_msg)
-        except requests.exceptions.JSONDecodeError as err:
-            # Their API returns a 200 status code when there's an error
-            # We detect that by noticing the response isn't valid JSON
+            self._write_state_message()
+        finally:
+            self._batch_state_due = False
+
+    @override
+    def _write_state_message(self) -> None:
+        if self.batch_config is not None and not self._batch_state_due:
+            return
+        if self.parallel_state_writer is None:
+            super()._write_state_message()
+            return
+        if not self.state_manager.is_flushed:
+            self.parallel_state_writer.write_stream_state(self.name, self.stream_state)
+            self.state_manager.is_flushed = True
+
+    def read_response(self, response: requests.Response) -> JSONStreamReader:
+        """Return an incremental JSON reader over the response body.
+
+        Raises:
+            FatalAPIError: If the body isn't JSON.
+        """
+        reader = JSONStreamReader(self._iter_body(response))
+        # Their API returns a 200 status code when there's an error
+        # We detect that by noticing the response isn't valid JSON
+        if reader.peek() not in {"[", "{"}:
             msg = self.response_error_message(response)
-            raise FatalAPIError(msg) from err
+            raise FatalAPIError(msg)
+        return reader
+
+    def _iter_body(self, response: requests.Response) -> Iterator[bytes]:
+        """Read the response body in chunks, timing the reads and counting the bytes.
+
+        Yields:
+            Chunks of the decoded body.
+        """
+        with self._cache_lock:
+            cache_writer = self._cache_writers.get(response)
+        for chunk in self.sync_metrics.timed(response.iter_content(RESPONSE_CHUNK_SIZE), self.name, Phase.DOWNLOAD):
+            self.sync_metrics.count(self.name, self.path, "response_bytes", len(chunk))
+            if cache_writer is not None:
+                cache_writer.write(chunk)
+            yield chunk
+
+    def check_error_payload(self, response: requests.Response, payload: Any) -> None:  # noqa: ANN401
+        """Raise if a decoded response is one of Sunwave's error objects.
+
+        Raises:
+            FatalAPIError: If the payload has an ``error`` key.
+        """
+        if isinstance(payload, dict) and payload.get("error"):
+            msg = self.response_error_message(response)
+            raise FatalAPIError(msg)
+
+    @override
+    def parse_response(self, response: requests.Response) -> Iterable[dict]:
+        """Parse the response, decoding top-level arrays one record at a time."""
+        reader = self.read_response(response)
+        try:
+            if reader.peek() == "[":
+                yield from reader.iter_array()
+                return
+            data = reader.read_value()
+        except json.JSONDecodeError as err:
+            raise _invalid_json_error(response, err) from err
+
+        self.check_error_payload(response, data)
+        yield from extract_jsonpath(self.records_jsonpath, input=data)
+
+    def parse_table_response(
+        self,
+        response: requests.Response,
+        *,
+        header_key: str = "table_header",
+        rows_key: str = "table_rows",
+        extra_columns: Sequence[str] = (),
+    ) -> Iterator[TableRow]:
+        """Parse a report made of a header and a list of value rows.
+
+        Rows are wrapped with the header as they are decoded, and share it. Rows that
+        come before the header in the document are held until the header is read.
+
+        Args:
+            response: The response.
+            header_key: Key of the column names.
+            rows_key: Key of the rows of values.
+            extra_columns: Columns added to the header, e.g. for properties set by
+                :meth:`post_process`, so rows don't need a dictionary for them.
+
+        Yields:
+            One mapping per row, keyed by the header.
+        """
+        reader = self.read_response(response)
+        fields: dict[str, Any] = {}
+        try:
+            for key in reader.iter_object():
+                if key == rows_key and header_key in fields:
+                    header = TableHeader([*fields[header_key], *extra_columns])
+                    for row in reader.iter_array():
+                        yield header.row(row)
+                else:
+                    fields[key] = reader.read_value()
+        except json.JSONDecodeError as err:
+            raise _invalid_json_error(response, err) from err
+
+        self.check_error_payload(response, fields)
+        header = TableHeader([*fields.get(header_key, []), *extra_columns])
+        for row in fields.get(rows_key, []):
+            yield header.row(row)
@@ -0,0 +1,176 @@
+"""Conformance of records to stream schemas, compiled once per stream."""
+
+from __future__ import annotations
+
+import enum
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any
+
+# Private SDK helpers, so the conformer is checked against the SDK on every stream schema in
+# the tests, rather than pinning an exact SDK release
+from singer_sdk.helpers._catalog import pop_deselected_record_properties
+from singer_sdk.helpers._typing import (
+    _conform_primitive_property,
+    _is_exclusive_boolean_type,
+    _warn_unmapped_properties,
+    conform_record_data_types,
+    is_object_type,
+    is_uniform_list,
+)
+from singer_sdk.helpers.conform import TypeConformanceLevel
+
+if TYPE_CHECKING:
+    import logging
+    from collections.abc import Callable
+
+    from singer_sdk.singerlib import SelectionMask
+    from singer_sdk.sinks.core import JSONSchemaValidator
+
+#: Values the SDK's conformance leaves unchanged, except for boolean properties.
+_JSON_SCALARS = frozenset({str, int, bool, type(None)})
+
+
+class RecordValidation(str, enum.Enum):
+    """Modes of the ``record_validation`` setting."""
+
+    #: Validate every record.
+    FULL = "full"
+    #: Validate one record in ``record_validation_interval``.
+    SAMPLED = "sampled"
+    #: Don't validate records.
+    OFF = "off"
+
+
+def _primitive_conformer(schema: dict) -> Callable[[Any], Any]:
+    """Return the conversion of a property that isn't a nested object or array.
+
+    Values decoded from JSON are handled here, anything else by the SDK.
+    """
+    if _is_exclusive_boolean_type(schema):
+
+        def conform_boolean(value: Any) -> Any:  # noqa: ANN401
+            if value.__class__ in _JSON_SCALARS:
+                return None if value is None else value != 0
+            return _conform_primitive_property(value, schema)
+
+        return conform_boolean
+
+    def conform(value: Any) -> Any:  # noqa: ANN401
+        cls = value.__class__
+        if cls in _JSON_SCALARS:
+            return value
+        if cls is Decimal:
+            return value if value.is_finite() else None
+        return _conform_primitive_property(value, schema)
+
+    return conform
+
+
+class RecordConformer:
+    """Conformance of records to a stream's schema, compiled once from the schema.
+
+    Gives the same records as the SDK's conformance at the ``RECURSIVE`` level, but
+    picks the conversion of each top-level property once instead of for every
+    record. Nested objects and arrays still go through the SDK.
+
+    Conformed records can also be validated against the schema, every record or one
+    in ``validate_every``, see the ``record_validation`` setting.
+    """
+
+    def __init__(
+        self,
+        stream_name: str,
+        schema: dict,
+        mask: SelectionMask,
+        logger: logging.Logger,
+        *,
+        validate_every: int = 0,
+    ) -> None:
+        """Compile a conformer.
+
+        Args:
+            stream_name: The stream's name, for warnings.
+            schema: The stream's effective schema.
+            mask: The stream's property selection.
+            logger: Logger of warnings about properties missing from the schema.
+            validate_every: Validate one record in this many, or none if 0.
+        """
+        self.stream_name = stream_name
+        self.schema = schema
+        self.logger = logger
+        self.additional_properties = bool(schema.get("additionalProperties"))
+        self.deselected = frozenset(name for name in schema["properties"] if not mask["properties", name])
+        self.conformers = {
+            name: self._compile(name, prop, mask)
+            for name, prop in schema["properties"].items()
+            if name not in self.deselected
+        }
+        self.validate_every = validate_every
+        self.record_count = 0
+        self.validator: JSONSchemaValidator | None = None
+        if validate_every:
+            # Only needed by targets otherwise, so it isn't imported on start-up
+            from singer_sdk.sinks.core import JSONSchemaValidator  # noqa: PLC0415
+
+            self.validator = JSONSchemaValidator(schema)
+
+    def _compile(self, name: str, schema: dict, mask: SelectionMask) -> Callable[[Any], Any]:
+        primitive = _primitive_conformer(schema)
+        if not is_uniform_list(schema) and not (is_object_type(schema) and "properties" in schema):
+            return primitive
+
+        breadcrumb = ("properties", name)
+        nested_schema = {"properties": {name: schema}}
+        prunes = any(not selected for crumb, selected in mask.items() if crumb[:2] == breadcrumb)
+
+        def conform_nested(value: Any) -> Any:  # noqa: ANN401
+            if not isinstance(value, list | dict):
+                return primitive(value)
+            if prunes and isinstance(value, dict):
+                pop_deselected_record_properties(value, self.schema, mask, breadcrumb)
+            conformed = conform_record_data_types(
+                self.stream_name,
+                {name: value},
+                nested_schema,
+                TypeConformanceLevel.RECURSIVE,
+                self.logger,
+            )
+            return conformed[name]
+
+        return conform_nested
+
+    def conform(self, record: dict) -> dict:
+        """Conform a record to the schema.
+
+        Deselected properties are removed from the record, and dropped along with
+        properties missing from the schema from the conformed record.
+
+        Returns:
+            A new record.
+
+        Raises:
+            InvalidRecord: If the record is validated and doesn't match the schema.
+        """
+        conformed = {}
+        conformers = self.conformers
+        deselected: list[str] = []
+        unmapped: list[str] = []
+        for name, value in record.items():
+            if (conform := conformers.get(name)) is not None:
+                conformed[name] = conform(value)
+            elif name in self.deselected:
+                deselected.append(name)
+            elif self.additional_properties:
+                conformed[name] = value
+            else:
+                unmapped.append(name)
+        for name in deselected:
+            del record[name]
+        if unmapped:
+            _warn_unmapped_properties(self.stream_name, tuple(unmapped), self.logger)
+
+        if (validator := self.validator) is not None:
+            self.record_count += 1
+            if self.record_count % self.validate_every == 0:
+                validator.validate(conformed)
+        return conformed
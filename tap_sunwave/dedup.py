@@ -0,0 +1,85 @@
+"""Deduplication of rows returned by more than one partition."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+from itertools import islice
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence
+
+#: Keys held in memory before they are moved to disk.
+MAX_MEMORY_KEYS = 1_000_000
+
+#: Rows looked up on disk with one query.
+LOOKUP_BATCH_SIZE = 500
+
+
+class SeenKeys:
+    """Primary keys of the rows a stream emitted during one sync.
+
+    Each key is kept as a 64-bit hash. Past ``max_memory_keys`` keys, the hashes are
+    moved to a temporary SQLite database, which is deleted by :meth:`close`.
+    """
+
+    def __init__(self, primary_keys: Sequence[str], *, max_memory_keys: int = MAX_MEMORY_KEYS) -> None:
+        """Create an empty index.
+
+        Args:
+            primary_keys: The properties identifying a row.
+            max_memory_keys: Number of keys to hold in memory.
+        """
+        self.primary_keys = tuple(primary_keys)
+        self.max_memory_keys = max_memory_keys
+        self.duplicate_count = 0
+        self._memory: set[int] = set()
+        self._connection: sqlite3.Connection | None = None
+
+    def _hash(self, row: dict) -> int:
+        key = json.dumps([row.get(name) for name in self.primary_keys], default=str).encode()
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big", signed=True)
+
+    def _lookup_spilled(self, hashes: list[int]) -> set[int]:
+        if self._connection is None:
+            return set()
+        placeholders = ",".join("?" * len(hashes))
+        query = f"SELECT hash FROM seen WHERE hash IN ({placeholders})"  # noqa: S608
+        return {key_hash for (key_hash,) in self._connection.execute(query, hashes)}
+
+    def _spill(self) -> None:
+        if self._connection is None:
+            # An empty name opens a temporary database on disk
+            self._connection = sqlite3.connect("", check_same_thread=False)
+            self._connection.execute("CREATE TABLE seen (hash INTEGER PRIMARY KEY)")
+        with self._connection:
+            self._connection.executemany("INSERT OR IGNORE INTO seen VALUES (?)", ((h,) for h in self._memory))
+        self._memory.clear()
+
+    def filter_new(self, rows: Iterable[dict]) -> Iterator[dict]:
+        """Drop rows whose primary key was already emitted.
+
+        Yields:
+            The rows seen for the first time, in order.
+        """
+        rows = iter(rows)
+        while batch := list(islice(rows, LOOKUP_BATCH_SIZE)):
+            hashes = [self._hash(row) for row in batch]
+            spilled = self._lookup_spilled(list(set(hashes)))
+            for key_hash, row in zip(hashes, batch, strict=True):
+                if key_hash in self._memory or key_hash in spilled:
+                    self.duplicate_count += 1
+                    continue
+                self._memory.add(key_hash)
+                yield row
+            if len(self._memory) > self.max_memory_keys:
+                self._spill()
+
+    def close(self) -> None:
+        """Forget all keys, and delete the temporary database."""
+        self._memory.clear()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
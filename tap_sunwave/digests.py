@@ -0,0 +1,129 @@
+"""Change detection for full-table streams."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+from itertools import islice
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import os
+    from collections.abc import Iterable, Iterator, Sequence
+
+#: Rows looked up in the index with one query.
+LOOKUP_BATCH_SIZE = 500
+
+
+def row_digest(row: dict) -> bytes:
+    """Return a digest of a row's values, independent of key order."""
+    encoded = json.dumps(row, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).digest()
+
+
+class RowDigestIndex:
+    """Digests of the rows a stream emitted on its last complete sync, by primary key.
+
+    Digests are kept in a SQLite database that can be shared by all streams. Changes
+    are held in memory and only written by :meth:`commit`, once the stream has been
+    synced in full, so that an interrupted sync emits the same rows again.
+    """
+
+    def __init__(self, path: str | os.PathLike[str], stream_name: str, primary_keys: Sequence[str]) -> None:
+        """Open the index of a stream.
+
+        Args:
+            path: The SQLite database file, created if missing.
+            stream_name: Name of the stream whose rows are indexed.
+            primary_keys: The properties identifying a row.
+        """
+        self.stream_name = stream_name
+        self.primary_keys = tuple(primary_keys)
+        self._connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS row_digests ("
+                "stream TEXT NOT NULL, key TEXT NOT NULL, digest BLOB NOT NULL, "
+                "PRIMARY KEY (stream, key)) WITHOUT ROWID"
+            )
+        self._seen: set[str] = set()
+        self._changed: dict[str, bytes] = {}
+        self._deleted: list[str] | None = None
+        self.unchanged_count = 0
+
+    def _key(self, row: dict) -> str:
+        return json.dumps([row.get(name) for name in self.primary_keys], default=str)
+
+    def _lookup(self, keys: list[str]) -> dict[str, bytes]:
+        placeholders = ",".join("?" * len(keys))
+        query = f"SELECT key, digest FROM row_digests WHERE stream = ? AND key IN ({placeholders})"  # noqa: S608
+        return dict(self._connection.execute(query, [self.stream_name, *keys]).fetchall())
+
+    def filter_changed(self, rows: Iterable[dict]) -> Iterator[dict]:
+        """Drop rows whose digest matches the last complete sync.
+
+        Yields:
+            New and changed rows, in order.
+        """
+        rows = iter(rows)
+        while batch := list(islice(rows, LOOKUP_BATCH_SIZE)):
+            keys = [self._key(row) for row in batch]
+            previous = self._lookup(list(set(keys)))
+            for key, row in zip(keys, batch, strict=True):
+                digest = row_digest(row)
+                self._seen.add(key)
+                if previous.get(key) == digest:
+                    self.unchanged_count += 1
+                    continue
+                self._changed[key] = digest
+                yield row
+
+    def _deleted_keys(self) -> list[str]:
+        if self._deleted is None:
+            self._deleted = [
+                key
+                for (key,) in self._connection.execute(
+                    "SELECT key FROM row_digests WHERE stream = ?", [self.stream_name]
+                )
+                if key not in self._seen
+            ]
+        return self._deleted
+
+    def _key_values(self, keys: list[str]) -> list[dict]:
+        return [dict(zip(self.primary_keys, json.loads(key), strict=True)) for key in keys]
+
+    def deleted_keys(self) -> list[dict]:
+        """Return the primary key values of the rows deleted since the last complete sync.
+
+        These are the stored rows that weren't seen during this sync. Nothing is
+        changed until :meth:`commit`.
+        """
+        return self._key_values(self._deleted_keys())
+
+    def commit(self) -> list[dict]:
+        """Store the digests of this sync, forgetting rows that weren't seen.
+
+        Returns:
+            The primary key values of the rows that were deleted since the last sync.
+        """
+        deleted = self._deleted_keys()
+        with self._connection:
+            self._connection.executemany(
+                "DELETE FROM row_digests WHERE stream = ? AND key = ?",
+                [(self.stream_name, key) for key in deleted],
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO row_digests (stream, key, digest) VALUES (?, ?, ?)",
+                [(self.stream_name, key, digest) for key, digest in self._changed.items()],
+            )
+        self._seen.clear()
+        self._changed.clear()
+        self._deleted = None
+        self.unchanged_count = 0
+        return self._key_values(deleted)
+
+    def reset(self) -> None:
+        """Forget the digests stored for the stream, so that every row is emitted again."""
+        with self._connection:
+            self._connection.execute("DELETE FROM row_digests WHERE stream = ?", [self.stream_name])
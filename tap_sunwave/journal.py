@@ -0,0 +1,86 @@
+"""Journal of the opportunity timelines synced during an interrupted backfill."""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import os
+
+
+class TimelineJournal:
+    """Append-only journal of the opportunities whose timelines were synced.
+
+    Entries are kept in a SQLite database, numbered in the order they are appended.
+    Appended entries are held in memory until :meth:`commit`, which writes them in one
+    transaction before a STATE message records the number of committed entries.
+    Entries past that number are discarded when a sync resumes, along with the records
+    they covered.
+    """
+
+    def __init__(self, path: str | os.PathLike[str], name: str) -> None:
+        """Open a journal.
+
+        Args:
+            path: The SQLite database file, created if missing.
+            name: Name of the journal, so that shards can share a database.
+        """
+        self.name = name
+        self._connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS timeline_journal ("
+                "journal TEXT NOT NULL, position INTEGER NOT NULL, opportunity_id TEXT NOT NULL, "
+                "PRIMARY KEY (journal, position)) WITHOUT ROWID"
+            )
+        #: Number of committed entries.
+        self.length = 0
+        #: Opportunity IDs appended since the last commit.
+        self.pending: list[str] = []
+
+    def load(self, length: int) -> set[str]:
+        """Drop the entries past ``length``, and return the others.
+
+        Args:
+            length: The number of entries recorded in the stream state.
+
+        Returns:
+            The opportunity IDs of the first ``length`` entries.
+        """
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM timeline_journal WHERE journal = ? AND position >= ?", [self.name, length]
+            )
+            rows = self._connection.execute(
+                "SELECT opportunity_id FROM timeline_journal WHERE journal = ?", [self.name]
+            ).fetchall()
+        self.length = len(rows)
+        self.pending = []
+        return {opportunity_id for (opportunity_id,) in rows}
+
+    def append(self, opportunity_id: str) -> None:
+        """Add an entry, written by the next :meth:`commit`."""
+        self.pending.append(opportunity_id)
+
+    def commit(self) -> int:
+        """Write the entries appended since the last commit.
+
+        Returns:
+            The number of entries, to record in the stream state.
+        """
+        pending, self.pending = self.pending, []
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO timeline_journal (journal, position, opportunity_id) VALUES (?, ?, ?)",
+                [(self.name, self.length + offset, opportunity_id) for offset, opportunity_id in enumerate(pending)],
+            )
+        self.length += len(pending)
+        return self.length
+
+    def clear(self) -> None:
+        """Delete every entry."""
+        with self._connection:
+            self._connection.execute("DELETE FROM timeline_journal WHERE journal = ?", [self.name])
+        self.length = 0
+        self.pending = []
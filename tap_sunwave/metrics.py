@@ -0,0 +1,186 @@
+"""Timings and counters of where a sync spends its time."""
+
+from __future__ import annotations
+
+import enum
+import json
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from singer_sdk import metrics
+
+if TYPE_CHECKING:
+    import logging
+    import os
+    from collections.abc import Iterable, Iterator
+
+_T = TypeVar("_T")
+
+
+class Phase(str, enum.Enum):
+    """Phases of a sync that are timed separately."""
+
+    #: Waiting for the rate limiter and a free request slot.
+    WAIT = "wait"
+    #: Signing the request.
+    SIGN = "sign"
+    #: Sending the request until the response headers are received.
+    TTFB = "ttfb"
+    #: Reading the response body from the network.
+    DOWNLOAD = "download"
+    #: Decoding records from the response body.
+    PARSE = "parse"
+    #: Converting raw values, see ``TransformPlan``.
+    TRANSFORM = "transform"
+    #: Conforming records and writing RECORD messages.
+    EMIT = "emit"
+
+
+class SunwaveMetric(str, enum.Enum):
+    """Metrics logged in addition to the SDK's."""
+
+    PHASE_DURATION = "phase_duration"
+    ENDPOINT_STATS = "endpoint_stats"
+
+
+class SyncMetrics:
+    """Time spent in each phase by each stream, and counters by endpoint, for a tap's run.
+
+    Phases nest: time spent in a phase entered while another is running, in the same
+    thread, is only counted for the inner phase. Phase times of requests made from
+    worker threads add up, so they can exceed the wall time of the sync.
+    """
+
+    def __init__(self) -> None:
+        """Create an empty set of metrics."""
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        #: Seconds and number of times each phase was entered, by ``(stream, phase)``.
+        self.phases: defaultdict[tuple[str, str], list[float]] = defaultdict(lambda: [0.0, 0])
+        #: Counters such as ``requests``, ``retries`` and ``response_bytes``, by ``(stream, endpoint)``.
+        self.endpoints: defaultdict[tuple[str, str], defaultdict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def _stack(self) -> list[float]:
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def start(self) -> float:
+        """Enter a phase.
+
+        Returns:
+            The start time, to pass to :meth:`stop`.
+        """
+        self._stack().append(0.0)
+        return time.perf_counter()
+
+    def stop(self, stream: str, phase: Phase, started: float) -> None:
+        """Leave the phase entered last, and record the time spent in it."""
+        elapsed = time.perf_counter() - started
+        stack = self._local.stack
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        with self._lock:
+            totals = self.phases[stream, phase.value]
+            totals[0] += elapsed - nested
+            totals[1] += 1
+
+    @contextmanager
+    def phase(self, stream: str, phase: Phase) -> Iterator[None]:
+        """Time the body of a ``with`` block. It must not yield from a generator."""
+        started = self.start()
+        try:
+            yield
+        finally:
+            self.stop(stream, phase, started)
+
+    def timed(self, iterable: Iterable[_T], stream: str, phase: Phase) -> Iterator[_T]:
+        """Time the production of each item of an iterable.
+
+        Yields:
+            The items of the iterable.
+        """
+        iterator = iter(iterable)
+        while True:
+            started = self.start()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.stop(stream, phase, started)
+            yield item
+
+    def count(self, stream: str, endpoint: str, counter: str, value: float = 1) -> None:
+        """Add to an endpoint counter."""
+        with self._lock:
+            self.endpoints[stream, endpoint][counter] += value
+
+    def summary(self) -> dict[str, Any]:
+        """Return all metrics by stream.
+
+        Returns:
+            A dictionary like ``{"streams": {name: {"phases": ..., "endpoints": ...}}}``.
+        """
+        streams: defaultdict[str, dict[str, dict]] = defaultdict(lambda: {"phases": {}, "endpoints": {}})
+        with self._lock:
+            for (stream, phase), (seconds, count) in sorted(self.phases.items()):
+                streams[stream]["phases"][phase] = {"seconds": round(seconds, 6), "count": int(count)}
+            for (stream, endpoint), counters in sorted(self.endpoints.items()):
+                streams[stream]["endpoints"][endpoint] = dict(counters)
+        return {"streams": dict(streams)}
+
+    def log(self, logger: logging.Logger, stream: str) -> None:
+        """Log a stream's metrics as SDK metric points."""
+        summary = self.summary()["streams"].get(stream, {"phases": {}, "endpoints": {}})
+        for phase, totals in summary["phases"].items():
+            tags = {metrics.Tag.STREAM: stream, "phase": phase, "count": totals["count"]}
+            _log_point(logger, "timer", SunwaveMetric.PHASE_DURATION, totals["seconds"], tags)
+        for endpoint, counters in summary["endpoints"].items():
+            tags = {metrics.Tag.STREAM: stream, metrics.Tag.ENDPOINT: endpoint, **counters}
+            _log_point(logger, "counter", SunwaveMetric.ENDPOINT_STATS, counters.get("requests", 0), tags)
+
+    def write_json(self, path: str | os.PathLike[str]) -> None:
+        """Write the summary to a JSON file."""
+        _write_atomic(Path(path), json.dumps(self.summary(), indent=2))
+
+    def write_prometheus(self, path: str | os.PathLike[str]) -> None:
+        """Write the metrics in the Prometheus text format, e.g. for the node exporter's textfile collector."""
+        lines = [
+            "# HELP tap_sunwave_phase_seconds_total Seconds spent in each phase of the sync.",
+            "# TYPE tap_sunwave_phase_seconds_total counter",
+        ]
+        summary = self.summary()["streams"]
+        for stream, stats in summary.items():
+            for phase, totals in stats["phases"].items():
+                lines.append(
+                    f'tap_sunwave_phase_seconds_total{{stream="{stream}",phase="{phase}"}} {totals["seconds"]}'
+                )
+        counters = sorted({name for stats in summary.values() for c in stats["endpoints"].values() for name in c})
+        for name in counters:
+            lines.append(f"# TYPE tap_sunwave_{name}_total counter")
+            for stream, stats in summary.items():
+                for endpoint, values in stats["endpoints"].items():
+                    if name in values:
+                        labels = f'stream="{stream}",endpoint="{endpoint}"'
+                        lines.append(f"tap_sunwave_{name}_total{{{labels}}} {values[name]}")
+        _write_atomic(Path(path), "\n".join(lines) + "\n")
+
+
+def _log_point(logger: logging.Logger, metric_type: str, metric: SunwaveMetric, value: float, tags: dict) -> None:
+    # Points only use the value of the metric enum
+    metrics.log(logger, metrics.Point(metric_type, metric, value, tags))  # type: ignore[arg-type]
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    with tempfile.NamedTemporaryFile("w", dir=path.parent, suffix=".tmp", delete=False) as f:
+        f.write(text)
+    Path(f.name).replace(path)
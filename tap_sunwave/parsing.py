@@ -0,0 +1,405 @@
+"""Parsing helpers for Sunwave responses."""
+
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from collections.abc import ItemsView, MutableMapping
+from datetime import datetime, timezone
+from decimal import Decimal
+from itertools import islice
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_CHARS = frozenset("0123456789.eE+-")
+
+# Marks the cells of table rows whose column has no value
+_MISSING: Any = object()
+
+SUNWAVE_DATETIME_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+# Matches the strings ``SUNWAVE_DATETIME_FORMAT`` accepts, except for out-of-range values
+_SUNWAVE_DATETIME = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})\s+(\d{1,2}):(\d{1,2}):(\d{1,2})\s+([AP]M)", re.IGNORECASE)
+
+
+def normalize_sunwave_datetime(value: str | None) -> str | None:
+    """Convert Sunwave datetime format to ISO 8601.
+
+    The fixed Sunwave layout is parsed without going through ``strptime``, with the
+    same results for any string.
+
+    Returns:
+        A normalized date-time string, or the value unchanged if it can't be parsed.
+    """
+    if not value or (match := _SUNWAVE_DATETIME.fullmatch(value)) is None:
+        return value
+
+    month, day, year, hour, minute, second, meridiem = match.groups()
+    if not 1 <= int(hour) <= 12:  # noqa: PLR2004
+        return value
+    hour_24 = int(hour) % 12 + (12 if meridiem.upper() == "PM" else 0)
+    try:
+        parsed = datetime(int(year), int(month), int(day), hour_24, int(minute), int(second), tzinfo=timezone.utc)
+    except ValueError:
+        return value
+    return parsed.isoformat()
+
+
+class JSONStreamReader:
+    """Read a JSON document incrementally from an iterable of byte chunks.
+
+    Arrays and objects can be walked one item at a time with :meth:`iter_array`
+    and :meth:`iter_object`, so only the item being decoded is held in memory.
+    Every other value is decoded whole with :meth:`read_value`.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], *, parse_float: Callable[[str], Any] = Decimal) -> None:
+        """Create a reader.
+
+        Args:
+            chunks: The raw document, e.g. from ``response.iter_content()``.
+            parse_float: Called with the string of every JSON float.
+        """
+        self._chunks = iter(chunks)
+        self._decoder = json.JSONDecoder(parse_float=parse_float)
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, chunks: int = 1) -> bool:
+        """Append up to ``chunks`` chunks to the buffer, dropping the consumed text.
+
+        Returns:
+            False if the end of the document was already reached.
+        """
+        if self._eof:
+            return False
+
+        parts = [self._buffer[self._pos :]]
+        self._pos = 0
+        for _ in range(chunks):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                parts.append(self._text.decode(b"", final=True))
+                self._eof = True
+                break
+            parts.append(self._text.decode(chunk))
+        self._buffer = "".join(parts)
+        return True
+
+    def _expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            msg = f"Expecting one of {chars!r}"
+            raise json.JSONDecodeError(msg, self._buffer, self._pos)
+        self._pos += 1
+        return char
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character without consuming it.
+
+        Returns:
+            The next character, or an empty string at the end of the document.
+        """
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()  # type: ignore[union-attr]
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def read_value(self) -> Any:  # noqa: ANN401
+        """Decode the next value whole.
+
+        Returns:
+            The decoded value.
+        """
+        self.peek()
+        chunks = 1
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Read ahead exponentially so large values aren't re-decoded for every chunk
+                if not self._fill(chunks):
+                    raise
+                chunks *= 2
+                continue
+            # A number cut off by the end of the buffer continues in the next chunk
+            if self._is_cut_off(value, end) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _is_cut_off(self, value: Any, end: int) -> bool:  # noqa: ANN401
+        if isinstance(value, bool) or not isinstance(value, int | float | Decimal):
+            return False
+        return end == len(self._buffer) or self._buffer[end] in _NUMBER_CHARS
+
+    def iter_array(self) -> Iterator[Any]:
+        """Decode the items of the next array one at a time.
+
+        Yields:
+            Each item of the array.
+        """
+        self._expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.read_value()
+            if self._expect(",]") == "]":
+                return
+
+    def iter_object(self) -> Iterator[str]:
+        """Walk the keys of the next object.
+
+        The value of each key must be consumed, with :meth:`read_value` or one of the
+        ``iter_*`` methods, before advancing to the next key.
+
+        Yields:
+            Each key of the object.
+        """
+        self._expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                msg = "Expecting property name enclosed in double quotes"
+                raise json.JSONDecodeError(msg, self._buffer, self._pos)
+            key = self.read_value()
+            self._expect(":")
+            yield key
+            if self._expect(",}") == "}":
+                return
+
+
+class TableHeader:
+    """Column names shared by the rows of one table report, see :class:`TableRow`."""
+
+    __slots__ = ("index", "width")
+
+    def __init__(self, names: Iterable[str]) -> None:
+        """Create a header.
+
+        Args:
+            names: The column names. Rows have the value of the last column of a
+                name repeated in the header.
+        """
+        #: Position of each column's cell, by name.
+        self.index: dict[str, int] = {}
+        names = list(names)
+        for position, name in enumerate(names):
+            self.index[name] = position
+        self.width = len(names)
+
+    def row(self, cells: list) -> TableRow:
+        """Wrap the decoded cells of a row, like ``dict(zip(names, cells))``.
+
+        Returns:
+            The row, holding ``cells`` truncated or padded to the header's width.
+        """
+        if len(cells) > self.width:
+            del cells[self.width :]
+        elif len(cells) < self.width:
+            cells.extend([_MISSING] * (self.width - len(cells)))
+        return TableRow(self, cells)
+
+
+class _TableRowItems(ItemsView):
+    _mapping: TableRow
+
+    def __iter__(self) -> Iterator[tuple[str, Any]]:
+        row = self._mapping
+        cells = row.cells
+        for name, position in row.header.index.items():
+            if (value := cells[position]) is not _MISSING:
+                yield name, value
+        if row.extra:
+            yield from row.extra.items()
+
+
+class TableRow(MutableMapping[str, Any]):
+    """A row of a table report, as a mapping of column names to values.
+
+    Rows of a response share one :class:`TableHeader` and only hold a list of cells,
+    instead of a dictionary repeating every column name. Keys missing from the header
+    are kept in a dictionary, created when the first one is set.
+    """
+
+    __slots__ = ("cells", "extra", "header")
+
+    def __init__(self, header: TableHeader, cells: list, extra: dict[str, Any] | None = None) -> None:
+        """Create a row. Use :meth:`TableHeader.row` to wrap decoded rows."""
+        self.header = header
+        self.cells = cells
+        self.extra = extra
+
+    def __getitem__(self, key: str) -> Any:  # noqa: ANN401
+        position = self.header.index.get(key)
+        if position is not None:
+            if (value := self.cells[position]) is not _MISSING:
+                return value
+        elif self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:  # noqa: ANN401
+        position = self.header.index.get(key)
+        if position is not None:
+            self.cells[position] = value
+        elif self.extra is None:
+            self.extra = {key: value}
+        else:
+            self.extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        position = self.header.index.get(key)
+        if position is not None:
+            if self.cells[position] is not _MISSING:
+                self.cells[position] = _MISSING
+                return
+        elif self.extra is not None and key in self.extra:
+            del self.extra[key]
+            return
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name, _ in self.items())
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.items())
+
+    def __repr__(self) -> str:
+        return f"TableRow({dict(self.items())!r})"
+
+    def items(self) -> _TableRowItems:
+        """Return the row's items, without looking each column up by name.
+
+        Returns:
+            A view of ``(name, value)`` pairs.
+        """
+        return _TableRowItems(self)
+
+    def copy(self) -> TableRow:
+        """Return a shallow copy sharing the header.
+
+        Returns:
+            A new row.
+        """
+        return TableRow(self.header, list(self.cells), None if self.extra is None else dict(self.extra))
+
+
+# Decoded JSON numbers that string properties are converted from
+_NUMBER_TYPES = frozenset({int, float, Decimal})
+
+
+class TransformPlan:
+    """Conversions of raw Sunwave values, compiled once from a stream's JSON schema.
+
+    The plan converts, in batches of rows:
+
+    * rows to the projected properties, if any, so the other conversions and the
+      SDK's type conformance only see those,
+    * datetime properties from Sunwave's layout to ISO 8601,
+    * numbers in ``string`` properties to strings.
+
+    The stream schemas declare their scalar properties as strings, so values of other
+    types are left to the SDK's type conformance.
+    """
+
+    def __init__(
+        self,
+        *,
+        datetime_properties: Iterable[str] = (),
+        string_properties: Iterable[str] = (),
+        projection: Iterable[str] | None = None,
+    ) -> None:
+        """Create a plan.
+
+        Args:
+            datetime_properties: Properties in Sunwave's datetime layout. These are
+                always set, to null if they're missing.
+            string_properties: Properties whose numbers are converted to strings.
+            projection: Properties to keep, in order. All are kept if None.
+        """
+        self.datetime_properties = tuple(datetime_properties)
+        self.string_properties = frozenset(string_properties)
+        self.projection = None if projection is None else tuple(projection)
+
+    @classmethod
+    def from_schema(
+        cls,
+        schema: dict,
+        *,
+        datetime_properties: Iterable[str] = (),
+        projection: Iterable[str] | None = None,
+    ) -> TransformPlan:
+        """Compile a plan from the top-level properties of a JSON schema.
+
+        Args:
+            schema: The stream's JSON schema.
+            datetime_properties: Properties in Sunwave's datetime layout.
+            projection: Properties to keep. Conversions of the others are left out.
+
+        Returns:
+            A new plan.
+        """
+        properties = schema.get("properties", {})
+        if projection is not None:
+            projection = [name for name in projection if name in properties]
+            properties = {name: properties[name] for name in projection}
+        datetime_properties = tuple(name for name in datetime_properties if projection is None or name in properties)
+        string_properties = []
+        for name, prop in properties.items():
+            if name in datetime_properties:
+                continue
+            types = prop.get("type", [])
+            types = {types} if isinstance(types, str) else set(types)
+            types.discard("null")
+            if types == {"string"}:
+                string_properties.append(name)
+        return cls(
+            datetime_properties=datetime_properties,
+            string_properties=string_properties,
+            projection=projection,
+        )
+
+    def apply(self, rows: Iterable[dict], batch_size: int = 100) -> Iterator[dict]:
+        """Convert rows in batches of ``batch_size``.
+
+        Yields:
+            Each converted row, in order.
+        """
+        rows = iter(rows)
+        while batch := list(islice(rows, batch_size)):
+            batch = self.project(batch)
+            self.apply_batch(batch)
+            yield from batch
+
+    def project(self, rows: list[dict]) -> list[dict]:
+        """Prune a batch of rows to the projected properties.
+
+        Returns:
+            New rows, or the same rows if there is no projection.
+        """
+        if (projection := self.projection) is None:
+            return rows
+        return [{name: row[name] for name in projection if name in row} for row in rows]
+
+    def apply_batch(self, rows: list[dict]) -> None:
+        """Convert a batch of rows in place, one property at a time."""
+        for name in self.datetime_properties:
+            for row in rows:
+                row[name] = normalize_sunwave_datetime(row.get(name))
+
+        if string_properties := self.string_properties:
+            for row in rows:
+                for name, value in row.items():
+                    if value.__class__ in _NUMBER_TYPES and name in string_properties:
+                        row[name] = str(value)
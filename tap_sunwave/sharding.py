@@ -0,0 +1,104 @@
+"""Split opportunity timelines between tap instances, and merge their state."""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import hashlib
+import json
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+#: Bookmark keys whose earliest value is kept when states are merged.
+EARLIEST_KEYS = frozenset(
+    {"replication_key_value", "starting_replication_value", "replication_key_signpost", "synced_until"}
+)
+#: Key of the list of per-context states in a stream state.
+PARTITIONS_KEY = "partitions"
+
+
+def shard_of(key: object, shard_count: int) -> int:
+    """Return the shard a key belongs to, the same across processes and runs.
+
+    Returns:
+        A shard index from 0 to ``shard_count - 1``.
+    """
+    digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shard_count
+
+
+def shard_key(shard_index: int, shard_count: int) -> str:
+    """Return the key of a shard's part of the stream state, e.g. ``"1/4"``."""
+    return f"{shard_index}/{shard_count}"
+
+
+def _merge(into: dict[str, Any], other: dict[str, Any], path: str = "") -> None:
+    for key, value in other.items():
+        current = into.get(key)
+        key_path = f"{path}.{key}" if path else key
+        if key not in into:
+            into[key] = copy.deepcopy(value)
+        elif isinstance(current, dict) and isinstance(value, dict):
+            _merge(current, value, key_path)
+        elif key == PARTITIONS_KEY and isinstance(current, list) and isinstance(value, list):
+            _merge_partitions(current, value, key_path)
+        elif key in EARLIEST_KEYS:
+            # Resume from the shard that got the least far
+            if value is not None and (current is None or value < current):
+                into[key] = value
+        elif isinstance(current, list) and isinstance(value, list):
+            current.extend(copy.deepcopy(item) for item in value if item not in current)
+        elif current != value:
+            msg = f"Shard states disagree on {key_path}: {current!r} != {value!r}"
+            raise ValueError(msg)
+
+
+def _merge_partitions(into: list[dict[str, Any]], other: list[dict[str, Any]], path: str) -> None:
+    for partition in other:
+        context = partition.get("context")
+        current = next((p for p in into if p.get("context") == context), None)
+        if current is None:
+            into.append(copy.deepcopy(partition))
+        else:
+            _merge(current, partition, f"{path}[{context}]")
+
+
+def merge_states(states: Sequence[dict[str, Any]]) -> dict[str, Any]:
+    """Merge the states written by the shards of a sync.
+
+    Each shard keeps its timeline state under its own key, so the shards' parts are
+    combined as is. Partition states are merged by context, keeping the earliest
+    bookmarks of every shard, and lists are merged into their union.
+
+    Returns:
+        A state each shard can resume from.
+
+    Raises:
+        ValueError: If the shards have different values for another key.
+    """
+    merged: dict[str, Any] = {}
+    for state in states:
+        _merge(merged, state)
+    return merged
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Print the merge of the state files given on the command line."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("states", nargs="+", type=Path, help="State files written by each shard.")
+    args = parser.parse_args(argv)
+    states = [json.loads(path.read_text()) for path in args.states]
+    try:
+        merged = merge_states(states)
+    except ValueError as e:
+        parser.error(str(e))
+    json.dump(merged, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,17 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
 import sys
-from datetime import datetime, timezone
-from typing import TYPE_CHECKING, ClassVar
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, ClassVar
 
 from tap_sunwave.client import SunwaveStream
+from tap_sunwave.journal import TimelineJournal
+from tap_sunwave.sharding import shard_key, shard_of
 
 if sys.version_info >= (3, 11):
     pass
@@ -21,27 +27,32 @@ else:
     from typing_extensions import override
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable
+    from collections.abc import Iterable, Sequence
 
     import requests
     from singer_sdk.helpers.types import Context
 
 
-SUNWAVE_DATETIME_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+#: Number of journal entries, in the state of the opportunity timeline stream.
+JOURNAL_LENGTH_KEY = "journal_length"
 
 
-def _normalize_sunwave_datetime(value: str | None) -> str | None:
-    """Convert Sunwave datetime format to ISO 8601.
+def _is_iso_datetime(value: str) -> bool:
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _fingerprint(record: dict) -> str:
+    """Hash a record into a short, stable fingerprint.
 
     Returns:
-        A normalized date-time string, or null if it can't be parsed.
+        A hex digest of the record's JSON representation.
     """
-    if not value:
-        return value
-    try:
-        return datetime.strptime(value, SUNWAVE_DATETIME_FORMAT).replace(tzinfo=timezone.utc).isoformat()
-    except ValueError:
-        return value
+    payload = json.dumps(record, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
 
 
 class UserStream(SunwaveStream):
@@ -49,11 +60,7 @@ class UserStream(SunwaveStream):
     path = "/api/users"
     primary_keys = ("id",)
     replication_key = None
-
-    @override
-    def post_process(self, row: dict, context: Context | None = None) -> dict | None:
-        row["created_on"] = _normalize_sunwave_datetime(row.get("created_on"))
-        return row
+    sunwave_datetime_properties = ("created_on",)
 
 
 class ReferralStream(SunwaveStream):
@@ -65,11 +72,7 @@ class ReferralStream(SunwaveStream):
     ]
     primary_keys = ("id",)
     replication_key = None
-
-    @override
-    def post_process(self, row: dict, context: Context | None = None) -> dict | None:
-        row["created_on"] = _normalize_sunwave_datetime(row.get("created_on"))
-        return row
+    sunwave_datetime_properties = ("created_on",)
 
 
 class FormsStream(SunwaveStream):
@@ -88,19 +91,28 @@ class OpportunitiesStream(SunwaveStream):
     path = "/api/opportunities/createdon/from/{start}/until/{end}"
     primary_keys = ("opportunity_id",)
     replication_key = "created_on"
+    sunwave_datetime_properties = ("created_on",)
+
+    #: Number of child contexts to collect before their timelines are synced, and fetched
+    #: concurrently if ``max_concurrent_requests`` allows.
+    child_batch_size = 100
 
     @override
-    def get_url(self, context: Context | None) -> str:
-        bookmark = self.get_starting_replication_key_value(None)
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._pending_child_contexts: list[Context] = []
+
+    @override
+    def get_date_range(self, context: Context | None) -> tuple[date, date]:
+        bookmark = self.get_starting_replication_key_value(context)
         start_date = datetime.fromisoformat(bookmark or self.config["start_date"])
-        end_date = datetime.now(tz=timezone.utc)
-        path = self.path.format(start=start_date.strftime("%Y-%m-%d"), end=end_date.strftime("%Y-%m-%d"))
-        return f"{self.url_base}{path}"
+        return start_date.date(), datetime.now(tz=timezone.utc).date()
 
     @override
-    def post_process(self, row: dict, context: Context | None = None) -> dict | None:
-        row["created_on"] = _normalize_sunwave_datetime(row.get("created_on"))
-        return row
+    def get_url(self, context: Context | None) -> str:
+        assert context is not None  # noqa: S101
+        path = self.path.format(start=context["window_start"], end=context["window_end"])
+        return f"{self.url_base}{path}"
 
     @override
     def get_child_context(self, record: dict, context: Context | None) -> Context | None:
@@ -108,6 +120,90 @@ class OpportunitiesStream(SunwaveStream):
             return {"opportunity_id": record["opportunity_id"]}
         return None
 
+    @cached_property
+    def timeline_stream(self) -> OpportunityTimelineStream | None:
+        """Return the opportunity timeline child stream, if it is selected."""
+        for child_stream in self.child_streams:
+            if isinstance(child_stream, OpportunityTimelineStream) and child_stream.selected:
+                return child_stream
+        return None
+
+    @cached_property
+    @override
+    def projected_properties(self) -> tuple[str, ...] | None:
+        # Fingerprints hash whole records, see ``skip_unchanged_timelines``
+        if self.timeline_stream and self.config["skip_unchanged_timelines"]:
+            return None
+        return super().projected_properties
+
+    def in_shard(self, opportunity_id: str) -> bool:
+        """Return whether this instance syncs an opportunity's timeline, see ``shard_count``."""
+        shard_count = self.config["shard_count"]
+        return shard_count == 1 or shard_of(opportunity_id, shard_count) == self.config["shard_index"]
+
+    @override
+    def generate_child_contexts(self, record: dict, context: Context | None) -> Iterable[Context | None]:
+        timeline_stream = self.timeline_stream
+        for child_context in super().generate_child_contexts(record, context):
+            # Other shards sync these timelines
+            if child_context is not None and not self.in_shard(child_context["opportunity_id"]):
+                continue
+            if child_context is not None and timeline_stream and timeline_stream.is_completed(child_context):
+                continue
+            if child_context is not None and timeline_stream and self.config["skip_unchanged_timelines"]:
+                fingerprint = _fingerprint(record)
+                if not timeline_stream.has_changed(child_context["opportunity_id"], fingerprint):
+                    continue
+                child_context = {**child_context, "fingerprint": fingerprint}  # noqa: PLW2901
+            yield child_context
+
+    @override
+    def get_records(self, context: Context | None) -> Iterable[dict]:
+        yield from super().get_records(context)
+        self._flush_child_contexts()
+        if self.timeline_stream is None:
+            return
+        if self.config["skip_unchanged_timelines"]:
+            self.timeline_stream.prune_fingerprints()
+        # Every timeline of this sync has been synced
+        self.timeline_stream.compact_journal()
+        self.timeline_stream.checkpoint()
+
+    @override
+    def before_checkpoint(self) -> None:
+        # Timelines of the window's opportunities must be synced before its bookmark is written
+        self._flush_child_contexts()
+
+    @override
+    def _sync_children(self, child_context: Context | None) -> None:
+        """Defer child syncs so that timelines are synced in batches.
+
+        Child contexts are buffered and synced in batches of ``child_batch_size``, in the
+        order they were received, with a STATE message after each batch. When timelines
+        can be fetched concurrently, each batch is fetched at once.
+        """
+        if child_context is None or self.timeline_stream is None:
+            super()._sync_children(child_context)
+            return
+
+        self._pending_child_contexts.append(child_context)
+        if len(self._pending_child_contexts) >= self.child_batch_size:
+            self._flush_child_contexts()
+
+    def _flush_child_contexts(self) -> None:
+        contexts, self._pending_child_contexts = self._pending_child_contexts, []
+        if not contexts:
+            return
+
+        timeline_stream = self.timeline_stream
+        if timeline_stream and timeline_stream.max_concurrent_requests > 1:
+            timeline_stream.prefetch(contexts)
+
+        for child_context in contexts:
+            super()._sync_children(child_context)
+        if timeline_stream:
+            timeline_stream.checkpoint()
+
 
 class OpportunityTimelineStream(SunwaveStream):
     """Stream for retrieving timeline data for opportunities from Sunwave."""
@@ -120,10 +216,193 @@ class OpportunityTimelineStream(SunwaveStream):
     ignore_parent_replication_keys = True
     parent_stream_type = OpportunitiesStream
     path = "/api/opportunities/{opportunity_id}/timeline"
+    rate_limit_family = "timeline"
+    sunwave_datetime_properties = ("created_on",)
+
+    #: Timelines with activity in this many days are re-fetched even if their opportunity is unchanged.
+    active_days = 14
+
+    @override
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._prefetched: dict[str, list[dict]] = {}
+        self._seen_opportunities: set[str] = set()
+        self._last_activity: str | None = None
+        self._completed: set[str] | None = None
+        self._checkpoint_due = False
+
+    @property
+    def shard_state(self) -> dict:
+        """Return the part of the stream state owned by this shard, see ``shard_count``.
+
+        Without sharding, this is the stream state itself. Shards keep their part under
+        ``shards``, keyed like ``"0/4"``, so that the states of all shards can be merged.
+        """
+        shard_count = self.config["shard_count"]
+        if shard_count == 1:
+            return self.stream_state
+        shards = self.stream_state.setdefault("shards", {})
+        return shards.setdefault(shard_key(self.config["shard_index"], shard_count), {})
+
+    @cached_property
+    def journal(self) -> TimelineJournal | None:
+        """Return the journal of the timelines synced since the parent sync started, if enabled.
+
+        Opportunity IDs are appended as each timeline completes. They are committed
+        before each STATE message, which records the number of committed entries, see
+        ``timeline_journal_path``. An interrupted sync skips these timelines when it
+        resumes, and the journal is cleared once the parent sync completes.
+        """
+        if not (path := self.config.get("timeline_journal_path")):
+            return None
+        shard_count = self.config["shard_count"]
+        name = self.name if shard_count == 1 else f"{self.name} {shard_key(self.config['shard_index'], shard_count)}"
+        return TimelineJournal(path, name)
+
+    @property
+    def completed_opportunities(self) -> set[str]:
+        """Return the opportunities whose timelines were synced by an interrupted run."""
+        if self._completed is None:
+            self._completed = set()
+            if self.journal is not None:
+                self._completed = self.journal.load(self.shard_state.get(JOURNAL_LENGTH_KEY, 0))
+        return self._completed
+
+    def is_completed(self, context: Context) -> bool:
+        """Return whether a timeline was synced by an interrupted run, see :attr:`journal`."""
+        return context["opportunity_id"] in self.completed_opportunities
+
+    def record_completed(self, context: Context) -> None:
+        """Append a synced timeline to the journal, to be committed with the next STATE message."""
+        if self.journal is None:
+            return
+        # Entries past the length in the state are dropped first
+        _ = self.completed_opportunities
+        self.journal.append(context["opportunity_id"])
+
+    def commit_journal(self) -> None:
+        """Commit the journal entries appended since the last STATE message, and record them in the state."""
+        if self.journal is None or not self.journal.pending:
+            return
+        self.shard_state[JOURNAL_LENGTH_KEY] = self.journal.commit()
+        self.state_manager.is_flushed = False
+
+    def compact_journal(self) -> None:
+        """Clear the journal once the parent sync has completed."""
+        if self.journal is not None:
+            self.journal.clear()
+        if self.shard_state.pop(JOURNAL_LENGTH_KEY, None) is not None:
+            self.state_manager.is_flushed = False
+        self._completed = set()
+
+    @property
+    def fingerprints(self) -> dict[str, list[str | None]]:
+        """Return the persisted opportunity fingerprints and last timeline activity.
+
+        Entries map an opportunity ID to ``[fingerprint, last_activity]``, where the
+        fingerprint hashes the parent record and ``last_activity`` is the latest
+        ``created_on`` seen in its timeline. They are kept in the stream state and
+        updated as each timeline completes, so an interrupted sync keeps them.
+
+        The parent stream only requests opportunities created since its bookmark, so an
+        opportunity is seldom read again once its timeline was synced: on the day of
+        the bookmark, when the parent is synced again from ``start_date``, or when a
+        sync resumes. Those are the only timelines this can skip.
+        """
+        return self.shard_state.setdefault("opportunity_fingerprints", {})
+
+    def has_changed(self, opportunity_id: str, fingerprint: str) -> bool:
+        """Check whether an opportunity's timeline may have changed since the last sync.
+
+        Args:
+            opportunity_id: The opportunity ID.
+            fingerprint: The fingerprint of the current opportunity record.
+
+        Returns:
+            True unless the opportunity record is unchanged and its timeline has been
+            inactive for at least ``active_days``.
+        """
+        self._seen_opportunities.add(opportunity_id)
+        if (previous := self.fingerprints.get(opportunity_id)) is None:
+            return True
+
+        previous_fingerprint, last_activity = previous
+        cutoff = (datetime.now(tz=timezone.utc) - timedelta(days=self.active_days)).isoformat()
+        return previous_fingerprint != fingerprint or (last_activity is not None and last_activity >= cutoff)
+
+    def prune_fingerprints(self) -> None:
+        """Drop fingerprints of opportunities that are no longer in the parent's sync window."""
+        fingerprints = self.fingerprints
+        # Timelines synced before an interruption are still in the sync window
+        for opportunity_id in fingerprints.keys() - self._seen_opportunities - self.completed_opportunities:
+            del fingerprints[opportunity_id]
+            self.state_manager.is_flushed = False
+        self._seen_opportunities.clear()
+
+    def checkpoint(self) -> None:
+        """Write the state once a batch of timelines was synced, see ``child_batch_size``.
+
+        The parent calls this instead of the SDK writing the state after every timeline,
+        so that the journal is committed once per batch, and the fingerprints of a
+        backfill aren't all written again after each timeline.
+        """
+        self._checkpoint_due = True
+        try:
+            self._write_state_message()
+        finally:
+            self._checkpoint_due = False
+
+    @override
+    def _write_state_message(self) -> None:
+        # In batch mode, the state is written once records are in written batches instead
+        if not (self._batch_state_due if self.batch_config is not None else self._checkpoint_due):
+            return
+        self.commit_journal()
+        super()._write_state_message()
+
+    def prefetch(self, contexts: Sequence[Context]) -> None:
+        """Fetch the timelines of a batch of opportunities concurrently.
+
+        The records are held until :meth:`get_records` is called for each context, so
+        the SDK still syncs one opportunity at a time and emits records and state in
+        the same order as the parent stream.
+
+        Args:
+            contexts: The child contexts to fetch timelines for.
+        """
+        with ThreadPoolExecutor(
+            max_workers=self.max_concurrent_requests,
+            thread_name_prefix=self.name,
+        ) as executor:
+            timelines = executor.map(lambda context: list(self.request_records(context)), contexts)
+            self._prefetched = {
+                context["opportunity_id"]: records for context, records in zip(contexts, timelines, strict=True)
+            }
+
+    @override
+    def get_records(self, context: Context | None) -> Iterable[dict]:
+        self._last_activity = None
+        if context is not None and (records := self._prefetched.pop(context["opportunity_id"], None)) is not None:
+            yield from records
+        else:
+            yield from super().get_records(context)
+
+        # Only remember the fingerprint once the whole timeline has been synced
+        if context is not None and "fingerprint" in context:
+            self.fingerprints[context["opportunity_id"]] = [context["fingerprint"], self._last_activity]
+            self.state_manager.is_flushed = False
+        if context is not None:
+            self.record_completed(context)
 
     @override
     def post_process(self, row: dict, context: Context | None = None) -> dict | None:
-        row["created_on"] = _normalize_sunwave_datetime(row.get("created_on"))
+        created_on = row.get("created_on")
+        if (
+            created_on
+            and _is_iso_datetime(created_on)
+            and (self._last_activity is None or created_on > self._last_activity)
+        ):
+            self._last_activity = created_on
         return row
 
 
@@ -141,17 +420,22 @@ class CensusStream(SunwaveStream):
     ]
     primary_keys = ("Admission Id",)
     replication_key = None
+    rate_limit_family = "census"
+    date_bookmarks = True
+    partitions_overlap = True
+
+    @override
+    def get_date_range(self, context: Context | None) -> tuple[date, date]:
+        return self.get_start_date(context), datetime.now(tz=timezone.utc).date()
 
     @override
     def get_url(self, context: Context | None) -> str:
         assert context is not None  # noqa: S101
 
-        start_date = datetime.fromisoformat(self.config["start_date"])
-        end_date = datetime.now(tz=timezone.utc)
         path = self.path.format(
             census_status=context["census_status"],
-            start=start_date.strftime("%Y-%m-%d"),
-            end=end_date.strftime("%Y-%m-%d"),
+            start=context["window_start"],
+            end=context["window_end"],
         )
         return f"{self.url_base}{path}"
 
@@ -162,21 +446,26 @@ class BillingReportStream(SunwaveStream):
     name = "billing_report"
     path = "/api/billing/arreport/from/{from}/until/{until}/billingentityid/{billingId}"
     replication_key = None
+    rate_limit_family = "billing"
+    # Billing rows have no primary key, so overlapping windows or lookbacks would duplicate them
+    date_windows = False
 
     @property
     @override
     def partitions(self) -> list[dict] | None:
         return [{"billing_entity_id": eid} for eid in self.config["billing_entity_ids"]]
 
+    @override
+    def get_date_range(self, context: Context | None) -> tuple[date, date]:
+        return self.get_start_date(context), datetime.now(tz=timezone.utc).date()
+
     @override
     def get_url(self, context: Context | None) -> str:
         assert context is not None  # noqa: S101
-        start_date = datetime.fromisoformat(self.config["start_date"])
-        end_date = datetime.now(tz=timezone.utc)
         path = self.path.format(
             **{
-                "from": start_date.strftime("%Y-%m-%d"),
-                "until": end_date.strftime("%Y-%m-%d"),
+                "from": context["window_start"],
+                "until": context["window_end"],
                 "billingId": context["billing_entity_id"],
             }
         )
@@ -186,11 +475,9 @@ class BillingReportStream(SunwaveStream):
     def post_process(self, row: dict, context: Context | None = None) -> dict | None:
         assert context is not None  # noqa: S101
         row["billing_entity_id"] = context["billing_entity_id"]
-        return row
+        return super().post_process(row, context)
 
     @override
     def parse_response(self, response: requests.Response) -> Iterable[dict]:
-        data = response.json()
-        headers = data.get("table_header", [])
-        for row in data.get("table_rows", []):
-            yield dict(zip(headers, row, strict=False))
+        # Rows are mappings sharing the report's header, and become dictionaries once conformed
+        yield from self.parse_table_response(response, extra_columns=("billing_entity_id",))  # type: ignore[misc]
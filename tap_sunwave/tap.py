@@ -3,13 +3,20 @@
 from __future__ import annotations
 
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
-from typing import TYPE_CHECKING
+from functools import cached_property
+from typing import TYPE_CHECKING, Any
 
+from requests.adapters import DEFAULT_POOLSIZE
 from singer_sdk import Tap
 from singer_sdk import typing as th  # JSON schema typing helpers
+from singer_sdk.exceptions import ConfigValidationError
 
 from tap_sunwave import streams
+from tap_sunwave.client import ParallelStateWriter, SunwaveRateLimiter, SunwaveSessionPool, SunwaveStream
+from tap_sunwave.metrics import SyncMetrics
+from tap_sunwave.writers import FastSingerWriter, LockingSingerWriter
 
 if sys.version_info >= (3, 12):
     from typing import override
@@ -20,6 +27,18 @@ if TYPE_CHECKING:
     from singer_sdk import Stream
 
 
+#: Stream classes by stream name, in the order they are discovered.
+STREAM_TYPES: dict[str, type[SunwaveStream]] = {
+    "form": streams.FormsStream,
+    "user": streams.UserStream,
+    "opportunity": streams.OpportunitiesStream,
+    "opportunity_timeline": streams.OpportunityTimelineStream,
+    "census": streams.CensusStream,
+    "billing_report": streams.BillingReportStream,
+    "referral": streams.ReferralStream,
+}
+
+
 def _default_date() -> str:
     return (datetime.now(tz=timezone.utc).date() - timedelta(365)).isoformat()
 
@@ -71,24 +90,429 @@ class TapSunwave(Tap):
             ),
             default=_default_date(),
         ),
+        th.Property(
+            "max_concurrent_requests",
+            th.IntegerType,
+            required=False,
+            default=1,
+            description=(
+                "Maximum number of requests to run concurrently, across all streams. "
+                "Values greater than 1 fetch opportunity timelines in parallel."
+            ),
+        ),
+        th.Property(
+            "stream_max_concurrent_requests",
+            th.ObjectType(additional_properties=th.IntegerType),
+            required=False,
+            description=(
+                "Lower `max_concurrent_requests` for individual streams, by stream name, "
+                'e.g. `{"opportunity_timeline": 2}`.'
+            ),
+        ),
+        th.Property(
+            "parallel_streams",
+            th.IntegerType,
+            required=False,
+            default=1,
+            description=(
+                "Number of top-level streams to sync at the same time. Child streams are "
+                "synced along with their parent. Requests of all streams still share "
+                "`max_concurrent_requests`."
+            ),
+        ),
+        th.Property(
+            "connection_pool_size",
+            th.IntegerType,
+            required=False,
+            description=(
+                "Number of connections to keep open to Sunwave, shared by all streams. "
+                "Defaults to twice `max_concurrent_requests`, and at least 10."
+            ),
+        ),
+        th.Property(
+            "parallel_partitions",
+            th.BooleanType,
+            required=False,
+            default=False,
+            description=(
+                "Request the partitions of the referral, census and billing streams "
+                "(statuses and billing entities) concurrently, within "
+                "`max_concurrent_requests`. Records are still written one partition at "
+                "a time, in order."
+            ),
+        ),
+        th.Property(
+            "date_window_days",
+            th.IntegerType,
+            required=False,
+            description=(
+                "Split opportunity and census requests into windows of this many days. "
+                "State is checkpointed after each window, and windows are fetched in "
+                "parallel when `max_concurrent_requests` is greater than 1. By default "
+                "the whole date range is requested at once."
+            ),
+        ),
+        th.Property(
+            "report_lookback_days",
+            th.IntegerType,
+            required=False,
+            description=(
+                "Sync census reports incrementally. Each census status keeps the last day "
+                "it requested in state, and later runs start this many days before it to "
+                "pick up late changes. Rows within the overlap are emitted again. By default "
+                "census is requested from `start_date` on every run. Billing reports are "
+                "always requested from `start_date`, since their rows have no key to "
+                "deduplicate the overlap with."
+            ),
+        ),
+        th.Property(
+            "skip_unchanged_timelines",
+            th.BooleanType,
+            required=False,
+            default=False,
+            description=(
+                "Only fetch opportunity timelines when the opportunity record changed since "
+                "the last run, or its timeline had recent activity. Fingerprints of the "
+                "opportunities in the sync window are kept in the stream state. Opportunities "
+                "are requested by creation date from their bookmark, so this only skips the "
+                "timelines of opportunities read again: on the bookmark's day, after a "
+                "resumed sync, or when the opportunity stream is synced from `start_date`."
+            ),
+        ),
+        th.Property(
+            "timeline_journal_path",
+            th.StringType,
+            required=False,
+            description=(
+                "SQLite file to journal the opportunities whose timelines were synced in. "
+                "An interrupted sync skips them when it resumes from the same state, and "
+                "the journal is cleared once the opportunity sync completes. Entries are "
+                "committed once per batch of 100 timelines, with the "
+                "STATE message that records them. The stream state only keeps the number "
+                "of journaled opportunities, so use one file "
+                "per state. Without it, an interrupted sync fetches the timelines of its "
+                "current date window again."
+            ),
+        ),
+        th.Property(
+            "response_cache",
+            th.ObjectType(
+                th.Property("path", th.StringType, description="Directory to cache responses in."),
+                th.Property(
+                    "ttl_seconds",
+                    th.IntegerType,
+                    description="Seconds to serve cached responses without contacting Sunwave, 1 day if not set.",
+                ),
+                th.Property(
+                    "max_size_mb",
+                    th.IntegerType,
+                    description="Evict the least recently used responses above this size. Unlimited if not set.",
+                ),
+                th.Property(
+                    "streams",
+                    th.ArrayType(th.StringType),
+                    description="Names of the streams to cache responses for. All streams if not set.",
+                ),
+                th.Property(
+                    "replay",
+                    th.BooleanType,
+                    description="Serve every response from the cache and fail on requests that aren't cached.",
+                ),
+            ),
+            required=False,
+            description=(
+                "Cache successful responses on disk, e.g. for the small `form` and `user` "
+                "streams or while developing. Stale responses are revalidated when Sunwave "
+                "sends an `ETag` or `Last-Modified` header. Responses are written to the "
+                "cache as they are parsed, and kept once parsed in full. Cached responses "
+                "are read whole rather than streamed. Entries are kept apart per clinic "
+                "and user, so configs can share a directory."
+            ),
+        ),
+        th.Property(
+            "row_digests",
+            th.ObjectType(
+                th.Property("path", th.StringType, description="SQLite database file to keep row digests in."),
+                th.Property(
+                    "streams",
+                    th.ArrayType(th.StringType),
+                    description="Names of the streams to detect changes for. All eligible streams if not set.",
+                ),
+                th.Property(
+                    "tombstones",
+                    th.BooleanType,
+                    description=(
+                        "Emit the primary key of every row deleted since the last run, with "
+                        "`_sdc_deleted_at` set. The property is added to the stream schemas."
+                    ),
+                ),
+                th.Property(
+                    "reset",
+                    th.BooleanType,
+                    description=(
+                        "Forget the stored digests of the synced streams before syncing them, "
+                        "so that every row is emitted again, e.g. after the target failed to "
+                        "load a run. Unset it once that run has been loaded."
+                    ),
+                ),
+            ),
+            required=False,
+            description=(
+                "Only emit new and changed rows of full-table streams such as `form`, "
+                "`user` and `referral`, by comparing a digest of each row with the last "
+                "complete run. Digests are only stored once a stream has been synced in full "
+                "and its final STATE or BATCH message has been written. Ignored when "
+                "`emit_activate_version_messages` is set, since the target would delete the "
+                "unchanged rows."
+            ),
+        ),
+        th.Property(
+            "metrics_json_path",
+            th.StringType,
+            required=False,
+            description=(
+                "Write a JSON summary of the run to this file: the time each stream spent "
+                "waiting, signing, sending, downloading, parsing, transforming and emitting, "
+                "and the requests, retries, rate limit waits and response bytes of each "
+                "endpoint. The same metrics are logged as metric points after each stream."
+            ),
+        ),
+        th.Property(
+            "metrics_prometheus_path",
+            th.StringType,
+            required=False,
+            description=(
+                "Write the run's metrics to this file in the Prometheus text format, "
+                "e.g. for the node exporter's textfile collector."
+            ),
+        ),
+        th.Property(
+            "fast_output",
+            th.BooleanType,
+            required=False,
+            default=False,
+            description=(
+                "Encode messages with orjson when it is installed, and write records to "
+                "stdout in large buffered writes instead of one write per message."
+            ),
+        ),
+        th.Property(
+            "deduplicate_partitions",
+            th.BooleanType,
+            required=False,
+            default=False,
+            description=(
+                "Emit each census admission once per run, even if more than one of the `active`, "
+                "`admitted` and `discharged` partitions returns it. The row of the first partition "
+                "in that order is kept."
+            ),
+        ),
+        th.Property(
+            "record_validation",
+            th.StringType,
+            required=False,
+            default="off",
+            allowed_values=["full", "sampled", "off"],
+            description=(
+                "Validate records against the stream schema before they are written: "
+                "`full` checks every record, `sampled` one in `record_validation_interval`. "
+                "The sync fails on the first invalid record."
+            ),
+        ),
+        th.Property(
+            "record_validation_interval",
+            th.IntegerType,
+            required=False,
+            default=1000,
+            description="Validate one record in this many when `record_validation` is `sampled`.",
+        ),
+        th.Property(
+            "shard_count",
+            th.IntegerType(minimum=1),
+            required=False,
+            default=1,
+            description=(
+                "Split opportunity timelines between this many tap instances, by a hash of "
+                "the opportunity ID. Each instance syncs the timelines of its `shard_index`, "
+                "and keeps their state apart so the states of all shards can be merged."
+            ),
+        ),
+        th.Property(
+            "shard_index",
+            th.IntegerType(minimum=0),
+            required=False,
+            default=0,
+            description="Shard of opportunity timelines synced by this instance, from 0 to `shard_count` - 1.",
+        ),
+        th.Property(
+            "rate_limits",
+            th.ObjectType(
+                th.Property("default", th.NumberType, description="Limit for endpoints without their own limit."),
+                th.Property("timeline", th.NumberType, description="Limit for opportunity timeline requests."),
+                th.Property("census", th.NumberType, description="Limit for census requests."),
+                th.Property("billing", th.NumberType, description="Limit for billing AR report requests."),
+            ),
+            required=False,
+            description=(
+                "Maximum requests per second by endpoint family, 10 if not set. The tap "
+                "slows down when Sunwave responds with 429 or 5xx errors, honouring "
+                "`Retry-After`, and gradually speeds back up to these limits."
+            ),
+        ),
     ).to_dict()
 
+    @override
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # Created up front, since streams synced in parallel threads share them
+        #: Token buckets of the endpoint families, see ``rate_limits``.
+        self.rate_limiter = SunwaveRateLimiter(self.config.get("rate_limits"))
+        #: HTTP session and cap of requests in flight, see ``max_concurrent_requests``.
+        self.session_pool = SunwaveSessionPool(
+            self.config.get("connection_pool_size")
+            or max(
+                DEFAULT_POOLSIZE,
+                # Parent windows and child timelines can be in flight at the same time
+                2 * self.config["max_concurrent_requests"],
+            ),
+            max_in_flight=self.config["max_concurrent_requests"],
+        )
+        #: Timings and counters of the run, see ``metrics_json_path``.
+        self.sync_metrics = SyncMetrics()
+
+    @override
+    def _validate_config(self, *, raise_errors: bool = True) -> list[str]:
+        errors = super()._validate_config(raise_errors=raise_errors)
+        if self.config.get("shard_index", 0) >= self.config.get("shard_count", 1):
+            errors.append("shard_index must be lower than shard_count")
+            if raise_errors:
+                summary = "Config validation failed"
+                raise ConfigValidationError(summary, errors=errors)
+            self.logger.warning("Config validation failed: %s", errors[-1])
+        return errors
+
+    @property
+    def message_writer_class(self) -> type[LockingSingerWriter]:  # type: ignore[override]
+        """Return the class of the writer of Singer messages, see ``fast_output``."""
+        return FastSingerWriter if self.config.get("fast_output") else LockingSingerWriter
+
     @override
     def discover_streams(self) -> list[Stream]:
         """Return a list of discovered streams.
 
+        With an input catalog, only the selected streams and the parents of selected
+        child streams are created.
+
         Returns:
             A list of discovered streams.
         """
-        return [
-            streams.FormsStream(tap=self),
-            streams.UserStream(self),
-            streams.OpportunitiesStream(self),
-            streams.OpportunityTimelineStream(self),
-            streams.CensusStream(self),
-            streams.BillingReportStream(self),
-            streams.ReferralStream(self),
-        ]
+        names = self._catalogued_stream_names
+        return [stream_type(self) for name, stream_type in STREAM_TYPES.items() if names is None or name in names]
+
+    @override
+    def setup_mapper(self) -> None:
+        """Set up stream maps, only for the streams created by :meth:`discover_streams`.
+
+        Registering a stream copies its whole schema, so this skips the streams an input
+        catalog leaves out. Streams are registered with their own catalog entries, so
+        that maps see the schemas and keys the streams write.
+        """
+        if self._catalogued_stream_names is None:
+            super().setup_mapper()
+            return
+        super(Tap, self).setup_mapper()
+        self.mapper.register_raw_streams_from_catalog(self._singer_catalog)
+
+    @cached_property
+    def _catalogued_stream_names(self) -> set[str] | None:
+        """Return the names of the streams to create for the input catalog, or None without one."""
+        if self.input_catalog is None:
+            return None
+        names = {
+            name for name, entry in self.input_catalog.items() if entry.metadata.resolve_selection().get((), False)
+        }
+        # Child streams are synced by their parent
+        parents = {
+            parent_name
+            for name, stream_type in STREAM_TYPES.items()
+            for parent_name, parent_type in STREAM_TYPES.items()
+            if name in names and stream_type.parent_stream_type is parent_type
+        }
+        return names | parents
+
+    @override  # type: ignore[misc]
+    def sync_all(self) -> None:
+        """Sync all streams, running up to ``parallel_streams`` top-level streams at once.
+
+        The SDK marks this method as final. With the default of one stream at a time it
+        is left to the SDK; otherwise its steps are followed, with each top-level stream
+        synced in its own thread. If a stream fails, the streams already running are
+        joined and the tap state is written before the error is raised, as the SDK does
+        when the tap is terminated.
+        """
+        try:
+            if self.config.get("parallel_streams", 1) <= 1:
+                super().sync_all()
+            else:
+                self._sync_all_in_parallel()
+        finally:
+            if isinstance(self.message_writer, FastSingerWriter):
+                self.message_writer.flush()
+        self._write_metrics()
+
+    def _sync_all_in_parallel(self) -> None:
+        self._reset_state_progress_markers()
+        self._set_compatible_replication_methods()
+        if self.state:
+            self.state_writer.write_state(self.state)
+
+        top_level_streams = []
+        for stream in self.streams.values():
+            if not stream.selected and not stream.has_selected_descendents:
+                self.logger.info("Skipping deselected stream '%s'.", stream.name)
+            elif not stream.parent_stream_type:
+                top_level_streams.append(stream)
+
+        self._set_parallel_state_writer(ParallelStateWriter(self.state, self.state_writer))
+        try:
+            self._sync_in_parallel(top_level_streams)
+        finally:
+            self._set_parallel_state_writer(None)
+            # No stream is running anymore, so the state can be written as a whole
+            self.state_writer.write_state(self.state)
+
+        for stream in self.streams.values():
+            stream.log_sync_costs()
+
+    def _write_metrics(self) -> None:
+        if path := self.config.get("metrics_json_path"):
+            self.sync_metrics.write_json(path)
+        if path := self.config.get("metrics_prometheus_path"):
+            self.sync_metrics.write_prometheus(path)
+
+    def _set_parallel_state_writer(self, state_writer: ParallelStateWriter | None) -> None:
+        for stream in self.streams.values():
+            if isinstance(stream, SunwaveStream):
+                stream.parallel_state_writer = state_writer
+
+    def _sync_in_parallel(self, top_level_streams: list[Stream]) -> None:
+        """Sync streams in a pool of ``parallel_streams`` threads.
+
+        Once a stream fails, streams that haven't started yet are cancelled, and those
+        already running are waited for, so that none is left writing to the output.
+        """
+        executor = ThreadPoolExecutor(self.config["parallel_streams"], thread_name_prefix="sync")
+        try:
+            futures = [executor.submit(self._sync_stream, stream) for stream in top_level_streams]
+            for future in as_completed(futures):
+                future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _sync_stream(stream: Stream) -> None:
+        stream.sync()
+        stream.finalize_state_progress_markers()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,143 @@
+"""Singer message writers for the Sunwave tap."""
+
+from __future__ import annotations
+
+import datetime
+import sys
+import threading
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any
+
+from singer_sdk.io_base import SingerWriter
+from singer_sdk.singerlib import RecordMessage
+from singer_sdk.singerlib.json import serialize_json
+
+if sys.version_info >= (3, 12):
+    from typing import override
+else:
+    from typing_extensions import override
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from singer_sdk.singerlib import Message
+
+
+def _orjson_default(obj: Any) -> Any:  # noqa: ANN401
+    if isinstance(obj, Decimal):
+        # Only numbers that a float represents exactly, others are left to the SDK's encoder
+        as_float = float(obj)
+        if Decimal(repr(as_float)) != obj:
+            raise TypeError
+        return as_float
+    return obj.isoformat(sep="T") if isinstance(obj, datetime.datetime) else str(obj)
+
+
+def _dumps(obj: object) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return serialize_json(obj).encode()
+
+
+class LockingSingerWriter(SingerWriter):
+    """Write Singer messages to stdout from any number of threads.
+
+    Messages are serialized by the calling thread, and only the write to stdout is
+    serialized, so that lines from streams synced in parallel never interleave.
+    """
+
+    def __init__(self) -> None:
+        """Create a writer."""
+        super().__init__()
+        self._lock = threading.Lock()
+
+    @override
+    def write_message(self, message: Message) -> None:
+        """Write a message to stdout.
+
+        Args:
+            message: The message to write.
+        """
+        line = self.format_message(message) + "\n"
+        with self._lock:
+            sys.stdout.write(line)
+            sys.stdout.flush()
+
+
+class FastSingerWriter(LockingSingerWriter):
+    """Write Singer messages to stdout in large buffered writes.
+
+    Messages are encoded with orjson when it is installed, falling back to the SDK's
+    encoder for values orjson can't encode the same way, such as decimals a float can't
+    represent. The constant start of each stream's RECORD messages is only encoded once.
+
+    RECORD messages are buffered up to ``buffer_size`` bytes. Any other message flushes
+    the buffer, so a STATE message is never written before the records it covers, nor
+    held back behind them.
+    """
+
+    #: Bytes of RECORD messages to buffer before writing them out.
+    buffer_size = 256 * 1024
+
+    def __init__(self) -> None:
+        """Create a writer."""
+        super().__init__()
+        self._buffer = bytearray()
+        self._record_prefixes: dict[str, bytes] = {}
+
+    def encode(self, message: Message) -> bytes:
+        """Encode a message as a line of JSON.
+
+        Returns:
+            The line, including its newline.
+        """
+        if not isinstance(message, RecordMessage):
+            return _dumps(message.to_dict()) + b"\n"
+
+        if (prefix := self._record_prefixes.get(message.stream)) is None:
+            prefix = b'{"type":"RECORD","stream":' + _dumps(message.stream) + b',"record":'
+            self._record_prefixes[message.stream] = prefix
+        parts = [prefix, _dumps(message.record)]
+        if message.version is not None:
+            parts += (b',"version":', _dumps(message.version))
+        if message.time_extracted is not None:
+            parts += (b',"time_extracted":', _dumps(message.time_extracted))
+        parts.append(b"}\n")
+        return b"".join(parts)
+
+    @override
+    def write_message(self, message: Message) -> None:
+        """Buffer a message, and write out the buffer if it is full or the message isn't a record.
+
+        Args:
+            message: The message to write.
+        """
+        line = self.encode(message)
+        with self._lock:
+            self._buffer += line
+            if len(self._buffer) >= self.buffer_size or not isinstance(message, RecordMessage):
+                self._write_buffer()
+
+    def flush(self) -> None:
+        """Write out the buffered messages."""
+        with self._lock:
+            self._write_buffer()
+
+    def _write_buffer(self) -> None:
+        if not self._buffer:
+            return
+        # Anything written to the text layer goes first
+        sys.stdout.flush()
+        if (binary := getattr(sys.stdout, "buffer", None)) is not None:
+            binary.write(self._buffer)
+            binary.flush()
+        else:
+            sys.stdout.write(self._buffer.decode())
+            sys.stdout.flush()
+        self._buffer.clear()
@@ -0,0 +1,28 @@
+"""Shared fixtures for the tap-sunwave test suite."""
+
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from tap_sunwave.tap import TapSunwave
+
+
+@pytest.fixture
+def config() -> dict[str, Any]:
+    """Create a minimal tap configuration for testing."""
+    return {
+        "user_id": "test@example.com",
+        "client_id": "client456",
+        "client_secret": "secret789",
+        "clinic_id": "clinic123",
+        "start_date": "2024-01-01",
+        "max_concurrent_requests": 4,
+    }
+
+
+@pytest.fixture
+def tap(config: dict[str, Any]) -> TapSunwave:
+    """Create a tap instance for testing."""
+    return TapSunwave(config=config, parse_env_config=False)
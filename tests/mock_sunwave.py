@@ -0,0 +1,191 @@
+"""A local stand-in for the Sunwave API, serving synthetic data.
+
+Rows are generated from the stream schemas, so every property the tap knows about
+is populated. The server can add latency to every response, answer with 429s above
+a request rate, and answer with Sunwave's 200 responses whose body isn't JSON.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib import resources
+from typing import TYPE_CHECKING, Any
+
+from tap_sunwave import schemas
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from typing_extensions import Self
+
+#: Sunwave's ``MM/DD/YYYY hh:mm:ss AM`` layout, used for ``created_on`` values.
+CREATED_ON = "01/15/2024 10:30:00 AM"
+
+#: Body of Sunwave's error responses, which come with a 200 status code.
+ERROR_BODY = b"<html><body>An error occurred while processing your request.</body></html>"
+
+_ROUTES = {
+    "form": re.compile(r"/api/forms"),
+    "user": re.compile(r"/api/users"),
+    "referral": re.compile(r"/api/referrals/status/\w+"),
+    "opportunity": re.compile(r"/api/opportunities/createdon/from/[\d-]+/until/[\d-]+"),
+    "opportunity_timeline": re.compile(r"/api/opportunities/(?P<opportunity_id>[^/]+)/timeline"),
+    "census": re.compile(r"/api/census/\w+/from/[\d-]+/until/[\d-]+"),
+    "billing_report": re.compile(r"/api/billing/arreport/from/[\d-]+/until/[\d-]+/billingentityid/\w+"),
+}
+
+
+def load_schema(stream_name: str) -> dict:
+    """Return the JSON schema of a stream."""
+    return json.loads(resources.files(schemas).joinpath(f"{stream_name}.json").read_text())
+
+
+_VALUES_BY_TYPE: dict[str, Callable[[str, int], Any]] = {
+    "integer": lambda _, index: index,
+    "number": lambda _, index: f"{index}.50",
+    "boolean": lambda _, index: index % 2 == 0,
+    "array": lambda *_: [],
+    "object": lambda *_: {},
+    "string": lambda name, index: f"{name} {index}",
+}
+
+
+def _synthetic_value(name: str, prop: dict, index: int) -> Any:  # noqa: ANN401
+    if name == "created_on":
+        return CREATED_ON
+    types = prop.get("type", "string")
+    types = [types] if isinstance(types, str) else [type_ for type_ in types if type_ != "null"]
+    return _VALUES_BY_TYPE[types[0] if types else "string"](name, index)
+
+
+def synthetic_rows(stream_name: str, count: int, *, prefix: str = "") -> list[dict]:
+    """Return ``count`` rows with every property of a stream's schema set.
+
+    Identifiers are unique within the rows, and start with ``prefix``.
+    """
+    properties = load_schema(stream_name)["properties"]
+    rows = []
+    for i in range(count):
+        row = {name: _synthetic_value(name, prop, i) for name, prop in properties.items()}
+        for key in ("id", "opportunity_id", "Admission Id"):
+            if key in row:
+                row[key] = f"{prefix}{i}"
+        rows.append(row)
+    return rows
+
+
+class MockSunwaveServer(ThreadingHTTPServer):
+    """Serve synthetic Sunwave responses on localhost.
+
+    Attributes:
+        rows: Number of rows returned by each request, by stream name.
+        latency: Seconds to wait before answering each request.
+        rate_limit: Requests per second above which 429s are returned.
+        error_paths: Paths answered with a 200 error page.
+        requests_served: Number of requests answered so far.
+        rows_served: Number of rows returned so far.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        rows: dict[str, int],
+        *,
+        latency: float = 0,
+        rate_limit: float | None = None,
+    ) -> None:
+        """Create a server listening on a free port."""
+        super().__init__(("127.0.0.1", 0), _MockSunwaveHandler)
+        self.rows = rows
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.error_paths: set[str] = set()
+        self.requests_served = 0
+        self.rows_served = 0
+        self._lock = threading.Lock()
+        self._last_request = 0.0
+        self._bodies: dict[str, bytes] = {}
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Return the URL to use as the tap's ``url_base``."""
+        return f"http://127.0.0.1:{self.server_port}/SunwaveEMR"
+
+    def __enter__(self) -> Self:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def admit(self) -> bool:
+        """Count a request and return whether it is within the rate limit."""
+        with self._lock:
+            now = time.monotonic()
+            if self.rate_limit and now - self._last_request < 1 / self.rate_limit:
+                return False
+            self._last_request = now
+            self.requests_served += 1
+            return True
+
+    def body(self, path: str) -> bytes | None:
+        """Return the response body for a path, or None if it isn't a known endpoint."""
+        for stream_name, route in _ROUTES.items():
+            if (match := route.fullmatch(path)) is None:
+                continue
+            count = self.rows.get(stream_name, 0)
+            with self._lock:
+                self.rows_served += count
+            # Rows are unique per opportunity, other endpoints return the same rows every time
+            if prefix := match.groupdict().get("opportunity_id"):
+                return self._encode(stream_name, synthetic_rows(stream_name, count, prefix=f"{prefix}-"))
+            if stream_name not in self._bodies:
+                self._bodies[stream_name] = self._encode(stream_name, synthetic_rows(stream_name, count))
+            return self._bodies[stream_name]
+        return None
+
+    @staticmethod
+    def _encode(stream_name: str, rows: list[dict]) -> bytes:
+        if stream_name != "billing_report":
+            return json.dumps(rows).encode()
+        header = [name for name in load_schema(stream_name)["properties"] if name != "billing_entity_id"]
+        table = {"table_header": header, "table_rows": [[row[name] for name in header] for row in rows]}
+        return json.dumps(table).encode()
+
+
+class _MockSunwaveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: MockSunwaveServer
+
+    def do_GET(self) -> None:
+        path = self.path.removeprefix("/SunwaveEMR")
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if not self.server.admit():
+            self._respond(429, b"Too Many Requests", "text/plain", {"Retry-After": "1"})
+        elif path in self.server.error_paths:
+            self._respond(200, ERROR_BODY, "text/html")
+        elif (body := self.server.body(path)) is None:
+            self._respond(404, b"Not Found", "text/plain")
+        else:
+            self._respond(200, body, "application/json")
+
+    def _respond(self, status: int, body: bytes, content_type: str, headers: dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_: object) -> None:
+        pass
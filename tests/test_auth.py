@@ -2,6 +2,11 @@
 
 from __future__ import annotations
 
+import base64
+import hashlib
+import hmac
+import uuid
+from datetime import datetime, timezone
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -9,6 +14,25 @@ import requests
 
 from tap_sunwave.auth import SunwaveAuthenticator
 
+TRANSACTION_ID = uuid.UUID("12345678-1234-4678-9234-567812345678")
+NOW = 1_720_000_000.5
+
+
+def _reference_signature(authenticator: SunwaveAuthenticator, body: bytes) -> str:
+    """Sign a request without any of the authenticator's cached state."""
+    date_calc = datetime.fromtimestamp(int(NOW), timezone.utc).strftime("%a, %d %b %Y %H:%M:%S %z")
+    datetime_base_64 = base64.b64encode(date_calc.encode("utf-8")).decode("utf-8")
+    md5_payload = hashlib.md5(body).hexdigest()  # noqa: S324
+    base64_md5_payload = base64.b64encode(md5_payload.encode("utf-8")).decode("utf-8")
+    base64_md5_payload = base64_md5_payload.replace("/", "_").replace("+", "-")
+    seed_string = (
+        f"{authenticator.user_id}:{authenticator.client_id}:{datetime_base_64}:"
+        f"{authenticator.clinic_id}:{TRANSACTION_ID}:{base64_md5_payload}"
+    )
+    digest = hmac.new(authenticator.client_secret.encode("utf-8"), seed_string.encode("utf-8"), hashlib.sha512)
+    hmac_base64 = base64.b64encode(digest.digest()).decode("utf-8").replace("/", "_").replace("+", "-")
+    return f"Digest {seed_string}:{hmac_base64}"
+
 
 @pytest.fixture
 def authenticator() -> SunwaveAuthenticator:
@@ -119,3 +143,39 @@ class TestSunwaveAuthenticator:
         parts = seed_and_hmac.split(":")
         # Should have 7 parts: user_id, client_id, datetime, clinic_id, uuid, md5, hmac
         assert len(parts) == 7  # noqa: PLR2004
+
+    @pytest.mark.parametrize(
+        ("body", "raw_body"),
+        [
+            pytest.param(None, b"", id="none"),
+            pytest.param("", b"", id="empty-string"),
+            pytest.param('{"key": "välue"}', '{"key": "välue"}'.encode(), id="string"),
+            pytest.param(b"\x00\xff", b"\x00\xff", id="bytes"),
+        ],
+    )
+    def test_authenticate_request_matches_reference_signature(
+        self,
+        body: str | bytes | None,
+        raw_body: bytes,
+        authenticator: SunwaveAuthenticator,
+        mock_request: MagicMock,
+    ) -> None:
+        """Test that the cached signing state produces the same signature as signing from scratch."""
+        mock_request.body = body
+
+        with (
+            patch("tap_sunwave.auth.time.time", return_value=NOW),
+            patch("tap_sunwave.auth.uuid.uuid4", return_value=TRANSACTION_ID),
+        ):
+            result = authenticator.authenticate_request(mock_request)
+
+        assert result.headers["Authorization"] == _reference_signature(authenticator, raw_body)
+
+    def test_encoded_date_is_refreshed_every_second(self, authenticator: SunwaveAuthenticator) -> None:
+        """Test that the memoized date follows the clock."""
+        with patch("tap_sunwave.auth.time.time", return_value=NOW):
+            first = authenticator._get_encoded_date()  # noqa: SLF001
+        with patch("tap_sunwave.auth.time.time", return_value=NOW + 0.4):
+            assert authenticator._get_encoded_date() == first  # noqa: SLF001
+        with patch("tap_sunwave.auth.time.time", return_value=NOW + 1):
+            assert authenticator._get_encoded_date() != first  # noqa: SLF001
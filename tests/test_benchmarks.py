@@ -0,0 +1,235 @@
+"""Benchmark syncing each stream against a local stand-in for the Sunwave API.
+
+Benchmarks are marked ``benchmark`` and deselected by default. Results are recorded as
+properties of the test report, e.g. with ``pytest -m benchmark --junitxml``:
+
+* ``records_per_second`` and ``requests_per_second`` served by the stand-in,
+* ``wall_seconds`` of the sync,
+* ``peak_traced_mb``, the most memory allocated at once during the sync, in a separate run,
+* ``messages_per_second`` of each Singer writer, and the ``speedup`` of ``fast_output``,
+* ``records_per_second`` of the SDK's and the compiled record conformance, and its ``speedup``,
+* ``signatures_per_second`` of the request authenticator,
+* ``import_seconds`` and ``about_seconds``, the cold start of the ``tap-sunwave`` entry point.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+from singer_sdk.exceptions import FatalAPIError
+from singer_sdk.helpers._typing import conform_record_data_types
+from singer_sdk.helpers.conform import TypeConformanceLevel
+from singer_sdk.singerlib import RecordMessage, SelectionMask
+
+from tap_sunwave.auth import SunwaveAuthenticator
+from tap_sunwave.client import SunwaveStream, TokenBucket
+from tap_sunwave.conformance import RecordConformer
+from tap_sunwave.parsing import TransformPlan
+from tap_sunwave.writers import FastSingerWriter, LockingSingerWriter
+from tests.mock_sunwave import ERROR_BODY, MockSunwaveServer, load_schema, synthetic_rows
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+    from tap_sunwave.tap import TapSunwave
+
+#: Rows returned by each request. Opportunity timelines are fetched once per opportunity.
+ROWS = {
+    "form": 2_000,
+    "user": 2_000,
+    "referral": 1_000,
+    "opportunity": 100,
+    "opportunity_timeline": 20,
+    "census": 1_000,
+    "billing_report": 1_000,
+}
+
+#: Streams synced by the benchmarks, opportunity timelines along with their parent.
+STREAM_NAMES = ["form", "user", "referral", "opportunity", "census", "billing_report"]
+
+
+@pytest.fixture
+def server() -> Iterator[MockSunwaveServer]:
+    """Serve synthetic data with a few milliseconds of latency per request."""
+    with MockSunwaveServer(ROWS, latency=0.005) as server:
+        yield server
+
+
+@pytest.fixture
+def config(config: dict[str, Any]) -> dict[str, Any]:
+    """Sync one billing entity."""
+    return {**config, "billing_entity_ids": ["1"]}
+
+
+@pytest.fixture
+def local_tap(tap: TapSunwave, server: MockSunwaveServer) -> Iterator[TapSunwave]:
+    """Point the tap at the stand-in server, without client-side rate limits or output."""
+    with (
+        patch.object(SunwaveStream, "url_base", server.url),
+        patch.object(SunwaveStream, "rate_limiter", TokenBucket(10_000)),
+        open(os.devnull, "w") as devnull,  # noqa: PTH123
+        contextlib.redirect_stdout(devnull),
+    ):
+        yield tap
+
+
+class TestMockSunwaveServer:
+    """Tests for the stand-in server itself."""
+
+    def test_synthetic_rows_cover_the_schema(self) -> None:
+        """Test that rows have every schema property and unique identifiers."""
+        rows = synthetic_rows("census", 3)
+        assert set(rows[0]) == set(load_schema("census")["properties"])
+        assert [row["Admission Id"] for row in rows] == ["0", "1", "2"]
+
+    def test_rate_limit(self) -> None:
+        """Test that requests above the rate limit get a 429 with ``Retry-After``."""
+        with MockSunwaveServer(ROWS, rate_limit=1) as server, requests.Session() as session:
+            assert session.get(f"{server.url}/api/forms").status_code == 200  # noqa: PLR2004
+            response = session.get(f"{server.url}/api/forms")
+        assert response.status_code == 429  # noqa: PLR2004
+        assert response.headers["Retry-After"] == "1"
+
+    def test_error_pages_are_fatal(self, local_tap: TapSunwave, server: MockSunwaveServer) -> None:
+        """Test that the tap rejects Sunwave's 200 responses that aren't JSON."""
+        server.error_paths.add("/api/forms")
+        with pytest.raises(FatalAPIError, match="forms"):
+            local_tap.streams["form"].sync()
+        assert ERROR_BODY.startswith(b"<html>")
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("stream_name", STREAM_NAMES)
+def test_sync_throughput(
+    local_tap: TapSunwave,
+    server: MockSunwaveServer,
+    stream_name: str,
+    record_property: Callable[[str, object], None],
+) -> None:
+    """Benchmark a full sync of a stream, including the opportunity timeline fan-out."""
+    start = time.perf_counter()
+    local_tap.streams[stream_name].sync()
+    wall = time.perf_counter() - start
+
+    records_per_second = server.rows_served / wall
+    record_property("records_per_second", round(records_per_second))
+    record_property("requests_per_second", round(server.requests_served / wall, 1))
+    record_property("wall_seconds", round(wall, 3))
+    assert server.rows_served > 0
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("stream_name", STREAM_NAMES)
+def test_sync_memory(local_tap: TapSunwave, stream_name: str, record_property: Callable[[str, object], None]) -> None:
+    """Measure the memory allocated by a sync, apart from its throughput since tracing slows it down."""
+    tracemalloc.start()
+    try:
+        local_tap.streams[stream_name].sync()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    record_property("peak_traced_mb", round(peak / 1024 / 1024, 1))
+
+
+@pytest.mark.benchmark
+def test_writer_throughput(record_property: Callable[[str, object], None]) -> None:
+    """Benchmark writing wide census records with the default and the ``fast_output`` writer."""
+    pytest.importorskip("orjson")
+    time_extracted = datetime.now(tz=timezone.utc)
+    messages = [
+        RecordMessage(stream="census", record=row, time_extracted=time_extracted)
+        for row in synthetic_rows("census", 5_000)
+    ]
+
+    walls = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):  # noqa: PTH123
+        for writer in (LockingSingerWriter(), FastSingerWriter()):
+            start = time.perf_counter()
+            for message in messages:
+                writer.write_message(message)
+            if isinstance(writer, FastSingerWriter):
+                writer.flush()
+            walls[type(writer).__name__] = time.perf_counter() - start
+
+    for name, wall in walls.items():
+        record_property(f"{name}_messages_per_second", round(len(messages) / wall))
+    speedup = walls["LockingSingerWriter"] / walls["FastSingerWriter"]
+    record_property("speedup", round(speedup, 2))
+
+
+@pytest.mark.benchmark
+def test_conformance_throughput(record_property: Callable[[str, object], None]) -> None:
+    """Benchmark conforming wide census records with the SDK and the compiled conformer."""
+    schema = load_schema("census")
+    rows = list(TransformPlan.from_schema(schema).apply(synthetic_rows("census", 5_000)))
+    logger = logging.getLogger("tap-sunwave")
+    conformer = RecordConformer("census", schema, SelectionMask(), logger)
+
+    start = time.perf_counter()
+    for row in rows:
+        conform_record_data_types("census", row, schema, TypeConformanceLevel.RECURSIVE, logger)
+    sdk_wall = time.perf_counter() - start
+    start = time.perf_counter()
+    for row in rows:
+        conformer.conform(row)
+    compiled_wall = time.perf_counter() - start
+
+    record_property("sdk_records_per_second", round(len(rows) / sdk_wall))
+    record_property("compiled_records_per_second", round(len(rows) / compiled_wall))
+    speedup = sdk_wall / compiled_wall
+    record_property("speedup", round(speedup, 2))
+
+
+@pytest.mark.benchmark
+def test_signing_throughput(record_property: Callable[[str, object], None]) -> None:
+    """Benchmark signing GET requests, which the tap does once per request and retry."""
+    authenticator = SunwaveAuthenticator(
+        user_id="test@example.com",
+        clinic_id="clinic123",
+        client_id="client456",
+        client_secret="secret789",  # noqa: S106
+    )
+    request = MagicMock(spec=requests.PreparedRequest)
+    request.body = None
+    request.headers = {}
+    signatures = 5_000
+
+    start = time.perf_counter()
+    for _ in range(signatures):
+        authenticator.authenticate_request(request)
+    wall = time.perf_counter() - start
+
+    record_property("signatures_per_second", round(signatures / wall))
+
+
+@pytest.mark.benchmark
+def test_cold_start(record_property: Callable[[str, object], None]) -> None:
+    """Benchmark importing the tap and running ``--about`` in a fresh interpreter."""
+    importtime = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import tap_sunwave.tap"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    match = re.search(r"\|\s*(\d+) \| tap_sunwave\.tap$", importtime, re.MULTILINE)
+    assert match is not None
+    import_seconds = int(match[1]) / 1e6
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "tap_sunwave", "--about"], capture_output=True, check=True)
+    about_seconds = time.perf_counter() - start
+
+    record_property("import_seconds", round(import_seconds, 3))
+    record_property("about_seconds", round(about_seconds, 3))
@@ -0,0 +1,188 @@
+"""Test the on-disk response cache."""
+
+from __future__ import annotations
+
+import io
+import json
+import os
+import time
+from typing import TYPE_CHECKING, Any
+from unittest.mock import patch
+
+import pytest
+import requests
+from singer_sdk.exceptions import FatalAPIError
+
+from tap_sunwave.cache import ResponseCache
+from tap_sunwave.client import SunwaveStream
+from tap_sunwave.tap import TapSunwave
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def _response(body: bytes, status: int = 200, **headers: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.url = "https://example.com/api/forms"
+    response.headers.update(headers)
+    response.raw = io.BytesIO(body)
+    return response
+
+
+def _request(url: str = "https://example.com/api/forms") -> requests.PreparedRequest:
+    return requests.Request("GET", url, headers={"Authorization": "Digest abc"}).prepare()
+
+
+class TestResponseCache:
+    """Tests for ResponseCache."""
+
+    def test_put_and_get(self, tmp_path: Path) -> None:
+        """Test that bodies and validators are cached per request, ignoring auth."""
+        cache = ResponseCache(tmp_path, ttl=60)
+        request = _request()
+        cache.put(cache.key(request), _response(b"[1]", ETag='"v1"', Server="nginx"))
+
+        other = _request()
+        other.headers["Authorization"] = "Digest xyz"
+        cached = cache.get(cache.key(other))
+        assert cached is not None
+        assert cached.body == b"[1]"
+        assert cached.headers == {"ETag": '"v1"'}
+        assert cached.validators == {"If-None-Match": '"v1"'}
+        assert cached.to_response(other).json() == [1]
+        assert cache.get(cache.key(_request("https://example.com/api/users"))) is None
+
+    def test_entries_are_kept_per_identity(self, tmp_path: Path) -> None:
+        """Test that caches sharing a directory for different clinics don't share entries."""
+        cache = ResponseCache(tmp_path, ttl=60, identity='["clinic1", "user"]')
+        cache.put(cache.key(_request()), _response(b"[1]"))
+
+        other = ResponseCache(tmp_path, ttl=60, identity='["clinic2", "user"]')
+        assert other.get(other.key(_request())) is None
+        assert cache.get(cache.key(_request())) is not None
+
+    def test_least_recently_used_entries_are_evicted(self, tmp_path: Path) -> None:
+        """Test that entries are evicted by last use once over the size limit."""
+        cache = ResponseCache(tmp_path, ttl=60, max_size=25)
+        keys = [cache.key(_request(f"https://example.com/{i}")) for i in range(3)]
+        for i, key in enumerate(keys[:2]):
+            cache.put(key, _response(b"x" * 10))
+            os.utime(tmp_path / f"{key}.body", (i, i))
+
+        cache.get(keys[0])
+        cache.put(keys[2], _response(b"x" * 10))
+
+        assert [cache.get(key) is not None for key in keys] == [True, False, True]
+
+
+class TestStreamResponseCache:
+    """Tests for serving stream requests from the response cache."""
+
+    @pytest.fixture
+    def config(self, config: dict[str, Any], tmp_path: Path) -> dict[str, Any]:
+        """Cache responses of the form stream."""
+        return {**config, "response_cache": {"path": str(tmp_path), "ttl_seconds": 60, "streams": ["form"]}}
+
+    @pytest.fixture
+    def stream(self, tap: TapSunwave) -> SunwaveStream:
+        """Return the form stream."""
+        stream = tap.streams["form"]
+        assert isinstance(stream, SunwaveStream)
+        return stream
+
+    def test_only_listed_streams_are_cached(self, tap: TapSunwave, stream: SunwaveStream) -> None:
+        """Test that the cache is limited to the configured streams."""
+        user = tap.streams["user"]
+        assert isinstance(user, SunwaveStream)
+        assert stream.response_cache is not None
+        assert user.response_cache is None
+
+    def test_fresh_responses_are_served_from_cache(self, stream: SunwaveStream) -> None:
+        """Test that a second request within the TTL isn't sent, and the first is streamed."""
+        response = _response(b'[{"id": 1}, {"id": 2}]')
+        with patch.object(SunwaveStream, "_send_request", return_value=response) as send:
+            first = list(stream.request_records(None))
+            second = list(stream.request_records(None))
+
+        assert send.call_count == 1
+        assert first == second
+        assert len(first) == 2  # noqa: PLR2004
+        assert response._content is False  # noqa: SLF001
+
+    def test_clinics_sharing_a_cache_are_kept_apart(self, config: dict[str, Any], stream: SunwaveStream) -> None:
+        """Test that a config for another clinic doesn't get the responses of the first."""
+        other = TapSunwave(config={**config, "clinic_id": "other"}, parse_env_config=False).streams["form"]
+        assert isinstance(other, SunwaveStream)
+        with patch.object(SunwaveStream, "_send_request", side_effect=lambda *_: _response(b'[{"id": 1}]')) as send:
+            list(stream.request_records(None))
+            list(other.request_records(None))
+
+        assert send.call_count == 2  # noqa: PLR2004
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            pytest.param(b"<html>Internal error</html>", id="error-page"),
+            pytest.param(b' {"error": "Invalid clinic"}', id="error-object"),
+            pytest.param(b'{"table_rows": [', id="truncated-object"),
+        ],
+    )
+    def test_error_bodies_are_not_cached(self, stream: SunwaveStream, tmp_path: Path, body: bytes) -> None:
+        """Test that Sunwave's errors sent with a 200 status are requested again."""
+        with patch.object(SunwaveStream, "_send_request", side_effect=lambda *_: _response(body)) as send:
+            for _ in range(2):
+                with pytest.raises(FatalAPIError):
+                    list(stream.request_records(None))
+
+        assert send.call_count == 2  # noqa: PLR2004
+        assert list(tmp_path.iterdir()) == []
+
+    def test_partly_read_responses_are_not_cached(self, stream: SunwaveStream, tmp_path: Path) -> None:
+        """Test that a response is only stored once it was read in full."""
+        # More records than the transforms take at once
+        body = json.dumps([{"id": i} for i in range(300)]).encode()
+        with patch.object(SunwaveStream, "_send_request", side_effect=lambda *_: _response(body)):
+            records = iter(stream.request_records(None))
+            next(records)
+            records.close()  # type: ignore[attr-defined]
+
+        assert list(tmp_path.iterdir()) == []
+
+    def test_stale_responses_are_revalidated(self, stream: SunwaveStream) -> None:
+        """Test that stale responses are revalidated and served on 304."""
+        cache = stream.response_cache
+        assert cache is not None
+        cache.put(cache.key(_request()), _response(b"[1]", ETag='"v1"'))
+
+        request = _request()
+        not_modified = _response(b"", 304)
+        with (
+            patch.object(SunwaveStream, "_send_request", return_value=not_modified) as send,
+            patch.object(not_modified, "close") as close,
+            patch("tap_sunwave.cache.time.time", return_value=time.time() + 120),
+        ):
+            response = stream._request(request, None)  # noqa: SLF001
+            cached = cache.get(cache.key(request))
+
+        assert send.call_args.args[0].headers["If-None-Match"] == '"v1"'
+        close.assert_called_once_with()
+        assert response.json() == [1]
+        assert cached is not None
+        assert cached.age() < 1
+
+    def test_replay_fails_for_uncached_requests(self, stream: SunwaveStream, config: dict[str, Any]) -> None:
+        """Test that replay mode serves stale entries and never sends requests."""
+        cache = stream.response_cache
+        assert cache is not None
+        cache.put(cache.key(_request()), _response(b"[1]"))
+
+        replay_config = {**config, "response_cache": {**config["response_cache"], "replay": True}}
+        with (
+            patch.object(SunwaveStream, "config", replay_config),
+            patch.object(SunwaveStream, "_send_request", side_effect=AssertionError),
+            patch("tap_sunwave.cache.time.time", return_value=time.time() + 120),
+        ):
+            assert stream._request(_request(), None).json() == [1]  # noqa: SLF001
+            with pytest.raises(FatalAPIError, match="replay mode"):
+                stream._request(_request("https://example.com/api/users"), None)  # noqa: SLF001
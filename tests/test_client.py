@@ -0,0 +1,465 @@
+"""Test the SunwaveStream base class and its helpers."""
+
+from __future__ import annotations
+
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from email.utils import format_datetime
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any
+from unittest.mock import MagicMock, patch
+
+import backoff
+import pytest
+import requests
+from singer_sdk.exceptions import FatalAPIError, RetriableAPIError
+
+from tap_sunwave.client import SunwaveStream, TokenBucket, _parse_retry_after, iter_concurrently
+from tap_sunwave.tap import TapSunwave
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+class TestTokenBucket:
+    """Tests for the adaptive TokenBucket."""
+
+    def test_acquire_within_capacity_does_not_wait(self) -> None:
+        """Test that a burst up to the bucket capacity is not delayed."""
+        bucket = TokenBucket(5)
+        assert sum(bucket.acquire() for _ in range(5)) == 0
+
+    def test_acquire_waits_for_tokens(self) -> None:
+        """Test that requests beyond the capacity are spread out at the rate."""
+        bucket = TokenBucket(50)
+        for _ in range(50):
+            bucket.acquire()
+
+        start = time.monotonic()
+        bucket.acquire()
+        assert time.monotonic() - start >= 0.01  # noqa: PLR2004
+
+    def test_throttle_halves_rate_down_to_minimum(self) -> None:
+        """Test that throttling decreases the rate multiplicatively."""
+        bucket = TokenBucket(8, min_rate=1)
+        bucket.throttle()
+        assert bucket.rate == 4  # noqa: PLR2004
+        for _ in range(10):
+            bucket.throttle()
+        assert bucket.rate == 1
+
+    def test_recover_climbs_back_to_maximum(self) -> None:
+        """Test that successful requests restore the rate additively."""
+        bucket = TokenBucket(10, recovery_steps=10)
+        bucket.throttle()
+        bucket.recover()
+        assert bucket.rate == 6  # noqa: PLR2004
+        for _ in range(10):
+            bucket.recover()
+        assert bucket.rate == 10  # noqa: PLR2004
+
+    def test_retry_after_pauses_requests(self) -> None:
+        """Test that a Retry-After hint pauses the bucket."""
+        bucket = TokenBucket(100)
+        bucket.throttle(retry_after=0.05)
+        assert bucket.acquire() >= 0.04  # noqa: PLR2004
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        pytest.param(None, None, id="missing"),
+        pytest.param("", None, id="empty"),
+        pytest.param("3", 3.0, id="seconds"),
+        pytest.param("-1", 0.0, id="negative"),
+        pytest.param("soon", None, id="invalid"),
+    ],
+)
+def test_parse_retry_after(value: str | None, expected: float | None) -> None:
+    """Test parsing of Retry-After headers given in seconds."""
+    assert _parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date() -> None:
+    """Test parsing of Retry-After headers given as an HTTP date."""
+    value = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    retry_after = _parse_retry_after(value)
+    assert retry_after is not None
+    assert 25 < retry_after <= 30  # noqa: PLR2004
+
+
+class TestSunwaveStreamRateLimiting:
+    """Tests for the rate limiter hooks in SunwaveStream._request."""
+
+    def test_retriable_error_throttles_family(self, tap: TapSunwave) -> None:
+        """Test that a 429 response slows down the stream's endpoint family."""
+        stream = tap.streams["census"]
+        assert isinstance(stream, SunwaveStream)
+        response = requests.Response()
+        response.status_code = 429
+        response.headers["Retry-After"] = "7"
+        request = MagicMock(spec=requests.PreparedRequest, body=None, headers={})
+
+        with (
+            patch.object(SunwaveStream, "_send_signed", side_effect=RetriableAPIError("slow down", response)),
+            patch.object(stream.rate_limiter, "acquire", return_value=0.0) as acquire,
+            patch.object(stream.rate_limiter, "throttle") as throttle,
+            pytest.raises(RetriableAPIError),
+        ):
+            stream._request(request, None)  # noqa: SLF001
+
+        acquire.assert_called_once()
+        throttle.assert_called_once_with(7.0)
+
+    def test_families_share_buckets_across_streams(self, tap: TapSunwave) -> None:
+        """Test that streams in the same family share one bucket."""
+        form, user, census = (tap.streams[name] for name in ("form", "user", "census"))
+        assert isinstance(form, SunwaveStream)
+        assert isinstance(user, SunwaveStream)
+        assert isinstance(census, SunwaveStream)
+        assert form.rate_limiter is user.rate_limiter
+        assert census.rate_limiter is not user.rate_limiter
+
+    def test_taps_have_their_own_limits(self, tap: TapSunwave, config: dict[str, Any]) -> None:
+        """Test that each tap's streams share buckets with the rates of that tap's config."""
+        other = TapSunwave(config={**config, "rate_limits": {"census": 2}}, parse_env_config=False)
+        census, other_census = tap.streams["census"], other.streams["census"]
+        assert isinstance(census, SunwaveStream)
+        assert isinstance(other_census, SunwaveStream)
+        assert census.rate_limiter is not other_census.rate_limiter
+        assert other_census.rate_limiter.max_rate == 2  # noqa: PLR2004
+        assert census.rate_limiter.max_rate != 2  # noqa: PLR2004
+
+
+class TestIterConcurrently:
+    """Tests for the ordered concurrent producer helper."""
+
+    @staticmethod
+    def _slow_range(start: int, delay: float) -> Iterator[int]:
+        time.sleep(delay)
+        yield from range(start, start + 3)
+
+    def test_output_keeps_submission_order(self) -> None:
+        """Test that results are yielded in order even if later producers finish first."""
+        producers = [lambda i=i: self._slow_range(i * 10, 0.05 - i * 0.01) for i in range(5)]
+        results = [list(items) for items in iter_concurrently(producers, max_workers=5, buffer_size=1)]
+        assert results == [[i * 10, i * 10 + 1, i * 10 + 2] for i in range(5)]
+
+    def test_producer_errors_are_raised_in_order(self) -> None:
+        """Test that a failing producer raises when its output is consumed."""
+
+        def fail() -> Iterator[int]:
+            yield 1
+            msg = "boom"
+            raise ValueError(msg)
+
+        results = iter_concurrently([lambda: iter([0]), fail], max_workers=2)
+        assert list(next(results)) == [0]
+        failing = next(results)
+        assert next(failing) == 1
+        with pytest.raises(ValueError, match="boom"):
+            next(failing)
+
+    def test_queued_producers_are_cancelled(self) -> None:
+        """Test that producers that haven't started don't run once the consumer stops."""
+        started: list[int] = []
+
+        def producer(i: int) -> Iterator[int]:
+            started.append(i)
+            if i:
+                time.sleep(0.1)
+            yield i
+
+        results = iter_concurrently([partial(producer, i) for i in range(10)], max_workers=2)
+        assert list(next(results)) == [0]
+        results.close()
+        # The second producer, and the one started once the first was done
+        assert set(started) <= {0, 1, 2}
+
+    def test_closing_does_not_wait_for_running_producers(self) -> None:
+        """Test that closing returns at once, so a generator collected in a pool thread can't deadlock."""
+        started = threading.Event()
+
+        def slow() -> Iterator[int]:
+            started.set()
+            yield from self._slow_range(0, 1)
+
+        results = iter_concurrently([lambda: iter([0]), slow], max_workers=2)
+        assert list(next(results)) == [0]
+        assert started.wait(timeout=5)
+
+        start = time.perf_counter()
+        results.close()
+        assert time.perf_counter() - start < 0.5  # noqa: PLR2004
+
+
+class TestDateWindows:
+    """Tests for splitting date ranges into request windows."""
+
+    @pytest.mark.parametrize(
+        ("window_days", "expected"),
+        [
+            pytest.param(None, [("2024-01-01", "2024-01-20")], id="disabled"),
+            pytest.param(
+                7,
+                [("2024-01-01", "2024-01-08"), ("2024-01-08", "2024-01-15"), ("2024-01-15", "2024-01-20")],
+                id="weekly",
+            ),
+            pytest.param(30, [("2024-01-01", "2024-01-20")], id="larger-than-range"),
+        ],
+    )
+    def test_get_date_windows(
+        self,
+        tap: TapSunwave,
+        config: dict,
+        window_days: int | None,
+        expected: list[tuple[str, str]],
+    ) -> None:
+        """Test that windows cover the range and share their boundary days."""
+        config["date_window_days"] = window_days
+        stream = tap.streams["census"]
+        assert isinstance(stream, SunwaveStream)
+        with patch.object(type(stream), "config", config):
+            windows = stream.get_date_windows(date(2024, 1, 1), date(2024, 1, 20))
+        assert [(start.isoformat(), end.isoformat()) for start, end in windows] == expected
+
+
+def _response(body: bytes) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.url = "https://emr.sunwavehealth.com/SunwaveEMR/api/test"
+    response.raw = io.BytesIO(body)
+    return response
+
+
+class _DroppedBody(io.BytesIO):
+    """A response body whose connection drops once the bytes received are read."""
+
+    def read(self, size: int | None = -1) -> bytes:
+        if not (data := super().read(size)):
+            raise requests.exceptions.ChunkedEncodingError
+        return data
+
+
+class TestReadRecords:
+    """Tests for requesting and reading the records of a context."""
+
+    BODY = b'[{"id": 1}, {"id": 2}, {"id": 3}]'
+
+    def test_failed_reads_are_retried(self, tap: TapSunwave) -> None:
+        """Test that the request is sent again when reading fails, without duplicating records."""
+        stream = tap.streams["user"]
+        assert isinstance(stream, SunwaveStream)
+        dropped = _response(b"")
+        dropped.raw = _DroppedBody(self.BODY[:14])
+
+        with (
+            patch.object(SunwaveStream, "_request", side_effect=[dropped, _response(self.BODY)]) as request,
+            patch.object(SunwaveStream, "backoff_wait_generator", lambda _: backoff.constant(interval=0)),
+            patch.object(SunwaveStream, "backoff_jitter", lambda _, value: value),
+            patch.object(requests.Response, "close", autospec=True) as close,
+        ):
+            assert [record["id"] for record in stream.request_records(None)] == ["1", "2", "3"]
+
+        assert request.call_count == 2  # noqa: PLR2004
+        assert close.call_count == 2  # noqa: PLR2004
+
+    @pytest.mark.parametrize("primary_keys", [pytest.param(("id",), id="by-key"), pytest.param((), id="by-digest")])
+    def test_retried_reads_resume_in_any_order(self, tap: TapSunwave, primary_keys: tuple[str, ...]) -> None:
+        """Test that records already read are skipped when the retried response is ordered differently."""
+        stream = tap.streams["user"]
+        assert isinstance(stream, SunwaveStream)
+        dropped = _response(b"")
+        dropped.raw = _DroppedBody(self.BODY[:14])
+        reordered = _response(b'[{"id": 3}, {"id": 2}, {"id": 1}]')
+
+        with (
+            patch.object(SunwaveStream, "_request", side_effect=[dropped, reordered]),
+            patch.object(SunwaveStream, "primary_keys", primary_keys),
+            patch.object(SunwaveStream, "backoff_wait_generator", lambda _: backoff.constant(interval=0)),
+            patch.object(SunwaveStream, "backoff_jitter", lambda _, value: value),
+        ):
+            assert [record["id"] for record in stream.request_records(None)] == ["1", "3", "2"]
+
+    def test_rejected_responses_are_closed(self, tap: TapSunwave) -> None:
+        """Test that a response failing validation releases its connection before the retry."""
+        stream = tap.streams["user"]
+        assert isinstance(stream, SunwaveStream)
+        unavailable = _response(b"")
+        unavailable.status_code = 503
+        with (
+            patch.object(stream.requests_session, "send", return_value=unavailable),
+            patch.object(unavailable, "close") as close,
+            pytest.raises(RetriableAPIError),
+        ):
+            stream._send_signed(stream.prepare_request(None, None), None)  # noqa: SLF001
+
+        close.assert_called_once_with()
+
+    def test_response_is_closed_when_parsing_stops(self, tap: TapSunwave) -> None:
+        """Test that a response that isn't read to the end releases its connection."""
+        stream = tap.streams["user"]
+        assert isinstance(stream, SunwaveStream)
+        # Longer than a batch of transformed records
+        body = b"[" + b",".join(b'{"id": %d}' % i for i in range(300)) + b"]"
+        with (
+            patch.object(SunwaveStream, "_request", return_value=_response(body)),
+            patch.object(requests.Response, "close", autospec=True) as close,
+        ):
+            records = iter(stream.request_records(None))
+            next(records)
+            assert close.call_count == 0
+            records.close()  # type: ignore[attr-defined]
+
+        assert close.call_count == 1
+
+
+class TestParseResponse:
+    """Tests for the streaming response parsers."""
+
+    def test_array_records(self, tap: TapSunwave) -> None:
+        """Test that array responses are parsed into records with decimal floats."""
+        stream = tap.streams["user"]
+        assert isinstance(stream, SunwaveStream)
+        records = list(stream.parse_response(_response(b'[{"id": 1, "rate": 0.1}, {"id": 2}]')))
+        assert records == [{"id": 1, "rate": Decimal("0.1")}, {"id": 2}]
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            pytest.param(b"<html>Login</html>", id="not-json"),
+            pytest.param(b'{"error": "Invalid signature"}', id="error-object"),
+            pytest.param(b'[{"id": 1}, {"id":', id="truncated"),
+        ],
+    )
+    def test_error_responses_are_fatal(self, tap: TapSunwave, body: bytes) -> None:
+        """Test that Sunwave's 200 error responses raise a fatal error."""
+        stream = tap.streams["user"]
+        assert isinstance(stream, SunwaveStream)
+        with pytest.raises(FatalAPIError):
+            list(stream.parse_response(_response(body)))
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            pytest.param(b'{"table_header": ["a", "b"], "table_rows": [[1, 2], [3, 4]]}', id="header-first"),
+            pytest.param(b'{"table_rows": [[1, 2], [3, 4]], "table_header": ["a", "b"]}', id="rows-first"),
+        ],
+    )
+    def test_table_response(self, tap: TapSunwave, body: bytes) -> None:
+        """Test that table rows are zipped with the header in either order."""
+        stream = tap.streams["user"]
+        assert isinstance(stream, SunwaveStream)
+        assert list(stream.parse_table_response(_response(body))) == [{"a": 1, "b": 2}, {"a": 3, "b": 4}]
+
+    def test_table_error_response_is_fatal(self, tap: TapSunwave) -> None:
+        """Test that an error object is detected by the table parser."""
+        stream = tap.streams["user"]
+        assert isinstance(stream, SunwaveStream)
+        with pytest.raises(FatalAPIError):
+            list(stream.parse_table_response(_response(b'{"error": "Unknown billing entity"}')))
+
+    def test_requests_are_streamed(self, tap: TapSunwave) -> None:
+        """Test that response bodies are left unread until they are parsed."""
+        stream = tap.streams["user"]
+        assert isinstance(stream, SunwaveStream)
+        with patch.object(requests.Session, "send") as send:
+            stream.requests_session.send(MagicMock(spec=requests.PreparedRequest))
+        assert send.call_args.kwargs["stream"] is True
+
+
+class _EmptyListHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"[]")
+
+    def log_message(self, *_: object) -> None:
+        pass
+
+
+@pytest.fixture
+def local_server() -> Iterator[str]:
+    """Serve empty JSON lists over HTTP/1.1 on localhost."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EmptyListHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestSessionPool:
+    """Tests for the HTTP session shared by all streams."""
+
+    def test_streams_share_one_session(self, tap: TapSunwave) -> None:
+        """Test that every stream sends requests through the same pooled session."""
+        form, census = tap.streams["form"], tap.streams["census"]
+        assert isinstance(form, SunwaveStream)
+        assert isinstance(census, SunwaveStream)
+        assert form.requests_session is census.requests_session
+        assert form.requests_session.headers["Accept-Encoding"] == "gzip"
+        assert form.session_pool.adapter.poolmanager.connection_pool_kw["maxsize"] == form.session_pool.pool_size
+
+    def test_taps_have_their_own_pools(self, tap: TapSunwave, config: dict[str, Any]) -> None:
+        """Test that each tap's session and request cap follow that tap's config."""
+        other = TapSunwave(
+            config={**config, "max_concurrent_requests": 2, "connection_pool_size": 3},
+            parse_env_config=False,
+        )
+        form, other_form = tap.streams["form"], other.streams["form"]
+        assert isinstance(form, SunwaveStream)
+        assert isinstance(other_form, SunwaveStream)
+        assert form.requests_session is not other_form.requests_session
+        assert form.session_pool.max_in_flight == config["max_concurrent_requests"]
+        assert (other_form.session_pool.max_in_flight, other_form.session_pool.pool_size) == (2, 3)
+
+    def test_connections_are_reused(self, tap: TapSunwave, local_server: str) -> None:
+        """Test that sequential requests to one host reuse a kept-alive connection."""
+        stream = tap.streams["form"]
+        assert isinstance(stream, SunwaveStream)
+        requests_before, connections_before = stream.session_pool.connection_stats()
+
+        for _ in range(3):
+            assert stream.requests_session.get(local_server).content == b"[]"
+
+        requests_sent, connections = stream.session_pool.connection_stats()
+        assert requests_sent - requests_before == 3  # noqa: PLR2004
+        assert connections - connections_before == 1
+
+    def test_requests_in_flight_are_capped(self, tap: TapSunwave) -> None:
+        """Test that concurrent requests from any thread share one cap."""
+        census, form = tap.streams["census"], tap.streams["form"]
+        assert isinstance(census, SunwaveStream)
+        assert isinstance(form, SunwaveStream)
+        lock = threading.Lock()
+        in_flight = peak = 0
+
+        def fake_request(*_: object) -> requests.Response:
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.02)
+            with lock:
+                in_flight -= 1
+            return requests.Response()
+
+        request = MagicMock(spec=requests.PreparedRequest)
+        with (
+            patch.object(SunwaveStream, "_send_signed", fake_request),
+            ThreadPoolExecutor(max_workers=12) as executor,
+        ):
+            for stream in [census, form] * 6:
+                executor.submit(stream._request, request, None)  # noqa: SLF001
+
+        assert peak == census.session_pool.max_in_flight
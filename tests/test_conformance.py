@@ -0,0 +1,165 @@
+"""Test the compiled conformance of records to stream schemas."""
+
+from __future__ import annotations
+
+import copy
+import logging
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any
+from unittest.mock import patch
+
+import pytest
+from singer_sdk.exceptions import InvalidRecord
+from singer_sdk.helpers._catalog import pop_deselected_record_properties
+from singer_sdk.helpers._typing import conform_record_data_types
+from singer_sdk.helpers.conform import TypeConformanceLevel
+from singer_sdk.singerlib import SelectionMask
+
+from tap_sunwave.conformance import RecordConformer
+from tap_sunwave.parsing import TransformPlan
+from tap_sunwave.streams import CensusStream
+from tests.mock_sunwave import load_schema, synthetic_rows
+
+if TYPE_CHECKING:
+    from tap_sunwave.tap import TapSunwave
+
+LOGGER = logging.getLogger("tap-sunwave")
+
+STREAM_NAMES = ["form", "user", "referral", "opportunity", "opportunity_timeline", "census", "billing_report"]
+
+#: Values Sunwave's JSON may decode to, cycled through every property of each schema.
+EDGE_VALUES: list[Any] = [
+    None,
+    "",
+    "text",
+    0,
+    1,
+    True,
+    Decimal("1.50"),
+    Decimal("NaN"),
+    float("inf"),
+    datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+    b"\x01",
+    [],
+    [1, "a", None],
+    [{"id": 1, "name": "a"}],
+    {},
+    {"nested": {"value": 1}},
+]
+
+SCHEMA: dict = {
+    "properties": {
+        "id": {"type": ["string", "null"]},
+        "amount": {"type": ["number", "null"]},
+        "active": {"type": ["boolean", "null"]},
+        "when": {"type": ["string", "null"], "format": "date-time"},
+        "address": {
+            "type": ["object", "null"],
+            "properties": {"city": {"type": ["string", "null"]}, "zip": {"type": ["string", "null"]}},
+        },
+        "levels": {"type": ["array", "null"], "items": {"type": ["number", "null"]}},
+    },
+}
+
+
+def _sdk_conform(record: dict, schema: dict, mask: SelectionMask) -> dict:
+    pop_deselected_record_properties(record, schema, mask)
+    return conform_record_data_types("test", record, schema, TypeConformanceLevel.RECURSIVE, LOGGER)
+
+
+class TestRecordConformer:
+    """Tests for RecordConformer."""
+
+    @pytest.mark.parametrize("stream_name", STREAM_NAMES)
+    def test_stream_records_match_the_sdk(self, stream_name: str) -> None:
+        """Test that records of every stream are conformed like the SDK does."""
+        schema = load_schema(stream_name)
+        rows = list(TransformPlan.from_schema(schema).apply(synthetic_rows(stream_name, 3)))
+        conformer = RecordConformer(stream_name, schema, SelectionMask(), LOGGER)
+        for row in rows:
+            assert conformer.conform(copy.deepcopy(row)) == _sdk_conform(row, schema, SelectionMask())
+
+    @pytest.mark.parametrize("stream_name", STREAM_NAMES)
+    def test_stream_edge_values_match_the_sdk(self, stream_name: str) -> None:
+        """Test that every property of every stream conforms any value like the SDK does.
+
+        The conformer relies on private SDK helpers, so this guards against their
+        behavior changing in an SDK release.
+        """
+        schema = load_schema(stream_name)
+        names = list(schema["properties"])
+        rows = [
+            {name: EDGE_VALUES[(i + offset) % len(EDGE_VALUES)] for i, name in enumerate(names)} | {"unmapped": offset}
+            for offset in range(len(EDGE_VALUES))
+        ]
+        for mask in (SelectionMask(), SelectionMask({("properties", names[0]): False})):
+            conformer = RecordConformer(stream_name, schema, mask, LOGGER)
+            for row in rows:
+                assert conformer.conform(copy.deepcopy(row)) == _sdk_conform(copy.deepcopy(row), schema, mask)
+
+    @pytest.mark.parametrize(
+        "row",
+        [
+            pytest.param({"id": "1", "amount": Decimal("NaN"), "active": 1}, id="nan-and-int-boolean"),
+            pytest.param({"amount": float("inf"), "active": "yes", "extra": 1}, id="inf-and-unmapped"),
+            pytest.param({"when": datetime(2024, 1, 2, tzinfo=timezone.utc), "id": b"\x01"}, id="datetime-and-bytes"),
+            pytest.param({"address": {"city": "Miami", "zip": 33101}, "levels": [Decimal(1), None]}, id="nested"),
+            pytest.param({"address": "unknown", "levels": {"a": 1}}, id="mismatched-nested"),
+        ],
+    )
+    def test_edge_values_match_the_sdk(self, row: dict[str, Any]) -> None:
+        """Test that values the fast path doesn't handle are conformed by the SDK."""
+        conformer = RecordConformer("test", SCHEMA, SelectionMask(), LOGGER)
+        assert conformer.conform(copy.deepcopy(row)) == _sdk_conform(row, SCHEMA, SelectionMask())
+
+    def test_deselected_properties_are_removed(self) -> None:
+        """Test that deselected properties are dropped, including nested ones."""
+        mask = SelectionMask(
+            {
+                ("properties", "amount"): False,
+                ("properties", "address", "properties", "zip"): False,
+            }
+        )
+        conformer = RecordConformer("test", SCHEMA, mask, LOGGER)
+        record = {"id": "1", "amount": Decimal(1), "address": {"city": "Miami", "zip": "33101"}}
+        assert conformer.conform(record) == {"id": "1", "address": {"city": "Miami"}}
+        assert "amount" not in record
+
+    @pytest.mark.parametrize(("validate_every", "validated"), [(0, 0), (1, 4), (2, 2)])
+    def test_validation_modes(self, validate_every: int, validated: int) -> None:
+        """Test that every record, one in ``validate_every`` or none are validated."""
+        conformer = RecordConformer("test", SCHEMA, SelectionMask(), LOGGER, validate_every=validate_every)
+        with patch("singer_sdk.sinks.core.JSONSchemaValidator.validate") as validate:
+            for i in range(4):
+                conformer.conform({"id": str(i)})
+        assert validate.call_count == validated
+
+    def test_invalid_records_fail(self) -> None:
+        """Test that a validated record that doesn't match the schema raises."""
+        conformer = RecordConformer("test", SCHEMA, SelectionMask(), LOGGER, validate_every=1)
+        with pytest.raises(InvalidRecord, match="is not of type"):
+            conformer.conform({"id": "1", "amount": "n/a"})
+
+
+class TestStreamConformance:
+    """Tests for conforming the records a stream writes."""
+
+    @pytest.fixture
+    def config(self, config: dict[str, Any]) -> dict[str, Any]:
+        """Validate one census record in two."""
+        return {**config, "record_validation": "sampled", "record_validation_interval": 2}
+
+    def test_records_are_conformed_and_validated(self, tap: TapSunwave) -> None:
+        """Test that RECORD messages are conformed by the stream's compiled conformer."""
+        stream = tap.streams["census"]
+        assert isinstance(stream, CensusStream)
+        assert stream.record_conformer.validate_every == 2  # noqa: PLR2004
+
+        row = {"Admission Id": "1", "Patient Name": "Jane", "unknown": 1}
+        messages = list(stream._generate_record_messages(row))  # noqa: SLF001
+        assert [message.record for message in messages] == [{"Admission Id": "1", "Patient Name": "Jane"}]
+        assert stream.record_conformer.record_count == 1
+
+        with pytest.raises(InvalidRecord):
+            list(stream._generate_record_messages({"Admission Id": 1}))  # noqa: SLF001
@@ -0,0 +1,91 @@
+"""Test the deduplication of rows returned by more than one partition."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+from unittest.mock import patch
+
+import pytest
+
+from tap_sunwave.dedup import SeenKeys
+from tap_sunwave.streams import CensusStream
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from singer_sdk.helpers.types import Context
+
+    from tap_sunwave.tap import TapSunwave
+
+
+class TestSeenKeys:
+    """Tests for SeenKeys."""
+
+    def test_rows_are_emitted_once(self) -> None:
+        """Test that the first row with a primary key is kept."""
+        seen = SeenKeys(("id", "kind"))
+        rows = [{"id": 1, "kind": "a", "v": 1}, {"id": 1, "kind": "b"}, {"id": 1, "kind": "a", "v": 2}]
+        assert list(seen.filter_new(rows)) == rows[:2]
+        assert list(seen.filter_new([{"id": 1, "kind": "b"}, {"id": 2, "kind": "a"}])) == [{"id": 2, "kind": "a"}]
+        assert seen.duplicate_count == 2  # noqa: PLR2004
+
+    def test_keys_spill_to_disk(self) -> None:
+        """Test that keys moved out of memory are still recognized."""
+        seen = SeenKeys(("id",), max_memory_keys=2)
+        assert len(list(seen.filter_new({"id": i} for i in range(5)))) == 5  # noqa: PLR2004
+        assert seen._connection is not None  # noqa: SLF001
+        assert not seen._memory  # noqa: SLF001
+
+        rows = [{"id": i} for i in range(3, 8)]
+        assert list(seen.filter_new(rows)) == rows[2:]
+        assert seen.duplicate_count == 2  # noqa: PLR2004
+        seen.close()
+        assert seen._connection is None  # noqa: SLF001
+
+
+class TestCensusDeduplication:
+    """Tests for dropping census admissions returned by more than one partition."""
+
+    @pytest.fixture
+    def config(self, config: dict[str, Any]) -> dict[str, Any]:
+        """Enable deduplication."""
+        return {**config, "deduplicate_partitions": True}
+
+    @staticmethod
+    def _sync(stream: CensusStream) -> list[dict]:
+        def fake_request_records(_: CensusStream, context: Context | None) -> Iterator[dict]:
+            assert context is not None
+            ids = {"active": ["1", "2"], "admitted": ["2", "3"], "discharged": ["1", "3", "4"]}
+            for admission_id in ids[context["census_status"]]:
+                yield {"Admission Id": admission_id, "Discharge Date": context["census_status"]}
+
+        with (
+            patch.object(CensusStream, "request_records", fake_request_records),
+            patch.object(CensusStream, "_write_record_message"),
+        ):
+            return list(stream._sync_records(None))  # noqa: SLF001
+
+    def test_first_partition_wins(self, tap: TapSunwave) -> None:
+        """Test that each admission is emitted once, from the first partition returning it."""
+        stream = tap.streams["census"]
+        assert isinstance(stream, CensusStream)
+        records = self._sync(stream)
+
+        assert [(r["Admission Id"], r["Discharge Date"]) for r in records] == [
+            ("1", "active"),
+            ("2", "active"),
+            ("3", "admitted"),
+            ("4", "discharged"),
+        ]
+        assert tap.sync_metrics.endpoints["census", stream.path]["duplicates_dropped"] == 3  # noqa: PLR2004
+        assert stream.seen_keys is None
+
+        # Each sync starts with an empty index
+        assert len(self._sync(stream)) == 4  # noqa: PLR2004
+
+    def test_disabled_by_default(self, tap: TapSunwave, config: dict[str, Any]) -> None:
+        """Test that every row is emitted unless enabled."""
+        stream = tap.streams["census"]
+        assert isinstance(stream, CensusStream)
+        with patch.object(CensusStream, "config", {**config, "deduplicate_partitions": False}):
+            assert len(self._sync(stream)) == 7  # noqa: PLR2004
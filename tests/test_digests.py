@@ -0,0 +1,176 @@
+"""Test change detection for full-table streams."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+from unittest.mock import patch
+
+import pytest
+
+from tap_sunwave.client import DELETED_AT_PROPERTY, SunwaveStream
+from tap_sunwave.digests import RowDigestIndex
+from tap_sunwave.tap import TapSunwave
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from singer_sdk.helpers.types import Context
+
+
+class TestRowDigestIndex:
+    """Tests for RowDigestIndex."""
+
+    def test_unchanged_rows_are_dropped_after_commit(self, tmp_path: Path) -> None:
+        """Test that rows are compared with the last committed sync."""
+        path = tmp_path / "digests.sqlite"
+        index = RowDigestIndex(path, "form", ("id",))
+        rows = [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]
+        assert list(index.filter_changed(rows)) == rows
+
+        # Nothing is stored until the sync is committed
+        assert list(RowDigestIndex(path, "form", ("id",)).filter_changed(rows)) == rows
+        assert index.commit() == []
+
+        index = RowDigestIndex(path, "form", ("id",))
+        changed = [{"name": "c", "id": 2}, {"id": 3, "name": "d"}]
+        assert list(index.filter_changed([{"name": "a", "id": 1}, *changed])) == changed
+        assert index.unchanged_count == 1
+        assert index.commit() == []
+
+        # Other streams keep their own digests
+        assert list(RowDigestIndex(path, "user", ("id",)).filter_changed(rows)) == rows
+
+    def test_commit_returns_deleted_keys(self, tmp_path: Path) -> None:
+        """Test that keys missing from a sync are reported and forgotten."""
+        index = RowDigestIndex(tmp_path / "digests.sqlite", "census", ("Admission Id", "status"))
+        list(index.filter_changed([{"Admission Id": "1", "status": "a"}, {"Admission Id": "2", "status": "a"}]))
+        index.commit()
+
+        list(index.filter_changed([{"Admission Id": "2", "status": "a"}]))
+        assert index.commit() == [{"Admission Id": "1", "status": "a"}]
+        assert index.commit() == [{"Admission Id": "2", "status": "a"}]
+
+
+class TestStreamRowDigests:
+    """Tests for dropping unchanged rows of full-table streams."""
+
+    @pytest.fixture
+    def config(self, config: dict[str, Any], tmp_path: Path) -> dict[str, Any]:
+        """Enable row digests with tombstones."""
+        return {**config, "row_digests": {"path": str(tmp_path / "digests.sqlite"), "tombstones": True}}
+
+    def test_eligible_streams(self, tap: TapSunwave) -> None:
+        """Test that only full-table streams with primary keys use digests."""
+        eligible = {
+            name
+            for name, stream in tap.streams.items()
+            if isinstance(stream, SunwaveStream) and stream.uses_row_digests
+        }
+        assert eligible == {"form", "user", "referral", "census"}
+        assert DELETED_AT_PROPERTY in tap.streams["form"].schema["properties"]
+        assert DELETED_AT_PROPERTY not in tap.streams["opportunity"].schema["properties"]
+
+    def test_disabled_with_activate_version_messages(self, config: dict[str, Any]) -> None:
+        """Test that every row is emitted when the target deletes rows missing from a version."""
+        tap = TapSunwave(config={**config, "emit_activate_version_messages": True}, parse_env_config=False)
+        stream = tap.streams["form"]
+        assert isinstance(stream, SunwaveStream)
+        assert not stream.uses_row_digests
+        assert stream.row_digests is None
+        assert DELETED_AT_PROPERTY not in stream.schema["properties"]
+
+        with (
+            patch.object(SunwaveStream, "request_records", self._fake_request_records),
+            patch.object(SunwaveStream, "_write_record_message"),
+        ):
+            assert len(list(stream._sync_records(None))) == 3  # noqa: PLR2004, SLF001
+            assert len(list(stream._sync_records(None))) == 3  # noqa: PLR2004, SLF001
+
+    def test_changed_rows_and_tombstones_are_synced(self, tap: TapSunwave) -> None:
+        """Test that a second sync emits changed rows and tombstones only."""
+        stream = tap.streams["form"]
+        assert isinstance(stream, SunwaveStream)
+        responses = [
+            [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}, {"id": 3, "name": "c"}],
+            [{"id": 1, "name": "a"}, {"id": 3, "name": "changed"}],
+        ]
+
+        def fake_request_records(_: SunwaveStream, context: Context | None) -> Iterator[dict]:  # noqa: ARG001
+            yield from responses.pop(0)
+
+        with (
+            patch.object(SunwaveStream, "request_records", fake_request_records),
+            patch.object(SunwaveStream, "_write_record_message"),
+        ):
+            first = list(stream._sync_records(None))  # noqa: SLF001
+            second = list(stream._sync_records(None))  # noqa: SLF001
+
+        assert [r["id"] for r in first] == [1, 2, 3]
+        assert second[0]["name"] == "changed"
+        assert second[1]["id"] == 2  # noqa: PLR2004
+        assert second[1][DELETED_AT_PROPERTY] is not None
+        assert len(second) == 2  # noqa: PLR2004
+
+    def test_tombstones_precede_the_final_state(self, tap: TapSunwave) -> None:
+        """Test that digests are committed once a STATE message following the tombstones is written."""
+        stream = tap.streams["form"]
+        assert isinstance(stream, SunwaveStream)
+        responses = [[{"id": 1, "name": "a"}, {"id": 2, "name": "b"}], [{"id": 1, "name": "a"}]]
+        events: list[str] = []
+
+        def fake_request_records(_: SunwaveStream, context: Context | None) -> Iterator[dict]:  # noqa: ARG001
+            yield from responses.pop(0)
+
+        def record_message(_: SunwaveStream, record: dict) -> None:
+            events.append("tombstone" if DELETED_AT_PROPERTY in record else "record")
+
+        original_commit = RowDigestIndex.commit
+
+        def commit(index: RowDigestIndex) -> list[dict]:
+            events.append("commit")
+            return original_commit(index)
+
+        with (
+            patch.object(SunwaveStream, "request_records", fake_request_records),
+            patch.object(SunwaveStream, "_write_record_message", record_message),
+            patch.object(tap.state_writer, "write_state", side_effect=lambda _: events.append("state")),
+            patch.object(RowDigestIndex, "commit", autospec=True, side_effect=commit),
+        ):
+            list(stream._sync_records(None))  # noqa: SLF001
+            stream.state_manager.is_flushed = False
+            list(stream._sync_records(None))  # noqa: SLF001
+
+        assert events == ["record", "record", "state", "commit", "tombstone", "state", "commit"]
+
+    @staticmethod
+    def _fake_request_records(_: SunwaveStream, context: Context | None) -> Iterator[dict]:  # noqa: ARG004
+        yield from [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}, {"id": 3, "name": "c"}]
+
+    def test_digests_are_committed_after_the_last_batch(self, config: dict[str, Any], tmp_path: Path) -> None:
+        """Test that rows aren't marked as synced before every batch holding them is written."""
+        batch_config = {"encoding": {"format": "jsonl"}, "storage": {"root": tmp_path.as_uri()}, "batch_size": 2}
+        tap = TapSunwave(config={**config, "batch_config": batch_config}, parse_env_config=False)
+        events: list[str] = []
+
+        with (
+            patch.object(SunwaveStream, "request_records", self._fake_request_records),
+            patch.object(SunwaveStream, "_write_batch_message", lambda *_, **__: events.append("batch")),
+            patch.object(RowDigestIndex, "commit", autospec=True, side_effect=lambda _: events.append("commit")),
+        ):
+            tap.streams["form"].sync()
+
+        assert events == ["batch", "batch", "commit"]
+
+    def test_reset_emits_every_row_again(self, tap: TapSunwave, config: dict[str, Any]) -> None:
+        """Test that resetting the digests forgets the rows of earlier runs."""
+        with (
+            patch.object(SunwaveStream, "request_records", self._fake_request_records),
+            patch.object(SunwaveStream, "_write_record_message"),
+        ):
+            assert len(list(tap.streams["form"]._sync_records(None))) == 3  # noqa: PLR2004, SLF001
+            assert list(TapSunwave(config=config, parse_env_config=False).streams["form"]._sync_records(None)) == []  # noqa: SLF001
+
+            reset_config = {**config, "row_digests": {**config["row_digests"], "reset": True}}
+            reset_tap = TapSunwave(config=reset_config, parse_env_config=False)
+            assert len(list(reset_tap.streams["form"]._sync_records(None))) == 3  # noqa: PLR2004, SLF001
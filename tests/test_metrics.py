@@ -0,0 +1,114 @@
+"""Test the sync performance metrics."""
+
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from unittest.mock import patch
+
+import pytest
+
+from tap_sunwave.client import SunwaveStream, TokenBucket
+from tap_sunwave.metrics import Phase
+from tap_sunwave.tap import TapSunwave
+from tests.mock_sunwave import MockSunwaveServer
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from tap_sunwave.metrics import SyncMetrics
+
+
+@pytest.fixture
+def sync_metrics(tap: TapSunwave) -> SyncMetrics:
+    """Return the metrics of the tap's run."""
+    return tap.sync_metrics
+
+
+class TestSyncMetrics:
+    """Tests for SyncMetrics."""
+
+    def test_nested_phases_are_counted_apart(self, sync_metrics: SyncMetrics) -> None:
+        """Test that time in an inner phase isn't counted for the outer one."""
+        with sync_metrics.phase("form", Phase.PARSE):
+            time.sleep(0.01)
+            with sync_metrics.phase("form", Phase.DOWNLOAD):
+                time.sleep(0.05)
+
+        parse, download = sync_metrics.phases["form", "parse"], sync_metrics.phases["form", "download"]
+        assert 0.01 <= parse[0] < 0.05  # noqa: PLR2004
+        assert download[0] >= 0.05  # noqa: PLR2004
+        assert parse[1] == download[1] == 1
+
+    def test_timed_iterables(self, sync_metrics: SyncMetrics) -> None:
+        """Test that only the production of items is timed."""
+
+        def slow() -> Iterator[int]:
+            for i in range(3):
+                time.sleep(0.01)
+                yield i
+
+        for _ in sync_metrics.timed(slow(), "form", Phase.PARSE):
+            time.sleep(0.02)
+
+        seconds, count = sync_metrics.phases["form", "parse"]
+        assert 0.03 <= seconds < 0.06  # noqa: PLR2004
+        assert count == 4  # noqa: PLR2004
+
+
+class TestSyncInstrumentation:
+    """Tests for the metrics recorded while syncing."""
+
+    @pytest.fixture
+    def config(self, config: dict[str, Any], tmp_path: Path) -> dict[str, Any]:
+        """Write the metrics to files."""
+        return {
+            **config,
+            "billing_entity_ids": ["1"],
+            "metrics_json_path": str(tmp_path / "metrics.json"),
+            "metrics_prometheus_path": str(tmp_path / "metrics.prom"),
+        }
+
+    def test_phases_and_endpoints_are_reported(
+        self,
+        tap: TapSunwave,
+        sync_metrics: SyncMetrics,
+        config: dict[str, Any],
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """Test that a sync reports every phase and the stats of each endpoint template."""
+        with (
+            MockSunwaveServer({"form": 10, "opportunity": 2, "opportunity_timeline": 3}) as server,
+            patch.object(SunwaveStream, "url_base", server.url),
+            patch.object(SunwaveStream, "rate_limiter", TokenBucket(10_000)),
+        ):
+            tap.sync_all()
+        capsys.readouterr()
+
+        summary = json.loads(Path(config["metrics_json_path"]).read_text())
+        assert summary == sync_metrics.summary()
+        form = summary["streams"]["form"]
+        assert set(form["phases"]) == {phase.value for phase in Phase}
+        assert form["endpoints"]["/api/forms"]["requests"] == 1
+        assert form["endpoints"]["/api/forms"]["response_bytes"] > 0
+        timeline = summary["streams"]["opportunity_timeline"]["endpoints"]
+        assert timeline["/api/opportunities/{opportunity_id}/timeline"]["requests"] == 2  # noqa: PLR2004
+
+        prometheus = Path(config["metrics_prometheus_path"]).read_text()
+        assert 'tap_sunwave_phase_seconds_total{stream="form",phase="emit"}' in prometheus
+        assert 'tap_sunwave_requests_total{stream="form",endpoint="/api/forms"} 1' in prometheus
+
+    def test_taps_have_their_own_metrics(self, tap: TapSunwave, config: dict[str, Any]) -> None:
+        """Test that a second tap in the process doesn't add to the first tap's metrics."""
+        other = TapSunwave(config=config, parse_env_config=False)
+        form, other_form = tap.streams["form"], other.streams["form"]
+        assert isinstance(form, SunwaveStream)
+        assert isinstance(other_form, SunwaveStream)
+        assert form.sync_metrics is tap.sync_metrics
+        assert other_form.sync_metrics is other.sync_metrics
+
+        other_form.sync_metrics.count("form", "/api/forms", "requests")
+        assert tap.sync_metrics.summary() != other.sync_metrics.summary()
+        assert not tap.sync_metrics.endpoints
@@ -0,0 +1,256 @@
+"""Test the incremental response parsing helpers."""
+
+from __future__ import annotations
+
+import json
+import tracemalloc
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, ClassVar
+
+import pytest
+
+from tap_sunwave.parsing import (
+    SUNWAVE_DATETIME_FORMAT,
+    JSONStreamReader,
+    TableHeader,
+    TableRow,
+    TransformPlan,
+    normalize_sunwave_datetime,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+
+def _consume(reader: JSONStreamReader) -> None:
+    if reader.peek() != "{":
+        list(reader.iter_array())
+        return
+    for _ in reader.iter_object():
+        reader.read_value()
+
+
+def _chunked(document: str, size: int) -> Iterator[bytes]:
+    raw = document.encode()
+    for i in range(0, len(raw), size):
+        yield raw[i : i + size]
+
+
+DOCUMENT = '  [{"id": 1, "name": "Zoë", "amount": 12.50}, [], {}, "a\\"b", 123456, -1.5e3, true, null]  '
+
+
+class TestJSONStreamReader:
+    """Tests for the incremental JSON reader."""
+
+    @pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1024])
+    def test_iter_array_across_chunk_boundaries(self, chunk_size: int) -> None:
+        """Test that items are decoded the same wherever the chunks are split."""
+        reader = JSONStreamReader(_chunked(DOCUMENT, chunk_size))
+        items = list(reader.iter_array())
+        assert items == json.loads(DOCUMENT, parse_float=Decimal)
+        assert items[0]["amount"] == Decimal("12.50")
+        assert reader.peek() == ""
+
+    @pytest.mark.parametrize("chunk_size", [1, 5, 1024])
+    def test_iter_object(self, chunk_size: int) -> None:
+        """Test walking an object's keys and streaming one of its values."""
+        reader = JSONStreamReader(_chunked('{"a": {"b": 1}, "rows": [[1, 2], [3]], "z": 0}', chunk_size))
+        result = {}
+        for key in reader.iter_object():
+            result[key] = list(reader.iter_array()) if key == "rows" else reader.read_value()
+        assert result == {"a": {"b": 1}, "rows": [[1, 2], [3]], "z": 0}
+
+    def test_empty_containers(self) -> None:
+        """Test that empty arrays and objects yield nothing."""
+        assert list(JSONStreamReader([b"[ ]"]).iter_array()) == []
+        assert list(JSONStreamReader([b"{ }"]).iter_object()) == []
+
+    @pytest.mark.parametrize("document", ["[1, 2", "[1 2]", '{"a" 1}', "{1: 2}", ""])
+    def test_invalid_documents_raise(self, document: str) -> None:
+        """Test that malformed or truncated documents raise a decode error."""
+        reader = JSONStreamReader(_chunked(document, 2))
+        with pytest.raises(json.JSONDecodeError):
+            _consume(reader)
+
+    def test_memory_is_bounded_by_one_item(self) -> None:
+        """Test that iterating a large array doesn't hold the whole document."""
+        row = json.dumps({"Admission Id": "x" * 50, "Notes": "y" * 200})
+        rows = 20_000
+
+        def document() -> Iterator[bytes]:
+            yield b"["
+            for i in range(rows):
+                yield f"{',' if i else ''}{row}".encode()
+            yield b"]"
+
+        tracemalloc.start()
+        count = sum(1 for _ in JSONStreamReader(document()).iter_array())
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert count == rows
+        assert peak < len(row) * rows / 50
+
+
+class TestTableRow:
+    """Tests for the rows of table reports."""
+
+    @pytest.mark.parametrize(
+        ("names", "cells"),
+        [
+            pytest.param(["a", "b", "c"], [1, 2, 3], id="full"),
+            pytest.param(["a", "b", "c"], [1], id="short"),
+            pytest.param(["a", "b"], [1, 2, 3], id="long"),
+            pytest.param(["a", "b", "a"], [1, 2, 3], id="repeated-name"),
+        ],
+    )
+    def test_rows_match_zipped_dictionaries(self, names: list[str], cells: list[Any]) -> None:
+        """Test that rows have the keys, order and values of ``dict(zip(names, cells))``."""
+        expected = dict(zip(names, cells, strict=False))
+        row = TableHeader(names).row(list(cells))
+        assert row == expected
+        assert list(row.items()) == list(expected.items())
+        assert len(row) == len(expected)
+        assert row.get("c") == expected.get("c")
+
+    def test_rows_are_mutable(self) -> None:
+        """Test setting and deleting values in and out of the header."""
+        header = TableHeader(["a", "b", "billing_entity_id"])
+        row = header.row([1, 2])
+        row["billing_entity_id"] = "1"
+        row["extra"] = True
+        row["a"] = "one"
+        del row["b"]
+        assert row.extra == {"extra": True}
+        assert dict(row) == {"a": "one", "billing_entity_id": "1", "extra": True}
+        assert "b" not in row
+        with pytest.raises(KeyError):
+            del row["b"]
+
+        copy = row.copy()
+        copy["a"] = 0
+        assert isinstance(copy, TableRow)
+        assert row["a"] == "one"
+        assert copy.header is row.header
+
+    def test_rows_are_smaller_than_dictionaries(self) -> None:
+        """Test that rows sharing a header take much less memory than dictionaries of the same cells."""
+        names = [f"Column {i}" for i in range(40)]
+        header = TableHeader(names)
+
+        def measure(wrap: Callable[[list], object]) -> int:
+            tracemalloc.start()
+            rows = [wrap([f"{i}"] * len(names)) for i in range(2_000)]
+            size, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            assert len(rows) == 2_000  # noqa: PLR2004
+            return size
+
+        dict_size = measure(lambda cells: dict(zip(names, cells, strict=False)))
+        row_size = measure(header.row)
+        assert row_size < dict_size * 2 / 3
+
+
+def _strptime_normalize(value: str) -> str:
+    try:
+        return datetime.strptime(value, SUNWAVE_DATETIME_FORMAT).replace(tzinfo=timezone.utc).isoformat()
+    except ValueError:
+        return value
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "01/02/2024 10:11:12 AM",
+        "01/02/2024 12:00:00 AM",
+        "01/02/2024 12:30:00 PM",
+        "1/2/2024 1:05:09 pm",
+        "1/2/2024 1:5:9 PM",
+        "12/31/2023  11:59:59\tPM",
+        "02/29/2024 01:00:00 AM",
+        "02/30/2024 01:00:00 AM",
+        "13/01/2024 01:00:00 AM",
+        "01/02/2024 00:00:00 AM",
+        "01/02/2024 13:00:00 PM",
+        "01/02/2024 10:60:00 AM",
+        "01/02/2024 10:00:61 AM",
+        "01/02/2024 10:00 AM",
+        "2024-01-02",
+        "2024-01-02T10:11:12+00:00",
+    ],
+)
+def test_normalize_sunwave_datetime_matches_strptime(value: str) -> None:
+    """Test that the regex gives the same result as ``strptime``."""
+    assert normalize_sunwave_datetime(value) == _strptime_normalize(value)
+
+
+@pytest.mark.parametrize("value", [None, ""])
+def test_normalize_sunwave_datetime_empty(value: str | None) -> None:
+    """Test that empty values are passed through."""
+    assert normalize_sunwave_datetime(value) == value
+
+
+class TestTransformPlan:
+    """Tests for the schema-driven record conversions."""
+
+    SCHEMA: ClassVar[dict] = {
+        "properties": {
+            "created_on": {"type": ["string", "null"]},
+            "phone": {"type": ["string", "null"]},
+            "amount": {"type": ["number", "null"]},
+            "count": {"type": "integer"},
+            "active": {"type": ["boolean", "null"]},
+            "levels": {"type": ["array", "null"]},
+            "mixed": {"type": ["string", "integer"]},
+        },
+    }
+
+    def test_from_schema(self) -> None:
+        """Test that conversions are picked from each property's declared type."""
+        plan = TransformPlan.from_schema(self.SCHEMA, datetime_properties=["created_on"])
+        assert plan.datetime_properties == ("created_on",)
+        assert plan.string_properties == {"phone"}
+
+    def test_apply(self) -> None:
+        """Test that rows are converted in order and in place, leaving other types to the SDK."""
+        plan = TransformPlan.from_schema(self.SCHEMA, datetime_properties=["created_on"])
+        rows: list[dict] = [
+            {
+                "created_on": "01/02/2024 01:00:00 PM",
+                "phone": 7864385625,
+                "amount": "12.50",
+                "count": "3",
+                "active": "True",
+                "levels": [{"id": 1}],
+                "mixed": 1,
+            },
+            {"phone": None, "amount": "n/a", "count": 4, "active": "yes"},
+        ]
+
+        assert list(plan.apply(iter(rows), batch_size=1)) == [
+            {
+                "created_on": "2024-01-02T13:00:00+00:00",
+                "phone": "7864385625",
+                "amount": "12.50",
+                "count": "3",
+                "active": "True",
+                "levels": [{"id": 1}],
+                "mixed": 1,
+            },
+            {"created_on": None, "phone": None, "amount": "n/a", "count": 4, "active": "yes"},
+        ]
+
+    def test_projection(self) -> None:
+        """Test that rows are pruned to the projected properties before they are converted."""
+        plan = TransformPlan.from_schema(
+            self.SCHEMA,
+            datetime_properties=["created_on"],
+            projection=["count", "phone", "unknown"],
+        )
+        assert plan.projection == ("count", "phone")
+        assert plan.datetime_properties == ()
+        assert plan.string_properties == {"phone"}
+
+        rows = [{"created_on": "01/02/2024 01:00:00 PM", "phone": 7864385625, "amount": "12.50", "count": "3"}]
+        assert list(plan.apply(rows)) == [{"count": "3", "phone": "7864385625"}]
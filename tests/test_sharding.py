@@ -0,0 +1,160 @@
+"""Test splitting opportunity timelines between tap instances."""
+
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING, Any
+from unittest.mock import patch
+
+import pytest
+from singer_sdk.exceptions import ConfigValidationError
+
+from tap_sunwave.sharding import main, merge_states, shard_of
+from tap_sunwave.streams import OpportunitiesStream, OpportunityTimelineStream
+from tap_sunwave.tap import TapSunwave
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from singer_sdk.helpers.types import Context
+
+OPPORTUNITY_IDS = [str(i) for i in range(40)]
+
+
+def _fake_timeline(_: OpportunityTimelineStream, context: Context | None) -> Iterator[dict]:
+    assert context is not None
+    yield {"id": f"{context['opportunity_id']}-1", "created_on": None}
+
+
+def _sync_shard(config: dict[str, Any], shard_index: int) -> tuple[list[str], dict]:
+    """Sync the timelines of one shard, and return the opportunities synced and the state."""
+    tap = TapSunwave(
+        config={**config, "shard_count": 3, "shard_index": shard_index, "skip_unchanged_timelines": True},
+        parse_env_config=False,
+    )
+    parent, child = tap.streams["opportunity"], tap.streams["opportunity_timeline"]
+    assert isinstance(child, OpportunityTimelineStream)
+    synced: list[str] = []
+    with patch.object(OpportunityTimelineStream, "request_records", _fake_timeline):
+        for opportunity_id in OPPORTUNITY_IDS:
+            for context in parent.generate_child_contexts({"opportunity_id": opportunity_id}, None):
+                assert context is not None
+                list(child.get_records(context))
+                synced.append(context["opportunity_id"])
+    with patch.object(OpportunitiesStream, "request_records", return_value=iter([])):
+        list(parent.get_records(None))
+    return synced, dict(tap.state)
+
+
+def test_shard_of_is_stable() -> None:
+    """Test that keys are spread over every shard, the same way on each call."""
+    shards = [shard_of(opportunity_id, 3) for opportunity_id in OPPORTUNITY_IDS]
+    assert shards == [shard_of(opportunity_id, 3) for opportunity_id in OPPORTUNITY_IDS]
+    assert set(shards) == {0, 1, 2}
+    assert shard_of(42, 3) == shard_of("42", 3)
+
+
+class TestShardedTimelines:
+    """Tests for syncing opportunity timelines in shards."""
+
+    def test_shards_sync_disjoint_timelines(self, config: dict[str, Any]) -> None:
+        """Test that each timeline is synced by exactly one shard, with state kept per shard."""
+        results = [_sync_shard(config, shard_index) for shard_index in range(3)]
+
+        synced = [opportunity_id for shard_synced, _ in results for opportunity_id in shard_synced]
+        assert sorted(synced, key=int) == OPPORTUNITY_IDS
+        for shard_index, (shard_synced, state) in enumerate(results):
+            assert all(shard_of(opportunity_id, 3) == shard_index for opportunity_id in shard_synced)
+            shards = state["bookmarks"]["opportunity_timeline"]["shards"]
+            assert set(shards) == {f"{shard_index}/3"}
+            assert set(shards[f"{shard_index}/3"]["opportunity_fingerprints"]) == set(shard_synced)
+
+        merged = merge_states([state for _, state in results])
+        shards = merged["bookmarks"]["opportunity_timeline"]["shards"]
+        assert set(shards) == {"0/3", "1/3", "2/3"}
+        assert {i for shard in shards.values() for i in shard["opportunity_fingerprints"]} == set(OPPORTUNITY_IDS)
+
+    def test_unsharded_state_is_unchanged(self, tap: TapSunwave) -> None:
+        """Test that timelines keep their state at the top of the stream state by default."""
+        child = tap.streams["opportunity_timeline"]
+        assert isinstance(child, OpportunityTimelineStream)
+        assert child.shard_state is child.stream_state
+
+    def test_shard_index_must_be_lower_than_count(self, config: dict[str, Any]) -> None:
+        """Test that a shard outside of ``shard_count`` is rejected."""
+        with pytest.raises(ConfigValidationError):
+            TapSunwave(config={**config, "shard_count": 2, "shard_index": 2}, parse_env_config=False)
+
+
+class TestMergeStates:
+    """Tests for merging the states of all shards."""
+
+    def test_earliest_bookmark_is_kept(self) -> None:
+        """Test that shard parts are combined and the least advanced bookmark wins."""
+        states: list[dict[str, Any]] = [
+            {"bookmarks": {"opportunity": {"replication_key_value": "2024-03-02"}, "form": {}}},
+            {"bookmarks": {"opportunity": {"replication_key_value": "2024-03-01"}}},
+            {"bookmarks": {"opportunity": {"replication_key_value": None}}},
+        ]
+        assert merge_states(states) == {
+            "bookmarks": {"opportunity": {"replication_key_value": "2024-03-01"}, "form": {}},
+        }
+
+    def test_partitions_are_merged_by_context(self) -> None:
+        """Test that the census partitions of every shard are kept, each at its earliest bookmark."""
+        states: list[dict[str, Any]] = [
+            {
+                "bookmarks": {
+                    "census": {
+                        "partitions": [
+                            {"context": {"census_status": "active"}, "synced_until": "2024-03-02"},
+                            {"context": {"census_status": "admitted"}, "synced_until": "2024-03-01"},
+                        ]
+                    }
+                }
+            },
+            {
+                "bookmarks": {
+                    "census": {
+                        "partitions": [
+                            {"context": {"census_status": "admitted"}, "synced_until": "2024-03-02"},
+                            {"context": {"census_status": "active"}, "synced_until": "2024-03-01"},
+                            {"context": {"census_status": "discharged"}, "synced_until": "2024-03-03"},
+                        ]
+                    }
+                }
+            },
+        ]
+        assert merge_states(states)["bookmarks"]["census"]["partitions"] == [
+            {"context": {"census_status": "active"}, "synced_until": "2024-03-01"},
+            {"context": {"census_status": "admitted"}, "synced_until": "2024-03-01"},
+            {"context": {"census_status": "discharged"}, "synced_until": "2024-03-03"},
+        ]
+
+    def test_lists_are_merged_into_their_union(self) -> None:
+        """Test that list values of every shard are kept."""
+        states = [{"bookmarks": {"form": {"ids": ["1", "2"]}}}, {"bookmarks": {"form": {"ids": ["2", "3"]}}}]
+        assert merge_states(states) == {"bookmarks": {"form": {"ids": ["1", "2", "3"]}}}
+
+    def test_conflicting_values_fail(self) -> None:
+        """Test that shards disagreeing on another value are rejected."""
+        states = [
+            {"bookmarks": {"opportunity": {"replication_key": "modified_on"}}},
+            {"bookmarks": {"opportunity": {"replication_key": "created_on"}}},
+        ]
+        with pytest.raises(ValueError, match=r"bookmarks\.opportunity\.replication_key"):
+            merge_states(states)
+
+    def test_command_line(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+        """Test that state files are merged to stdout."""
+        paths = []
+        for shard_index in range(2):
+            path = tmp_path / f"state-{shard_index}.json"
+            part = {"journal_length": shard_index + 1}
+            path.write_text(json.dumps({"bookmarks": {"opportunity_timeline": {"shards": {f"{shard_index}/2": part}}}}))
+            paths.append(str(path))
+
+        main(paths)
+        shards = json.loads(capsys.readouterr().out)["bookmarks"]["opportunity_timeline"]["shards"]
+        assert shards == {"0/2": {"journal_length": 1}, "1/2": {"journal_length": 2}}
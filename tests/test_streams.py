@@ -0,0 +1,507 @@
+"""Test the Sunwave stream classes."""
+
+from __future__ import annotations
+
+import copy
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any
+from unittest.mock import patch
+
+import pytest
+
+from tap_sunwave.journal import TimelineJournal
+from tap_sunwave.streams import (
+    BillingReportStream,
+    CensusStream,
+    OpportunitiesStream,
+    OpportunityTimelineStream,
+    UserStream,
+    _fingerprint,
+)
+from tap_sunwave.tap import TapSunwave
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from singer_sdk.helpers.types import Context
+
+
+def _fake_timeline(_: OpportunityTimelineStream, context: Context | None) -> Iterator[dict]:
+    assert context is not None
+    opportunity_id = context["opportunity_id"]
+    yield {"id": f"{opportunity_id}-1", "created_on": None}
+    yield {"id": f"{opportunity_id}-2", "created_on": None}
+
+
+class TestOpportunityTimelineFanOut:
+    """Tests for the concurrent opportunity timeline fan-out."""
+
+    def test_prefetch_serves_records_in_order(self, tap: TapSunwave) -> None:
+        """Test that prefetched timelines are served per opportunity, in order."""
+        stream = tap.streams["opportunity_timeline"]
+        assert isinstance(stream, OpportunityTimelineStream)
+        contexts = [{"opportunity_id": str(i)} for i in range(10)]
+
+        with patch.object(OpportunityTimelineStream, "request_records", _fake_timeline):
+            stream.prefetch(contexts)
+
+        with patch.object(OpportunityTimelineStream, "request_records", side_effect=AssertionError):
+            for context in contexts:
+                records = list(stream.get_records(context))
+                assert [r["id"] for r in records] == [
+                    f"{context['opportunity_id']}-1",
+                    f"{context['opportunity_id']}-2",
+                ]
+
+    def test_child_syncs_are_batched(self, tap: TapSunwave) -> None:
+        """Test that the parent defers child syncs and flushes them in order."""
+        parent = tap.streams["opportunity"]
+        child = tap.streams["opportunity_timeline"]
+        assert isinstance(parent, OpportunitiesStream)
+        parent.child_batch_size = 3
+
+        synced: list[str] = []
+        prefetched: list[list[str]] = []
+
+        def fake_sync(context: Context | None = None) -> None:
+            assert context is not None
+            synced.append(context["opportunity_id"])
+
+        def fake_prefetch(contexts: list[Context]) -> None:
+            prefetched.append([c["opportunity_id"] for c in contexts])
+
+        with (
+            patch.object(child, "sync", fake_sync),
+            patch.object(child, "prefetch", fake_prefetch),
+            patch.object(OpportunitiesStream, "request_records", return_value=iter([])),
+        ):
+            for i in range(4):
+                parent._sync_children({"opportunity_id": str(i)})  # noqa: SLF001
+            assert synced == ["0", "1", "2"]
+
+            # The remaining contexts are flushed once the parent runs out of records
+            list(parent.get_records(None))
+
+        assert synced == ["0", "1", "2", "3"]
+        assert prefetched == [["0", "1", "2"], ["3"]]
+
+    def test_children_are_synced_before_window_checkpoints(self, tap: TapSunwave, config: dict[str, Any]) -> None:
+        """Test that pending timelines are synced before the bookmark of a date window is written."""
+        parent = tap.streams["opportunity"]
+        child = tap.streams["opportunity_timeline"]
+        assert isinstance(parent, OpportunitiesStream)
+        events: list[str] = []
+
+        def fake_request_records(_: OpportunitiesStream, context: Context | None) -> Iterator[dict]:
+            assert context is not None
+            yield {"opportunity_id": context["window_start"]}
+
+        def fake_sync(context: Context | None = None) -> None:
+            assert context is not None
+            events.append(f"sync {context['opportunity_id']}")
+
+        with (
+            patch.object(OpportunitiesStream, "config", {**config, "date_window_days": 7}),
+            patch.object(OpportunitiesStream, "request_records", fake_request_records),
+            patch.object(OpportunitiesStream, "_write_state_message", lambda _: events.append("state")),
+            patch.object(child, "sync", fake_sync),
+            patch.object(child, "prefetch"),
+            patch("tap_sunwave.streams.datetime") as mock_datetime,
+        ):
+            mock_datetime.now.return_value = datetime(2024, 1, 15, tzinfo=timezone.utc)
+            mock_datetime.fromisoformat = datetime.fromisoformat
+            for record in parent.get_records(None):
+                # Like the SDK, once the record is emitted
+                parent._sync_children(parent.get_child_context(record, None))  # noqa: SLF001
+
+        assert events == ["sync 2024-01-01", "state", "sync 2024-01-08", "state"]
+
+
+class TestSkipUnchangedTimelines:
+    """Tests for fingerprint-based skipping of unchanged opportunity timelines."""
+
+    @pytest.fixture
+    def config(self, config: dict[str, Any]) -> dict[str, Any]:
+        """Enable skipping of unchanged timelines."""
+        return {**config, "max_concurrent_requests": 1, "skip_unchanged_timelines": True}
+
+    def test_unchanged_opportunities_are_skipped(self, tap: TapSunwave) -> None:
+        """Test that only new or changed opportunities generate child contexts."""
+        parent = tap.streams["opportunity"]
+        child = tap.streams["opportunity_timeline"]
+        assert isinstance(child, OpportunityTimelineStream)
+        record = {"opportunity_id": "1", "stage": "Lead"}
+
+        # First sync: the timeline is fetched and its fingerprint remembered
+        (context,) = parent.generate_child_contexts(record, None)
+        assert context is not None
+        with patch.object(OpportunityTimelineStream, "request_records", _fake_timeline):
+            list(child.get_records(context))
+        assert child.fingerprints["1"] == [context["fingerprint"], None]
+
+        # Unchanged and inactive: skipped
+        assert list(parent.generate_child_contexts(record, None)) == []
+
+        # Changed parent record: synced again
+        changed = {**record, "stage": "Admitted"}
+        assert [c["opportunity_id"] for c in parent.generate_child_contexts(changed, None) if c] == ["1"]
+
+    def test_recently_active_timelines_are_refetched(self, tap: TapSunwave) -> None:
+        """Test that timelines with recent activity are fetched even if unchanged."""
+        parent = tap.streams["opportunity"]
+        child = tap.streams["opportunity_timeline"]
+        assert isinstance(child, OpportunityTimelineStream)
+        record = {"opportunity_id": "1"}
+        recent = datetime.now(tz=timezone.utc).isoformat()
+        child.fingerprints["1"] = [_fingerprint(record), recent]
+
+        assert len(list(parent.generate_child_contexts(record, None))) == 1
+
+    def test_fingerprints_outside_window_are_pruned(self, tap: TapSunwave) -> None:
+        """Test that fingerprints not seen during the parent sync are dropped."""
+        parent = tap.streams["opportunity"]
+        child = tap.streams["opportunity_timeline"]
+        assert isinstance(child, OpportunityTimelineStream)
+        child.fingerprints.update({"old": ["abc", None], "1": [_fingerprint({"opportunity_id": "1"}), None]})
+
+        with patch.object(OpportunitiesStream, "request_records", return_value=iter([])):
+            list(parent.generate_child_contexts({"opportunity_id": "1"}, None))
+            list(parent.get_records(None))
+
+        assert set(child.fingerprints) == {"1"}
+
+    def test_fingerprints_are_kept_in_state(self, tap: TapSunwave) -> None:
+        """Test that each timeline's fingerprint is in the STATE message written after its batch."""
+        parent = tap.streams["opportunity"]
+        child = tap.streams["opportunity_timeline"]
+        assert isinstance(child, OpportunityTimelineStream)
+        child.stream_state["opportunity_fingerprints"] = {"1": ["abc", None]}
+
+        (context,) = parent.generate_child_contexts({"opportunity_id": "2"}, None)
+        assert context is not None
+        with (
+            patch.object(OpportunityTimelineStream, "request_records", _fake_timeline),
+            patch.object(tap.state_writer, "write_state") as write_state,
+        ):
+            child.sync(context)
+            write_state.assert_not_called()
+            child.checkpoint()
+        fingerprints = write_state.call_args.args[0]["bookmarks"]["opportunity_timeline"]["opportunity_fingerprints"]
+        assert set(fingerprints) == {"1", "2"}
+
+        with patch.object(OpportunitiesStream, "request_records", return_value=iter([])):
+            list(parent.get_records(None))
+        assert set(child.stream_state["opportunity_fingerprints"]) == {"2"}
+
+
+class TestTimelineJournal:
+    """Tests for resuming interrupted opportunity timeline syncs."""
+
+    @pytest.fixture
+    def config(self, config: dict[str, Any], tmp_path: Path) -> dict[str, Any]:
+        """Journal synced timelines."""
+        return {**config, "timeline_journal_path": str(tmp_path / "journal.db")}
+
+    @staticmethod
+    def _interrupted_run(config: dict[str, Any]) -> dict:
+        """Sync the timelines of opportunities 1 and 3, and return the state written at a checkpoint between them."""
+        tap = TapSunwave(config=config, parse_env_config=False)
+        child = tap.streams["opportunity_timeline"]
+        assert isinstance(child, OpportunityTimelineStream)
+        with (
+            patch.object(OpportunityTimelineStream, "request_records", _fake_timeline),
+            patch.object(tap.state_writer, "write_state") as write_state,
+        ):
+            list(child.get_records({"opportunity_id": "1"}))
+            child.checkpoint()
+            list(child.get_records({"opportunity_id": "3"}))
+        return copy.deepcopy(write_state.call_args.args[0])
+
+    def test_interrupted_sync_resumes_after_completed_timelines(self, config: dict[str, Any]) -> None:
+        """Test that journaled timelines are skipped and the journal is cleared at the end."""
+        state = self._interrupted_run(config)
+        assert state["bookmarks"]["opportunity_timeline"]["journal_length"] == 1
+        # Entries are only written along with the STATE message that records them
+        with closing(sqlite3.connect(config["timeline_journal_path"])) as connection:
+            assert connection.execute("SELECT opportunity_id FROM timeline_journal").fetchall() == [("1",)]
+
+        tap = TapSunwave(config=config, state=state, parse_env_config=False)
+        parent = tap.streams["opportunity"]
+        child = tap.streams["opportunity_timeline"]
+        assert isinstance(child, OpportunityTimelineStream)
+
+        # The timeline of opportunity 3 was synced after the last STATE message, so it is synced again
+        contexts = [c for i in ("1", "2", "3") for c in parent.generate_child_contexts({"opportunity_id": i}, None)]
+        assert contexts == [{"opportunity_id": "2"}, {"opportunity_id": "3"}]
+        with patch.object(OpportunityTimelineStream, "request_records", _fake_timeline):
+            for context in contexts:
+                list(child.get_records(context))
+        assert child.stream_state["journal_length"] == 1
+        child.checkpoint()
+        assert child.stream_state["journal_length"] == 3  # noqa: PLR2004
+
+        with patch.object(OpportunitiesStream, "request_records", return_value=iter([])):
+            list(parent.get_records(None))
+        assert "journal_length" not in child.stream_state
+        assert child.journal is not None
+        assert child.journal.load(3) == set()
+        assert len(list(parent.generate_child_contexts({"opportunity_id": "1"}, None))) == 1
+
+    def test_journal_is_committed_once_per_batch(self, tap: TapSunwave, capsys: pytest.CaptureFixture[str]) -> None:
+        """Test that timelines are journaled and their state written once per batch of opportunities."""
+        parent = tap.streams["opportunity"]
+        assert isinstance(parent, OpportunitiesStream)
+        opportunities = [{"opportunity_id": str(i), "created_on": "2024-02-01T00:00:00+00:00"} for i in range(5)]
+        with (
+            patch.object(OpportunitiesStream, "child_batch_size", 2),
+            patch.object(OpportunitiesStream, "request_records", lambda *_: iter(opportunities)),
+            patch.object(OpportunityTimelineStream, "request_records", _fake_timeline),
+            patch.object(TimelineJournal, "commit", autospec=True, side_effect=TimelineJournal.commit) as commit,
+        ):
+            parent.sync()
+
+        assert commit.call_count == 3  # noqa: PLR2004
+        states = [json.loads(line)["value"] for line in capsys.readouterr().out.splitlines() if '"STATE"' in line]
+        lengths = [state["bookmarks"]["opportunity_timeline"].get("journal_length") for state in states]
+        assert list(dict.fromkeys(length for length in lengths if length)) == [2, 4, 5]
+
+    def test_journaled_fingerprints_are_kept(self, config: dict[str, Any]) -> None:
+        """Test that fingerprints of timelines synced before an interruption aren't pruned."""
+        config = {**config, "skip_unchanged_timelines": True}
+        tap = TapSunwave(config=config, state=self._interrupted_run(config), parse_env_config=False)
+        parent = tap.streams["opportunity"]
+        child = tap.streams["opportunity_timeline"]
+        assert isinstance(child, OpportunityTimelineStream)
+        child.fingerprints["1"] = ["abc", None]
+
+        assert list(parent.generate_child_contexts({"opportunity_id": "1"}, None)) == []
+        child.prune_fingerprints()
+        assert child.fingerprints == {"1": ["abc", None]}
+
+    def test_disabled_by_default(self, tap: TapSunwave, config: dict[str, Any]) -> None:
+        """Test that timelines aren't journaled without a journal file."""
+        child = tap.streams["opportunity_timeline"]
+        assert isinstance(child, OpportunityTimelineStream)
+        with patch.object(OpportunityTimelineStream, "config", {**config, "timeline_journal_path": None}):
+            assert child.journal is None
+            with patch.object(OpportunityTimelineStream, "request_records", _fake_timeline):
+                list(child.get_records({"opportunity_id": "1"}))
+        assert "journal_length" not in child.stream_state
+        assert not child.is_completed({"opportunity_id": "1"})
+
+
+class TestDateWindowedRequests:
+    """Tests for date-windowed opportunity and census requests."""
+
+    @pytest.fixture
+    def config(self, config: dict[str, Any]) -> dict[str, Any]:
+        """Enable weekly date windows."""
+        return {**config, "start_date": "2024-01-01", "date_window_days": 7}
+
+    def test_windows_are_requested_in_order_with_checkpoints(self, tap: TapSunwave) -> None:
+        """Test that each window is requested and state is written after each one."""
+        stream = tap.streams["census"]
+        assert isinstance(stream, CensusStream)
+        urls: list[str] = []
+
+        def fake_request_records(_: CensusStream, context: Context | None) -> Iterator[dict]:
+            urls.append(stream.get_url(context))
+            yield {"Admission Id": context["window_start"] if context else None}
+
+        with (
+            patch.object(CensusStream, "request_records", fake_request_records),
+            patch.object(CensusStream, "_write_state_message") as write_state,
+            patch("tap_sunwave.streams.datetime") as mock_datetime,
+        ):
+            mock_datetime.now.return_value = datetime(2024, 1, 20, tzinfo=timezone.utc)
+            mock_datetime.fromisoformat = datetime.fromisoformat
+            records = list(stream.get_records({"census_status": "active"}))
+
+        assert [r["Admission Id"] for r in records] == ["2024-01-01", "2024-01-08", "2024-01-15"]
+        assert urls == [
+            f"{stream.url_base}/api/census/active/from/2024-01-01/until/2024-01-08",
+            f"{stream.url_base}/api/census/active/from/2024-01-08/until/2024-01-15",
+            f"{stream.url_base}/api/census/active/from/2024-01-15/until/2024-01-20",
+        ]
+        assert write_state.call_count == 3  # noqa: PLR2004
+
+
+class TestReportBookmarks:
+    """Tests for the per-partition date bookmarks of census reports."""
+
+    @pytest.fixture
+    def config(self, config: dict[str, Any]) -> dict[str, Any]:
+        """Enable incremental reports with a three day lookback."""
+        return {**config, "billing_entity_ids": ["1"], "report_lookback_days": 3}
+
+    @staticmethod
+    def _window_starts(stream: CensusStream | BillingReportStream, context: Context) -> list[str]:
+        """Sync a partition on March 1st, then on March 5th, and return the start dates requested."""
+        window_starts: list[str] = []
+
+        def fake_request_records(_: Any, context: Context | None) -> Iterator[dict]:  # noqa: ANN401
+            assert context is not None
+            window_starts.append(context["window_start"])
+            yield {}
+
+        with (
+            patch.object(type(stream), "request_records", fake_request_records),
+            patch("tap_sunwave.streams.datetime") as mock_datetime,
+        ):
+            for day in (1, 5):
+                mock_datetime.now.return_value = datetime(2024, 3, day, tzinfo=timezone.utc)
+                list(stream.get_records(context))
+        return window_starts
+
+    def test_bookmark_is_resumed_with_lookback(self, tap: TapSunwave) -> None:
+        """Test that the next sync starts before the partition's bookmark."""
+        stream = tap.streams["census"]
+        assert isinstance(stream, CensusStream)
+        context = {"census_status": "active"}
+
+        assert self._window_starts(stream, context) == ["2024-01-01", "2024-02-27"]
+        assert stream.get_context_state(context)["synced_until"] == "2024-03-05"
+
+    def test_billing_is_requested_in_full(self, tap: TapSunwave) -> None:
+        """Test that keyless billing rows aren't requested again by a lookback."""
+        stream = tap.streams["billing_report"]
+        assert isinstance(stream, BillingReportStream)
+        context = {"billing_entity_id": "1"}
+
+        assert not stream.is_date_bookmarked
+        assert self._window_starts(stream, context) == ["2024-01-01", "2024-01-01"]
+        assert "synced_until" not in stream.get_context_state(context)
+
+    def test_bookmarks_are_ignored_without_lookback(self, tap: TapSunwave, config: dict[str, Any]) -> None:
+        """Test that reports are requested from the start date unless enabled."""
+        stream = tap.streams["census"]
+        assert isinstance(stream, CensusStream)
+        context = {"census_status": "active"}
+        stream.get_context_state(context)["synced_until"] = "2024-03-01"
+
+        with patch.object(CensusStream, "config", {**config, "report_lookback_days": None}):
+            assert stream.get_start_date(context).isoformat() == "2024-01-01"
+
+
+class TestDatetimeNormalization:
+    """Tests for the conversion of Sunwave datetimes to ISO 8601."""
+
+    def test_listed_properties_are_normalized(self, tap: TapSunwave) -> None:
+        """Test that ``created_on`` is converted, and other strings are left as is."""
+        stream = tap.streams["user"]
+        assert isinstance(stream, UserStream)
+        row = {"created_on": "01/02/2024 01:00:00 PM", "last_login": "01/03/2024 09:30:00 AM"}
+        stream.transform_plan.apply_batch([row])
+
+        assert row == {"created_on": "2024-01-02T13:00:00+00:00", "last_login": "01/03/2024 09:30:00 AM"}
+
+
+class TestParallelPartitions:
+    """Tests for fetching report partitions concurrently."""
+
+    @pytest.fixture
+    def config(self, config: dict[str, Any]) -> dict[str, Any]:
+        """Enable parallel partitions and report bookmarks."""
+        return {**config, "parallel_partitions": True, "report_lookback_days": 0}
+
+    def test_partitions_are_fetched_concurrently_and_synced_in_order(self, tap: TapSunwave) -> None:
+        """Test that all partitions are requested at once but processed one at a time."""
+        stream = tap.streams["census"]
+        assert isinstance(stream, CensusStream)
+        lock = threading.Lock()
+        in_flight = peak = 0
+
+        def fake_request_records(_: CensusStream, context: Context | None) -> Iterator[dict]:
+            nonlocal in_flight, peak
+            assert context is not None
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.05)
+            with lock:
+                in_flight -= 1
+            for i in range(3):
+                yield {"Admission Id": f"{context['census_status']}-{i}"}
+
+        with (
+            patch.object(CensusStream, "request_records", fake_request_records),
+            patch.object(CensusStream, "_write_record_message"),
+        ):
+            records = list(stream._sync_records(None))  # noqa: SLF001
+
+        assert [r["Admission Id"] for r in records] == [
+            f"{status}-{i}" for status in ("active", "admitted", "discharged") for i in range(3)
+        ]
+        assert peak == 3  # noqa: PLR2004
+        today = datetime.now(tz=timezone.utc).date().isoformat()
+        for partition in stream.partitions:
+            assert stream.get_context_state(partition)["synced_until"] == today
+
+    def test_prefetched_records_follow_the_context(self, tap: TapSunwave) -> None:
+        """Test that each partition gets its own records, whatever order they are synced in."""
+        stream = tap.streams["census"]
+        assert isinstance(stream, CensusStream)
+
+        def fake_request_records(_: CensusStream, context: Context | None) -> Iterator[dict]:
+            assert context is not None
+            yield {"Admission Id": context["census_status"]}
+
+        with patch.object(CensusStream, "request_records", fake_request_records):
+            windows = stream._start_partition_requests(stream.partitions)  # noqa: SLF001
+            try:
+                records = {
+                    partition["census_status"]: [r["Admission Id"] for r in stream.get_records(partition)]
+                    for partition in reversed(stream.partitions)
+                }
+            finally:
+                windows.close()
+
+        assert records == {status: [status] for status in ("active", "admitted", "discharged")}
+
+
+class TestPropertyProjection:
+    """Tests for pruning rows to the properties selected in the catalog."""
+
+    @staticmethod
+    def _select(tap: TapSunwave, properties: dict[str, set[str]]) -> dict:
+        catalog = tap.catalog_dict
+        for entry in catalog["streams"]:
+            for metadata in entry["metadata"]:
+                breadcrumb = metadata["breadcrumb"]
+                if breadcrumb and entry["tap_stream_id"] in properties:
+                    metadata["metadata"]["selected"] = breadcrumb[-1] in properties[entry["tap_stream_id"]]
+        return catalog
+
+    def test_rows_are_pruned_before_transforms(self, tap: TapSunwave, config: dict[str, Any]) -> None:
+        """Test that only selected properties and primary keys are kept and converted."""
+        catalog = self._select(tap, {"census": {"Patient Name"}})
+        stream = TapSunwave(config=config, catalog=catalog, parse_env_config=False).streams["census"]
+        assert isinstance(stream, CensusStream)
+        assert stream.projected_properties == ("Admission Id", "Patient Name")
+        assert isinstance(tap.streams["census"], CensusStream)
+        assert tap.streams["census"].projected_properties is None
+
+        row = dict.fromkeys(stream.schema["properties"], "x")
+        assert list(stream.transform_plan.apply([row])) == [{"Admission Id": "x", "Patient Name": "x"}]
+
+    @pytest.mark.parametrize("skip_unchanged_timelines", [True, False])
+    def test_fingerprinted_opportunities_are_whole(
+        self,
+        tap: TapSunwave,
+        config: dict[str, Any],
+        *,
+        skip_unchanged_timelines: bool,
+    ) -> None:
+        """Test that opportunities aren't pruned while their fingerprints are kept."""
+        catalog = self._select(tap, {"opportunity": {"created_on"}})
+        config = {**config, "skip_unchanged_timelines": skip_unchanged_timelines}
+        stream = TapSunwave(config=config, catalog=catalog, parse_env_config=False).streams["opportunity"]
+        assert isinstance(stream, OpportunitiesStream)
+        expected = None if skip_unchanged_timelines else ("created_on", "opportunity_id")
+        assert stream.projected_properties == expected
@@ -0,0 +1,217 @@
+"""Test syncing the Sunwave tap."""
+
+from __future__ import annotations
+
+import gzip
+import json
+import threading
+import time
+from datetime import date, datetime, timezone
+from typing import TYPE_CHECKING, Any
+from unittest.mock import patch
+
+import pytest
+
+from tap_sunwave.client import SunwaveStream
+from tap_sunwave.tap import TapSunwave
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from singer_sdk.helpers.types import Context
+
+
+class TestParallelStreams:
+    """Tests for syncing top-level streams in parallel."""
+
+    @pytest.fixture
+    def config(self, config: dict[str, Any]) -> dict[str, Any]:
+        """Sync three streams at a time, with report bookmarks."""
+        return {**config, "billing_entity_ids": ["1"], "parallel_streams": 3, "report_lookback_days": 0}
+
+    def test_streams_are_synced_concurrently(self, tap: TapSunwave, capsys: pytest.CaptureFixture[str]) -> None:
+        """Test that streams overlap, output lines stay whole and state has every bookmark."""
+        lock = threading.Lock()
+        syncing: set[str] = set()
+        peak = 0
+
+        def fake_request_records(stream: SunwaveStream, context: Context | None) -> Iterator[dict]:
+            nonlocal peak
+            with lock:
+                syncing.add(stream.name)
+                peak = max(peak, len(syncing))
+            time.sleep(0.05)
+            with lock:
+                syncing.discard(stream.name)
+            for i in range(50):
+                yield {
+                    "id": f"{stream.name}-{i}",
+                    "opportunity_id": f"{stream.name}-{i}",
+                    "Admission Id": f"{(context or {}).get('census_status')}-{i}",
+                    "created_on": "2024-02-01T00:00:00+00:00",
+                }
+
+        with patch.object(SunwaveStream, "request_records", fake_request_records):
+            tap.sync_all()
+
+        messages = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        records = [m for m in messages if m["type"] == "RECORD"]
+        states = [m["value"] for m in messages if m["type"] == "STATE"]
+
+        assert peak == 3  # noqa: PLR2004
+        assert {m["stream"] for m in records} == {
+            "form",
+            "user",
+            "opportunity",
+            "opportunity_timeline",
+            "census",
+            "billing_report",
+            "referral",
+        }
+        bookmarks = states[-1]["bookmarks"]
+        assert bookmarks["opportunity"]["replication_key_value"] == "2024-02-01T00:00:00+00:00"
+        for partition in bookmarks["census"]["partitions"]:
+            assert "synced_until" in partition
+        assert all(
+            stream.parallel_state_writer is None for stream in tap.streams.values() if isinstance(stream, SunwaveStream)
+        )
+
+    def test_running_streams_finish_when_one_fails(
+        self, config: dict[str, Any], capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        """Test that a failure cancels the queued streams, waits for the running ones and writes the state."""
+        tap = TapSunwave(config={**config, "parallel_streams": 2}, parse_env_config=False)
+        failed = threading.Event()
+        requested: set[str] = set()
+
+        def fake_request_records(stream: SunwaveStream, context: Context | None) -> Iterator[dict]:
+            requested.add(stream.name)
+            if stream.name == "census" and (context or {}).get("census_status") != "active":
+                failed.set()
+                msg = "Census failed"
+                raise RuntimeError(msg)
+            if stream.name != "census":
+                assert failed.wait(timeout=5)
+            yield {"Admission Id": "1", "created_on": "2024-02-01T00:00:00+00:00"}
+
+        with (
+            patch.object(SunwaveStream, "request_records", fake_request_records),
+            pytest.raises(RuntimeError, match="Census failed"),
+        ):
+            tap.sync_all()
+
+        messages = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert requested == {"billing_report", "census"}
+        assert {m["stream"] for m in messages if m["type"] == "RECORD"} == {"billing_report", "census"}
+        assert messages[-1]["type"] == "STATE"
+        bookmarks = messages[-1]["value"]["bookmarks"]
+        assert "billing_report" in bookmarks
+        census = {p["context"]["census_status"]: p for p in bookmarks["census"]["partitions"]}
+        assert "synced_until" in census["active"]
+        assert all(
+            stream.parallel_state_writer is None for stream in tap.streams.values() if isinstance(stream, SunwaveStream)
+        )
+
+
+class TestBatchMode:
+    """Tests for writing records to batch files."""
+
+    @pytest.fixture
+    def config(self, config: dict[str, Any], tmp_path: Path) -> dict[str, Any]:
+        """Write batches of 40 records, with weekly windows and report bookmarks."""
+        return {
+            **config,
+            "billing_entity_ids": ["1"],
+            "start_date": "2024-01-01",
+            "date_window_days": 7,
+            "report_lookback_days": 0,
+            "batch_config": {
+                "encoding": {"format": "jsonl", "compression": "gzip"},
+                "storage": {"root": tmp_path.as_uri()},
+                "batch_size": 40,
+            },
+        }
+
+    def test_state_follows_batches(self, tap: TapSunwave, capsys: pytest.CaptureFixture[str]) -> None:
+        """Test that records go to conformed batch files, and state is only written once they are covered."""
+
+        def fake_request_records(stream: SunwaveStream, context: Context | None) -> Iterator[dict]:
+            for i in range(10):
+                yield {
+                    "id": f"{stream.name}-{i}",
+                    "opportunity_id": f"{stream.name}-{i}",
+                    "Admission Id": f"{(context or {}).get('window_start')}-{i}",
+                    "created_on": "2024-02-01T00:00:00+00:00",
+                    "not_in_schema": True,
+                }
+
+        with (
+            patch.object(SunwaveStream, "request_records", fake_request_records),
+            patch("tap_sunwave.streams.datetime") as mock_datetime,
+        ):
+            mock_datetime.now.return_value = datetime(2024, 2, 1, tzinfo=timezone.utc)
+            mock_datetime.fromisoformat = datetime.fromisoformat
+            tap.sync_all()
+
+        messages = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert not [m for m in messages if m["type"] == "RECORD"]
+
+        # Census state is only written after the batch holding the records it bookmarks
+        census_rows = 0
+        for message in messages:
+            if message["type"] == "BATCH" and message["stream"] == "census":
+                for url in message["manifest"]:
+                    with gzip.open(url.removeprefix("file://")) as f:
+                        rows = [json.loads(line) for line in f]
+                    assert "not_in_schema" not in rows[0]
+                    census_rows += len(rows)
+            elif message["type"] == "STATE":
+                partitions = message["value"].get("bookmarks", {}).get("census", {}).get("partitions", [])
+                windows = sum(
+                    -(-(date.fromisoformat(p["synced_until"]) - date(2024, 1, 1)).days // 7)
+                    for p in partitions
+                    if "synced_until" in p
+                )
+                assert census_rows >= 10 * windows
+
+        assert census_rows == 3 * 5 * 10
+
+
+class TestCatalogedStreams:
+    """Tests for creating only the streams an input catalog selects."""
+
+    @staticmethod
+    def _catalog(tap: TapSunwave, selected: set[str]) -> dict:
+        catalog = tap.catalog_dict
+        for entry in catalog["streams"]:
+            for metadata in entry["metadata"]:
+                if not metadata["breadcrumb"]:
+                    metadata["metadata"]["selected"] = entry["tap_stream_id"] in selected
+        return catalog
+
+    def test_only_selected_streams_and_parents_are_created(self, tap: TapSunwave, config: dict[str, Any]) -> None:
+        """Test that a selected child stream brings its parent, and other streams are left out."""
+        catalog = self._catalog(tap, {"opportunity_timeline"})
+        cataloged = TapSunwave(config=config, catalog=catalog, parse_env_config=False)
+
+        assert set(cataloged.streams) == {"opportunity", "opportunity_timeline"}
+        assert set(cataloged.mapper.stream_maps) == {"opportunity", "opportunity_timeline"}
+        assert not cataloged.streams["opportunity"].selected
+        assert cataloged.streams["opportunity"].has_selected_descendents
+
+    def test_maps_use_the_stream_schemas(self, tap: TapSunwave, config: dict[str, Any]) -> None:
+        """Test that stream maps are built from the streams, not from the input catalog entries."""
+        catalog = self._catalog(tap, {"opportunity"})
+        for entry in catalog["streams"]:
+            entry["schema"]["properties"] = {}
+        cataloged = TapSunwave(config=config, catalog=catalog, parse_env_config=False)
+
+        stream = cataloged.streams["opportunity"]
+        (stream_map,) = cataloged.mapper.stream_maps["opportunity"]
+        assert stream_map.raw_schema == stream.schema
+        assert stream_map.raw_schema["properties"]
+
+    def test_discovery_creates_every_stream(self, tap: TapSunwave) -> None:
+        """Test that all streams are discovered without an input catalog."""
+        assert len(tap.streams) == len(tap.catalog_dict["streams"]) == 7  # noqa: PLR2004
@@ -0,0 +1,87 @@
+"""Test the Singer message writers."""
+
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from singer_sdk.singerlib import RecordMessage, SchemaMessage, StateMessage
+
+from tap_sunwave.writers import FastSingerWriter, LockingSingerWriter
+
+if TYPE_CHECKING:
+    from tap_sunwave.tap import TapSunwave
+
+RECORD = {
+    "id": 1,
+    "name": "Zoë",
+    "balance": Decimal("12.50"),
+    "precise": Decimal("0.1000000000000000000001"),
+    "created_on": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+    "tags": ["a", None],
+}
+
+
+class TestFastSingerWriter:
+    """Tests for FastSingerWriter."""
+
+    @pytest.mark.parametrize(
+        "message",
+        [
+            pytest.param(RecordMessage(stream="census", record=RECORD), id="record"),
+            pytest.param(
+                RecordMessage(
+                    stream="census",
+                    record=RECORD,
+                    version=3,
+                    time_extracted=datetime(2024, 1, 2, tzinfo=timezone.utc),
+                ),
+                id="record-version",
+            ),
+            pytest.param(SchemaMessage(stream="census", schema={"type": "object"}, key_properties=["id"]), id="schema"),
+            pytest.param(StateMessage(value={"bookmarks": {"census": {"synced_until": "2024-01-02"}}}), id="state"),
+        ],
+    )
+    def test_messages_decode_like_the_sdk_output(self, message: Any) -> None:  # noqa: ANN401
+        """Test that messages decode to the same values as the SDK writer's."""
+        expected = json.loads(LockingSingerWriter().format_message(message), parse_float=Decimal)
+        assert json.loads(FastSingerWriter().encode(message), parse_float=Decimal) == expected
+
+    def test_records_are_buffered_until_state(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """Test that records are held back until a STATE message, and written before it."""
+        writer = FastSingerWriter()
+        for i in range(3):
+            writer.write_message(RecordMessage(stream="form", record={"id": i}))
+        assert capsys.readouterr().out == ""
+
+        writer.write_message(StateMessage(value={"bookmarks": {}}))
+        lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert [line["type"] for line in lines] == ["RECORD", "RECORD", "RECORD", "STATE"]
+
+    def test_full_buffer_is_written(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """Test that the buffer is written out once it reaches ``buffer_size``."""
+        writer = FastSingerWriter()
+        writer.buffer_size = 150
+        for i in range(10):
+            writer.write_message(RecordMessage(stream="form", record={"id": i}))
+        written = capsys.readouterr().out.splitlines()
+        assert 0 < len(written) < 10  # noqa: PLR2004
+
+        writer.flush()
+        assert len(written) + len(capsys.readouterr().out.splitlines()) == 10  # noqa: PLR2004
+
+
+class TestFastOutputSetting:
+    """Tests for selecting the writer with ``fast_output``."""
+
+    @pytest.fixture
+    def config(self, config: dict[str, Any]) -> dict[str, Any]:
+        """Enable the fast writer."""
+        return {**config, "fast_output": True}
+
+    def test_fast_writer_is_used(self, tap: TapSunwave) -> None:
+        """Test that the tap writes messages with the fast writer."""
+        assert isinstance(tap.message_writer, FastSingerWriter)